@@ -1,20 +1,24 @@
 # -*- coding: utf-8 -*-
+import hmac
 import os
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from flask_socketio import SocketIO
 from .config import Config
+from .utils.metrics import InstrumentedSocketIO, init_metrics, metrics
+from .utils.replicas import RoutingSession, init_replicas
 
-db = SQLAlchemy()
+# A sessão roteia leituras de GET para réplicas quando configuradas
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 jwt = JWTManager()
 
 # SocketIO initialization: use Python's threading mode by default.  Eventlet
 # isn't compatible with Python 3.13 at this time, and using threading avoids
 # dependency on a green‑thread implementation.  This mode provides
 # acceptable performance for moderate loads and full WebSocket support.
-socketio = SocketIO(cors_allowed_origins="*", async_mode='threading')
+# A subclasse apenas conta os eventos emitidos (ver utils/metrics.py).
+socketio = InstrumentedSocketIO(cors_allowed_origins="*", async_mode='threading')
 
 
 def create_app() -> Flask:
@@ -27,35 +31,118 @@ def create_app() -> Flask:
 
     CORS(app)  # allow cross-origin for MVP
     db.init_app(app)
+    
+    init_metrics(app, db)
+    from .utils.database import init_database
+    init_database(app, db)
+    init_replicas(app, db)
+    from .utils.sqlite import init_sqlite
+    init_sqlite(app, db)
+    from .utils.profiler import init_profiler
+    init_profiler(app)
+    from .utils.query_stats import init_query_stats
+    init_query_stats(app)
+    from .utils.audit import init_audit
+    init_audit(app, db)
+    from .utils.auth import init_request_user
+    init_request_user(app)
     jwt.init_app(app)
     # Inicialize o SocketIO para esta instância de app.  Não especifique
     # explicitamente 'eventlet' aqui; deixe o ``async_mode`` herdado do
     # objeto global ``socketio`` (que foi configurado para 'threading').
-    socketio.init_app(app, cors_allowed_origins="*")
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        serializer=app.config["SOCKETIO_SERIALIZER"],
+        http_compression=app.config["SOCKETIO_HTTP_COMPRESSION"],
+        compression_threshold=app.config["SOCKETIO_COMPRESSION_THRESHOLD"],
+        message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"],
+    )
 
     with app.app_context():
         from . import models  # noqa: F401
-        db.create_all()
+        if app.config["SCHEMA_AUTO_CREATE"]:
+            db.create_all()
+            # Índice textual (coluna gerada/FTS5) não é criado pelo create_all
+            from .utils.search import ensure_index
+            ensure_index(db.engine)
 
         # Register blueprints
         from .blueprints.auth import bp as auth_bp
         from .blueprints.procurements import bp as proc_bp
         from .blueprints.tr import bp as tr_bp
         from .blueprints.proposals import bp as proposals_bp
+        from .blueprints.notifications import bp as notifications_bp
+        from .blueprints.admin import bp as admin_bp
+        from .blueprints.search import bp as search_bp
 
         app.register_blueprint(auth_bp, url_prefix="/api/auth")
         app.register_blueprint(proc_bp, url_prefix="/api")
         app.register_blueprint(tr_bp, url_prefix="/api")
         app.register_blueprint(proposals_bp, url_prefix="/api")
+        app.register_blueprint(notifications_bp, url_prefix="/api")
+        app.register_blueprint(admin_bp, url_prefix="/api/admin")
+        app.register_blueprint(search_bp, url_prefix="/api")
+
+        # Comandos de linha de comando (flask seed, schema, audit, procurements, search, prices)
+        from .seed import seed_command
+        from .migrations import schema_cli
+        from .utils.audit_store import audit_cli
+        from .utils.procurement_archive import procurements_cli
+        from .utils.price_stats import prices_cli
+        from .utils.search import search_cli
+        app.cli.add_command(seed_command)
+        app.cli.add_command(schema_cli)
+        app.cli.add_command(audit_cli)
+        app.cli.add_command(procurements_cli)
+        app.cli.add_command(search_cli)
+        app.cli.add_command(prices_cli)
 
         # Rota principal para servir o HTML
         @app.route('/')
         def index():
-            return render_template('index.html')
+            return render_template(
+                'index.html',
+                socket_serializer=app.config["SOCKETIO_SERIALIZER"]
+            )
 
-        # Simple healthcheck
+        # Liveness: o processo responde (não toca no banco)
         @app.get("/healthz")
         def healthz():
             return {"status": "ok"}
 
+        # Readiness: banco acessível e, sem SCHEMA_AUTO_CREATE, migrações
+        # aplicadas.  O esquema atualizado fica em cache (não regride).
+        schema_ready = []
+
+        @app.get("/readyz")
+        def readyz():
+            from sqlalchemy import text
+            checks = {}
+            try:
+                db.session.execute(text("SELECT 1"))
+                checks["database"] = "ok"
+            except Exception as exc:
+                db.session.rollback()
+                checks["database"] = f"erro: {exc.__class__.__name__}"
+
+            if checks["database"] == "ok" and not app.config["SCHEMA_AUTO_CREATE"]:
+                if not schema_ready:
+                    from .migrations import is_current
+                    if is_current(db.engine):
+                        schema_ready.append(True)
+                checks["schema"] = "ok" if schema_ready else "migracoes pendentes"
+
+            ready = all(v == "ok" for v in checks.values())
+            return {"status": "ready" if ready else "not_ready", "checks": checks}, 200 if ready else 503
+
+        @app.get("/metrics")
+        def prometheus_metrics():
+            token = app.config["METRICS_TOKEN"]
+            if token:
+                given = request.headers.get("Authorization", "")[len("Bearer "):]
+                if not hmac.compare_digest(given.encode(), token.encode()):
+                    return {"error": "Nao autorizado"}, 401
+            return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
     return app
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import json
+from flask import Blueprint, current_app, request, send_file, stream_with_context
+from .. import db
+from ..utils import audit_store
+from ..utils.auth import require_admin
+from ..utils.profiler import list_profiles, profile_path, render_text
+
+bp = Blueprint("admin", __name__)
+
+MAX_AUDIT_PAGE_SIZE = 500
+
+
+@bp.get("/profiles")
+@require_admin
+def get_profiles():
+    """Perfis gravados pelo profiler, do mais recente ao mais antigo"""
+    profiles = list_profiles(current_app.config["PROFILE_DIR"])
+    endpoint = request.args.get("endpoint")
+    if endpoint:
+        profiles = [p for p in profiles if p.get("endpoint") == endpoint]
+    return {"profiles": profiles}
+
+
+@bp.get("/profiles/<name>")
+@require_admin
+def download_profile(name: str):
+    """Arquivo pstats (abrir com snakeviz/pstats) ou resumo em texto com ?format=text"""
+    path = profile_path(current_app.config["PROFILE_DIR"], name)
+    if not path:
+        return {"error": "Perfil nao encontrado"}, 404
+
+    if request.args.get("format") == "text":
+        limit = min(request.args.get("limit", 40, type=int), 500)
+        sort = request.args.get("sort", "cumulative")
+        if sort not in ("cumulative", "tottime", "calls"):
+            return {"error": "sort deve ser cumulative, tottime ou calls"}, 400
+        return current_app.response_class(render_text(path, limit, sort), mimetype="text/plain")
+
+    return send_file(path, mimetype="application/octet-stream",
+                     as_attachment=True, download_name=f"{name}.prof")
+
+
+@bp.get("/audit")
+@require_admin
+def list_audit_logs():
+    """Auditoria paginada por chave (``cursor`` = ``next_cursor`` da página anterior)
+
+    Filtros: entity_type, entity_id, user_id, action, since, until (ISO 8601).
+    """
+    try:
+        filters = audit_store.parse_filters(request.args)
+        limit = max(min(request.args.get("limit", 50, type=int), MAX_AUDIT_PAGE_SIZE), 1)
+        return audit_store.query_logs(db.session, filters, limit, request.args.get("cursor"))
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+
+
+@bp.get("/audit/archives")
+@require_admin
+def list_audit_archives():
+    """Meses já arquivados fora do banco"""
+    return {"archives": audit_store.list_archives(current_app.config["AUDIT_ARCHIVE_DIR"])}
+
+
+@bp.get("/audit/archives/<month>")
+@require_admin
+def read_audit_archive(month: str):
+    """Eventos arquivados do mês (AAAA-MM) em JSON por linha, com os filtros de /audit
+
+    ``?raw=1`` baixa o arquivo .jsonl.gz como está.
+    """
+    directory = current_app.config["AUDIT_ARCHIVE_DIR"]
+    try:
+        month_ = audit_store.parse_month(month)
+        filters = audit_store.parse_filters(request.args)
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    if not audit_store.archive_exists(directory, month_):
+        return {"error": "Mes nao arquivado"}, 404
+
+    if request.args.get("raw") in ("1", "true"):
+        return send_file(audit_store.archive_path(directory, month_), mimetype="application/gzip",
+                         as_attachment=True, download_name=f"audit-{month}.jsonl.gz")
+
+    def generate():
+        for event in audit_store.read_archive(directory, month_, filters):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return current_app.response_class(stream_with_context(generate()), mimetype="application/x-ndjson")
@@ -3,7 +3,7 @@ from flask import Blueprint, request
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from datetime import timedelta
 from .. import db
-from ..models import User, Organization, Role
+from ..models import User, Organization, Role, Invite
 from ..utils.passwords import hash_password, verify_password
 
 bp = Blueprint("auth", __name__)
@@ -41,6 +41,14 @@ def register():
         organization=org
     )
     db.session.add(user)
+    
+    # Vincular convites enviados antes do cadastro do fornecedor
+    if user.role == Role.FORNECEDOR:
+        db.session.flush()
+        Invite.query.filter_by(email=email, supplier_user_id=None).update(
+            {"supplier_user_id": user.id}, synchronize_session=False
+        )
+    
     db.session.commit()
     
     return {"message": "usuario registrado", "user_id": user.id}
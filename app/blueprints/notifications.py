@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required
+from datetime import datetime
+from sqlalchemy import update
+from .. import db
+from ..models import Notification, NotificationCounter
+from ..utils.auth import get_current_user
+from ..utils.notifications import serialize, unread_count
+
+bp = Blueprint("notifications", __name__)
+
+MAX_PAGE_SIZE = 200
+
+
+@bp.get("/notifications")
+@jwt_required()
+def list_notifications():
+    """Caixa de entrada paginada por chave (``before`` = último id recebido)"""
+    user = get_current_user()
+    if not user:
+        return {"error": "Usuario nao encontrado"}, 404
+
+    limit = max(min(request.args.get("limit", 50, type=int), MAX_PAGE_SIZE), 1)
+    before = request.args.get("before", type=int)
+
+    query = Notification.query.filter(Notification.user_id == user.id)
+    if before:
+        query = query.filter(Notification.id < before)
+    if request.args.get("unread") in ("1", "true"):
+        query = query.filter(Notification.read_at.is_(None))
+
+    rows = query.order_by(Notification.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "items": [serialize(n) for n in rows],
+        "unread": unread_count(user.id),
+        "next_cursor": rows[-1].id if has_more else None
+    }
+
+
+@bp.get("/notifications/unread-count")
+@jwt_required()
+def get_unread_count():
+    user = get_current_user()
+    if not user:
+        return {"error": "Usuario nao encontrado"}, 404
+    return {"unread": unread_count(user.id)}
+
+
+@bp.post("/notifications/read")
+@jwt_required()
+def mark_notifications_read():
+    """Marca como lidas por lista de ids ou tudo até ``up_to`` (inclusive)"""
+    data = request.get_json() or {}
+    if not isinstance(data, dict):
+        return {"error": "Corpo deve ser um objeto JSON"}, 400
+    user = get_current_user()
+    if not user:
+        return {"error": "Usuario nao encontrado"}, 404
+
+    ids = data.get("ids")
+    up_to = data.get("up_to")
+    if not ids and not up_to and not data.get("all"):
+        return {"error": "Informe ids, up_to ou all"}, 400
+
+    stmt = update(Notification).where(
+        Notification.user_id == user.id,
+        Notification.read_at.is_(None)
+    )
+    if ids:
+        if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+            return {"error": "ids deve ser uma lista de inteiros"}, 400
+        stmt = stmt.where(Notification.id.in_(ids))
+    elif up_to:
+        if type(up_to) is not int:
+            return {"error": "up_to deve ser um inteiro"}, 400
+        stmt = stmt.where(Notification.id <= up_to)
+
+    result = db.session.execute(
+        stmt.values(read_at=datetime.utcnow()).execution_options(synchronize_session=False)
+    )
+    updated = result.rowcount or 0
+    if updated:
+        db.session.execute(
+            update(NotificationCounter)
+            .where(NotificationCounter.user_id == user.id)
+            .values(unread=NotificationCounter.unread - updated)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+    return {"updated": updated, "unread": unread_count(user.id)}
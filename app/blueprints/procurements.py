@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
+import csv
+import io
+import re
 import secrets
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-from sqlalchemy import or_, and_, func
+from sqlalchemy import Float, or_, and_, cast, func, insert, select
+from sqlalchemy.orm import joinedload
 from .. import db, socketio
 from ..models import (
     Procurement, Invite, User, Role, TR, TRStatus, 
@@ -12,8 +16,18 @@ from ..models import (
 )
 
 from ..utils.auth import get_current_user
+from ..utils import (
+    audit, exports, matrix, price_anomalies, price_stats, procurement_archive, quantity_report, search,
+    sockets, timeline
+)
+from ..utils.notifications import NotificationBatch
+from ..utils.invites import resolve_invite_suppliers, resolve_suppliers
 bp = Blueprint("procurements", __name__)
 
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+MAX_BULK_INVITES = 1000
+MAX_TIMELINE_PAGE_SIZE = 500
+
 @bp.get("/procurements")
 @jwt_required()
 def list_procurements():
@@ -23,6 +37,10 @@ def list_procurements():
     if not user:
         return {"error": "Usuario nao encontrado"}, 404
     
+    # Encerrados e arquivados ficam fora das tabelas quentes (?archived=1)
+    if request.args.get("archived") in ("1", "true"):
+        return jsonify(procurement_archive.list_archived(user))
+    
     if user.role == Role.REQUISITANTE:
         # Requisitante vê apenas processos atribuídos a ele
         procurements = Procurement.query.filter_by(requisitante_id=user.id).all()
@@ -63,7 +81,15 @@ def list_procurements():
 def get_procurement(proc_id: int):
     """Obtém detalhes completos do processo"""
     user = get_current_user()
-    proc = Procurement.query.get_or_404(proc_id)
+    proc = Procurement.query.get(proc_id)
+    
+    if proc is None:
+        archived = procurement_archive.load(proc_id)
+        if not archived:
+            return {"error": "Processo não encontrado"}, 404
+        if user.role == Role.FORNECEDOR and not archived.supplier_invited(user):
+            return {"error": "Não autorizado"}, 403
+        return jsonify(archived.detail(user))
     
     # Verificar permissões
     if user.role == Role.FORNECEDOR:
@@ -108,6 +134,37 @@ def get_procurement(proc_id: int):
     return jsonify(response)
 
 
+@bp.get("/procurements/<int:proc_id>/timeline")
+@jwt_required()
+def get_procurement_timeline(proc_id: int):
+    """Histórico do processo em ordem cronológica, paginado por ``cursor``"""
+    user = get_current_user()
+    proc = Procurement.query.get(proc_id)
+    archived = procurement_archive.load(proc_id) if proc is None else None
+    if proc is None and archived is None:
+        return {"error": "Processo não encontrado"}, 404
+    requisitante_id = proc.requisitante_id if proc else archived.procurement["requisitante_id"]
+    
+    # Comprador ou o requisitante do processo (o histórico inclui convites e
+    # propostas de todos os fornecedores)
+    if user.role == Role.REQUISITANTE:
+        if requisitante_id != user.id:
+            return {"error": "Não autorizado"}, 403
+    elif user.role != Role.COMPRADOR:
+        return {"error": "Não autorizado"}, 403
+    
+    limit = max(min(request.args.get("limit", 100, type=int), MAX_TIMELINE_PAGE_SIZE), 1)
+    try:
+        if archived:
+            result = archived.timeline(limit, request.args.get("cursor"))
+        else:
+            result = timeline.page(proc_id, limit, request.args.get("cursor"))
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    result["procurement_id"] = proc_id
+    return result
+
+
 @bp.post("/procurements")
 @jwt_required()
 def create_procurement():
@@ -137,15 +194,24 @@ def create_procurement():
         org_id=user.org_id
     )
     db.session.add(proc)
-    db.session.commit()
+    db.session.flush()
+    timeline.record(proc.id, "procurement.created", user.id, "procurement", proc.id,
+                    status=proc.status.value, requisitante_id=proc.requisitante_id)
     
-    # Notificar via WebSocket
+    notifications = NotificationBatch()
     if requisitante:
-        socketio.emit("procurement.assigned", {
+        notifications.add(requisitante.id, "procurement.assigned", {
             "procurement_id": proc.id,
             "title": proc.title,
             "message": f"Você foi designado para criar o TR do processo '{proc.title}'"
-        }, to=f"user:{requisitante.id}")
+        })
+    notifications.flush()
+    db.session.commit()
+    
+    # Notificar via WebSocket
+    if requisitante:
+        sockets.grant(requisitante.id, proc.id)
+    notifications.emit()
     
     socketio.emit("procurement.created", {
         "procurement_id": proc.id,
@@ -183,6 +249,8 @@ def update_procurement(proc_id: int):
         proc.deadline_proposals = datetime.fromisoformat(data["deadline_proposals"])
     
     proc.updated_at = datetime.utcnow()
+    if "title" in data and proc.tr:
+        search.index_tr(proc.tr, proc)
     db.session.commit()
     
     return {"message": "Processo atualizado", "procurement_id": proc.id}
@@ -216,16 +284,36 @@ def send_invite(proc_id: int):
     if existing:
         return {"error": "Fornecedor já foi convidado"}, 400
     
+    # Se o fornecedor já está cadastrado, o convite já nasce vinculado
+    supplier = resolve_suppliers(emails=[email]).get(email)
+    
     # Criar convite
     token = secrets.token_urlsafe(32)
     invite = Invite(
         procurement_id=proc_id,
         email=email,
         token=token,
+        supplier_user_id=supplier.id if supplier else None,
         created_by=user.id
     )
     db.session.add(invite)
+    db.session.flush()
+    timeline.record(proc_id, "invite.sent", user.id, "invite", invite.id, email=email)
+    
+    # Se o fornecedor já está cadastrado, notificar diretamente
+    notifications = NotificationBatch()
+    if supplier:
+        notifications.add(supplier.id, "invite.received", {
+            "procurement_id": proc_id,
+            "title": proc.title,
+            "token": token
+        })
+    notifications.flush()
     db.session.commit()
+    audit.record("INVITE_SENT", user.id, "invite", invite.id, {
+        "procurement_id": proc_id,
+        "email": email
+    })
     
     # Notificar via WebSocket
     socketio.emit("invite.sent", {
@@ -234,14 +322,9 @@ def send_invite(proc_id: int):
         "title": proc.title
     }, to=f"proc:{proc_id}")
     
-    # Se o fornecedor já está cadastrado, notificar diretamente
-    supplier = User.query.filter_by(email=email, role=Role.FORNECEDOR).first()
     if supplier:
-        socketio.emit("invite.received", {
-            "procurement_id": proc_id,
-            "title": proc.title,
-            "token": token
-        }, to=f"user:{supplier.id}")
+        sockets.grant(supplier.id, proc_id)
+    notifications.emit()
     
     return {
         "message": "Convite enviado",
@@ -250,6 +333,149 @@ def send_invite(proc_id: int):
     }
 
 
+def _bulk_invite_emails():
+    """Lê e-mails de JSON (lista, ``emails`` lista ou ``csv`` texto), corpo text/csv ou arquivo ``file``"""
+    if "file" in request.files:
+        text = request.files["file"].read().decode("utf-8-sig", errors="replace")
+    elif request.is_json:
+        data = request.get_json() or {}
+        if isinstance(data, list):
+            return [str(e) for e in data]
+        if not isinstance(data, dict):
+            raise ValueError("Envie uma lista de emails ou um objeto com emails/csv")
+        if isinstance(data.get("emails"), list):
+            return [str(e) for e in data["emails"]]
+        text = data.get("csv") or ""
+    else:
+        text = request.get_data(as_text=True)
+    
+    # Qualquer célula com "@" é considerada; cabeçalhos e outras colunas são ignorados
+    return [
+        cell for row in csv.reader(io.StringIO(text))
+        for cell in row if "@" in cell
+    ]
+
+
+@bp.post("/procurements/<int:proc_id>/invites/bulk")
+@jwt_required()
+def send_bulk_invites(proc_id: int):
+    """Envia convites em lote (lista ou CSV de e-mails) - apenas COMPRADOR"""
+    user = get_current_user()
+    
+    # Verificar se é comprador
+    if user.role != Role.COMPRADOR:
+        return {"error": "Apenas compradores podem enviar convites"}, 403
+    
+    proc = Procurement.query.get_or_404(proc_id)
+    
+    try:
+        raw_emails = _bulk_invite_emails()
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    if not raw_emails:
+        return {"error": "Nenhum email informado"}, 400
+    if len(raw_emails) > MAX_BULK_INVITES:
+        return {"error": f"Máximo de {MAX_BULK_INVITES} emails por lote"}, 400
+    
+    # Normalizar e deduplicar dentro do próprio lote; um resultado por email
+    results = []
+    pending = {}
+    for raw in raw_emails:
+        email = raw.strip().lower()
+        if not EMAIL_RE.match(email):
+            results.append({"email": raw, "status": "invalid"})
+        elif email in pending:
+            results.append({"email": email, "status": "duplicate"})
+        else:
+            pending[email] = {"email": email}
+            results.append(pending[email])
+    candidates = list(pending)
+    
+    # Uma consulta para os convites já existentes
+    existing = set()
+    if candidates:
+        existing = {
+            email for (email,) in db.session.query(Invite.email).filter(
+                Invite.procurement_id == proc_id,
+                Invite.email.in_(candidates)
+            )
+        }
+    for email in existing:
+        pending[email]["status"] = "already_invited"
+    
+    new_emails = [e for e in candidates if e not in existing]
+    
+    notifications = NotificationBatch()
+    suppliers = {}
+    if new_emails:
+        # Fornecedores já cadastrados em uma única consulta IN
+        suppliers = resolve_suppliers(emails=new_emails)
+        
+        now = datetime.utcnow()
+        rows = [{
+            "procurement_id": proc_id,
+            "email": email,
+            "token": secrets.token_urlsafe(32),
+            "supplier_user_id": suppliers[email].id if email in suppliers else None,
+            "created_by": user.id,
+            "created_at": now
+        } for email in new_emails]
+        tokens = {row["email"]: row["token"] for row in rows}
+        
+        # Um único INSERT para todos os convites
+        inserted = db.session.execute(
+            insert(Invite).returning(Invite.id, Invite.email), rows
+        ).all()
+        for invite_id, email in inserted:
+            pending[email].update(
+                status="invited",
+                invite_id=invite_id,
+                token=tokens[email]
+            )
+        timeline.record_many([{
+            "procurement_id": proc_id,
+            "event": "invite.sent",
+            "actor_id": user.id,
+            "entity_type": "invite",
+            "entity_id": invite_id,
+            "details": {"email": email}
+        } for invite_id, email in inserted])
+        
+        for email, supplier in suppliers.items():
+            pending[email]["supplier_registered"] = True
+            notifications.add(supplier.id, "invite.received", {
+                "procurement_id": proc_id,
+                "title": proc.title,
+                "token": tokens[email]
+            })
+    
+    notifications.flush()
+    db.session.commit()
+    for email in new_emails:
+        audit.record("INVITE_SENT", user.id, "invite", pending[email]["invite_id"], {
+            "procurement_id": proc_id,
+            "email": email,
+            "bulk": True
+        })
+    
+    for supplier in suppliers.values():
+        sockets.grant(supplier.id, proc_id)
+    notifications.emit()
+    
+    if new_emails:
+        socketio.emit("invites.sent", {
+            "procurement_id": proc_id,
+            "title": proc.title,
+            "count": len(new_emails)
+        }, to=f"proc:{proc_id}")
+    
+    return {
+        "message": f"{len(new_emails)} convites enviados",
+        "invited": len(new_emails),
+        "results": results
+    }
+
+
 @bp.get("/procurements/<int:proc_id>/invites")
 @jwt_required()
 def list_invites(proc_id: int):
@@ -261,10 +487,11 @@ def list_invites(proc_id: int):
         return {"error": "Apenas compradores podem ver convites"}, 403
     
     invites = Invite.query.filter_by(procurement_id=proc_id).all()
+    suppliers = resolve_invite_suppliers(invites)
     
     result = []
     for inv in invites:
-        supplier = User.query.filter_by(email=inv.email, role=Role.FORNECEDOR).first()
+        supplier = suppliers.get(inv.email)
         result.append({
             "id": inv.id,
             "email": inv.email,
@@ -300,7 +527,12 @@ def accept_invite(token: str):
     
     invite.accepted = True
     invite.accepted_at = datetime.utcnow()
+    invite.supplier_user_id = user.id
+    timeline.record(invite.procurement_id, "invite.accepted", user.id, "invite", invite.id)
     db.session.commit()
+    audit.record("INVITE_ACCEPTED", user.id, "invite", invite.id, {
+        "procurement_id": invite.procurement_id
+    })
     
     # Notificar comprador
     socketio.emit("invite.accepted", {
@@ -343,18 +575,26 @@ def open_procurement(proc_id: int):
     
     proc.status = ProcurementStatus.ABERTO
     proc.updated_at = datetime.utcnow()
-    db.session.commit()
+    timeline.record(proc.id, "procurement.opened", user.id, "procurement", proc.id,
+                    status=proc.status.value,
+                    deadline=proc.deadline_proposals.isoformat() if proc.deadline_proposals else None)
     
-    # Notificar todos os fornecedores convidados
+    # Notificar todos os fornecedores convidados (um único INSERT multi-linha)
+    notifications = NotificationBatch()
     invites = Invite.query.filter_by(procurement_id=proc_id).all()
+    suppliers = resolve_invite_suppliers(invites)
     for inv in invites:
-        supplier = User.query.filter_by(email=inv.email, role=Role.FORNECEDOR).first()
+        supplier = suppliers.get(inv.email)
         if supplier:
-            socketio.emit("procurement.opened", {
+            notifications.add(supplier.id, "procurement.opened", {
                 "procurement_id": proc.id,
                 "title": proc.title,
                 "deadline": proc.deadline_proposals.isoformat() if proc.deadline_proposals else None
-            }, to=f"user:{supplier.id}")
+            })
+    notifications.flush()
+    db.session.commit()
+    sockets.procurement_status_changed(proc.id, proc.status)
+    notifications.emit()
     
     # Notificar sala do processo
     socketio.emit("procurement.opened", {
@@ -388,7 +628,10 @@ def close_procurement(proc_id: int):
     
     proc.status = ProcurementStatus.ANALISE_TECNICA
     proc.updated_at = datetime.utcnow()
+    timeline.record(proc.id, "procurement.closed", user.id, "procurement", proc.id,
+                    status=proc.status.value)
     db.session.commit()
+    sockets.procurement_status_changed(proc.id, proc.status)
     
     socketio.emit("procurement.closed", {
         "procurement_id": proc.id,
@@ -415,7 +658,9 @@ def get_proposals_comparison(proc_id: int):
     proc = Procurement.query.get_or_404(proc_id)
     
     # Buscar apenas propostas aprovadas tecnicamente
-    proposals = Proposal.query.filter_by(
+    proposals = Proposal.query.options(
+        joinedload(Proposal.supplier).joinedload(User.organization)
+    ).filter_by(
         procurement_id=proc_id,
         status=ProposalStatus.APROVADA_TECNICAMENTE
     ).all()
@@ -423,29 +668,53 @@ def get_proposals_comparison(proc_id: int):
     if not proposals:
         return {"error": "Nenhuma proposta aprovada tecnicamente"}, 404
     
+    # Matriz fornecedor × item numa consulta só, só com colunas numéricas: os
+    # valores já vêm em float (sem Decimal por célula) e viram as colunas
+    # NumPy da análise numa passada; os itens do TR vêm à parte, uma vez cada
+    proposal_ids = [prop.id for prop in proposals]
+    rows = db.session.execute(
+        select(
+            ProposalService.proposal_id,
+            ProposalService.service_item_id,
+            cast(ProposalService.qty, Float),
+            cast(ProposalPrice.unit_price, Float)
+        )
+        .join(ProposalPrice, and_(
+            ProposalPrice.proposal_id == ProposalService.proposal_id,
+            ProposalPrice.service_item_id == ProposalService.service_item_id
+        ))
+        .join(TRServiceItem, TRServiceItem.id == ProposalService.service_item_id)
+        .where(ProposalService.proposal_id.in_(proposal_ids))
+        .order_by(ProposalService.proposal_id, TRServiceItem.item_ordem)
+    ).all()
+    cells = matrix.columns(rows, 4)
+    quoted_ids = {int(i) for i in matrix.np().unique(cells[1])}
+    tr_items = [
+        item for item in TRServiceItem.query.join(TR).filter(TR.procurement_id == proc_id)
+        .order_by(TRServiceItem.item_ordem) if item.id in quoted_ids
+    ] if quoted_ids else []
+    item_by_id = {item.id: item for item in tr_items}
+    items_by_proposal = {pid: [] for pid in proposal_ids}
+    for pid, item_id, qty, unit_price in rows:
+        items_by_proposal[pid].append((qty, unit_price, item_by_id[item_id]))
+    anomalies = price_anomalies.analyze(proposal_ids, tr_items, cells, price_stats.lookup(tr_items))
+    deviation = {s.pop("proposal_id"): s for s in anomalies.pop("suppliers")}
+    
     comparison = []
     for prop in proposals:
         # Calcular total da proposta
         total_price = 0
         items_detail = []
         
-        for service in prop.service_items:
-            price = ProposalPrice.query.filter_by(
-                proposal_id=prop.id,
-                service_item_id=service.service_item_id
-            ).first()
-            
-            if price:
-                item_total = float(service.qty) * float(price.unit_price)
-                total_price += item_total
-                
-                tr_item = TRServiceItem.query.get(service.service_item_id)
-                items_detail.append({
-                    "descricao": tr_item.descricao,
-                    "qty": float(service.qty),
-                    "unit_price": float(price.unit_price),
-                    "total": item_total
-                })
+        for qty, unit_price, tr_item in items_by_proposal[prop.id]:
+            item_total = qty * unit_price
+            total_price += item_total
+            items_detail.append({
+                "descricao": tr_item.descricao,
+                "qty": qty,
+                "unit_price": unit_price,
+                "total": item_total
+            })
         
         comparison.append({
             "proposal_id": prop.id,
@@ -458,6 +727,7 @@ def get_proposals_comparison(proc_id: int):
             "warranty_terms": prop.warranty_terms,
             "technical_review": prop.technical_review,
             "items": items_detail,
+            "price_deviation": deviation[prop.id],
             "cost_benefit_score": (prop.technical_score or 0) / total_price if total_price > 0 else 0
         })
     
@@ -511,9 +781,19 @@ def get_proposals_comparison(proc_id: int):
         "risk_analysis": {
             "lowest_price_risk": "Baixo" if best_price["technical_score"] >= 70 else "Médio",
             "delivery_risk": "Avaliar prazos individualmente",
-            "quality_risk": "Baixo" if avg_score >= 75 else "Médio"
-        }
+            "quality_risk": "Baixo" if avg_score >= 75 else "Médio",
+            "price_risk": anomalies["price_risk"]
+        },
+        "price_anomalies": anomalies
     }
+    # Menor preço com erro de unidade ou item a zero: o total não é comparável
+    if best_price["price_deviation"]["flags"].keys() & {"unit_error", "zero_price"}:
+        ai_analysis["risk_analysis"]["lowest_price_risk"] = "Alto"
+    if anomalies["counts"]["unit_error"]:
+        ai_analysis["recommendations"].append(
+            f"Confirme as unidades de {anomalies['counts']['unit_error']} preço(s) com possível "
+            "erro de escala (×10, ×100 ou ×1000)"
+        )
     
     return {
         "proposals": comparison,
@@ -522,6 +802,51 @@ def get_proposals_comparison(proc_id: int):
     }
 
 
+@bp.get("/procurements/<int:proc_id>/comparison/export")
+@jwt_required()
+def export_proposals_comparison(proc_id: int):
+    """Comparativo em planilha (``format`` csv ou xlsx), por streaming - apenas COMPRADOR"""
+    user = get_current_user()
+    if user.role != Role.COMPRADOR:
+        return {"error": "Apenas compradores podem ver análise comparativa"}, 403
+    
+    fmt = request.args.get("format", "xlsx")
+    if fmt not in exports.FORMATS:
+        return {"error": "format deve ser csv ou xlsx"}, 400
+    
+    proc = Procurement.query.get_or_404(proc_id)
+    proposals = db.session.execute(
+        select(Proposal.id, User.full_name)
+        .join(User, User.id == Proposal.supplier_user_id)
+        .where(Proposal.procurement_id == proc_id, Proposal.status == ProposalStatus.APROVADA_TECNICAMENTE)
+        .order_by(Proposal.id)
+    ).all()
+    if not proposals or not proc.tr:
+        return {"error": "Nenhuma proposta aprovada tecnicamente"}, 404
+    
+    return exports.response(
+        fmt, f"processo-{proc_id}-comparativo", "Comparativo",
+        exports.comparison_header([name for _, name in proposals]),
+        exports.comparison_rows(proc.tr.id, proposals)
+    )
+
+
+@bp.get("/procurements/<int:proc_id>/quantity-deviation")
+@jwt_required()
+def get_quantity_deviation(proc_id: int):
+    """Desvio das quantidades propostas em relação ao TR - COMPRADOR e REQUISITANTE do processo"""
+    user = get_current_user()
+    if user.role not in [Role.COMPRADOR, Role.REQUISITANTE]:
+        return {"error": "Não autorizado"}, 403
+    
+    proc = Procurement.query.get_or_404(proc_id)
+    if user.role == Role.REQUISITANTE and proc.requisitante_id != user.id:
+        return {"error": "Você não é o requisitante deste processo"}, 403
+    
+    # Requisitante não vê valores (totais rebaseados e desvio ponderado por preço)
+    return quantity_report.for_role(quantity_report.get(proc), user.role == Role.COMPRADOR)
+
+
 @bp.get("/procurements/<int:proc_id>/proposals")
 @jwt_required()
 def list_procurement_proposals(proc_id: int):
@@ -533,6 +858,10 @@ def list_procurement_proposals(proc_id: int):
         return {"error": "Não autorizado"}, 403
     
     proposals = Proposal.query.filter_by(procurement_id=proc_id).all()
+    if not proposals:
+        archived = procurement_archive.load(proc_id)
+        if archived:
+            return jsonify(archived.proposals(user))
     
     result = []
     for prop in proposals:
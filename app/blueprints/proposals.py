@@ -7,10 +7,25 @@ from ..models import (
     Proposal, ProposalService, ProposalPrice, TRServiceItem, 
     ProposalStatus, Procurement, ProcurementStatus, User, Role
 )
+from ..utils import audit, exports, price_stats, procurement_archive, quantity_report, timeline
 from ..utils.auth import get_current_user
 bp = Blueprint("proposals", __name__)
 
 
+def _price_value(value):
+    """Preço em float para comparar e registrar na auditoria"""
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return value
+
+
+def _track_price(changes, service_item_id, old, new):
+    old, new = _price_value(old), _price_value(new)
+    if old != new:
+        changes.append({"service_item_id": service_item_id, "old": old, "new": new})
+
+
 @bp.post("/procurements/<int:proc_id>/proposals")
 @jwt_required()
 def create_or_update_proposal(proc_id: int):
@@ -90,6 +105,7 @@ def create_or_update_proposal(proc_id: int):
                 prop_service.technical_notes = technical_notes
     
     # Atualizar preços
+    price_changes = []
     if "prices" in data:
         for price_data in data["prices"]:
             service_item_id = price_data.get("service_item_id")
@@ -110,6 +126,8 @@ def create_or_update_proposal(proc_id: int):
                 service_item_id=service_item_id
             ).first()
             
+            _track_price(price_changes, service_item_id,
+                         prop_price.unit_price if prop_price else None, unit_price)
             if not prop_price:
                 prop_price = ProposalPrice(
                     proposal_id=proposal.id,
@@ -120,7 +138,17 @@ def create_or_update_proposal(proc_id: int):
             else:
                 prop_price.unit_price = unit_price
     
+    # Proposta já enviada: o índice de preços acompanha a correção
+    if proposal.commercial_submitted_at and price_changes:
+        price_stats.record_proposal(proposal.id)
+    if "service_items" in data or "prices" in data:
+        quantity_report.invalidate(proc_id)
     db.session.commit()
+    if price_changes:
+        audit.record("PRICES_UPDATED", user.id, "proposal", proposal.id, {
+            "procurement_id": proc_id,
+            "changes": price_changes
+        })
     
     # Notificar compradores
     socketio.emit("proposal.updated", {
@@ -166,6 +194,10 @@ def submit_proposal(proposal_id: int):
     proposal.status = ProposalStatus.ENVIADA
     proposal.technical_submitted_at = datetime.utcnow()
     proposal.commercial_submitted_at = datetime.utcnow()
+    timeline.record(proposal.procurement_id, "proposal.submitted", user.id,
+                    "proposal", proposal.id, supplier_user_id=proposal.supplier_user_id)
+    price_stats.record_proposal(proposal.id)
+    quantity_report.invalidate(proposal.procurement_id)
     
     db.session.commit()
     
@@ -190,7 +222,15 @@ def get_proposal_details(proposal_id: int):
     """Obtém detalhes completos da proposta"""
     user = get_current_user()
     
-    proposal = Proposal.query.get_or_404(proposal_id)
+    proposal = Proposal.query.get(proposal_id)
+    if proposal is None:
+        archived = procurement_archive.load_by_proposal(proposal_id)
+        if not archived:
+            return {"error": "Proposta não encontrada"}, 404
+        data = archived.proposal(proposal_id)
+        if user.role == Role.FORNECEDOR and data["supplier"]["id"] != user.id:
+            return {"error": "Não autorizado"}, 403
+        return data
     
     # Verificar permissões
     if user.role == Role.FORNECEDOR and proposal.supplier_user_id != user.id:
@@ -295,6 +335,7 @@ def upsert_quantities(proc_id: int):
         else:
             ps.qty = qty
     
+    quantity_report.invalidate(proc_id)
     db.session.commit()
     
     socketio.emit("proposal.tech.received", {
@@ -338,6 +379,7 @@ def upsert_prices(proc_id: int):
     proc = Procurement.query.get_or_404(proc_id)
     valid_item_ids = {r.id for r in TRServiceItem.query.filter_by(tr_id=proc.tr.id).all()}
     
+    price_changes = []
     for row in payload:
         sid = row.get("service_item_id")
         price = row.get("unit_price")
@@ -350,6 +392,7 @@ def upsert_prices(proc_id: int):
             service_item_id=sid
         ).first()
         
+        _track_price(price_changes, sid, pp.unit_price if pp else None, price)
         if not pp:
             pp = ProposalPrice(
                 proposal_id=proposal.id,
@@ -360,7 +403,17 @@ def upsert_prices(proc_id: int):
         else:
             pp.unit_price = price
     
+    # Proposta já enviada: o índice de preços acompanha a correção
+    if proposal.commercial_submitted_at and price_changes:
+        price_stats.record_proposal(proposal.id)
+    if price_changes:
+        quantity_report.invalidate(proc_id)
     db.session.commit()
+    if price_changes:
+        audit.record("PRICES_UPDATED", user.id, "proposal", proposal.id, {
+            "procurement_id": proc_id,
+            "changes": price_changes
+        })
     
     socketio.emit("proposal.comm.received", {
         "procurement_id": proc_id,
@@ -428,3 +481,21 @@ def list_commercial_items(proc_id: int):
         })
     
     return {"proposals": out}
+
+
+@bp.get("/proposals/<int:proc_id>/commercial-items/export")
+@jwt_required()
+def export_commercial_items(proc_id: int):
+    """Consolidado por item em planilha (``format`` csv ou xlsx), por streaming"""
+    user = get_current_user()
+    
+    fmt = request.args.get("format", "xlsx")
+    if fmt not in exports.FORMATS:
+        return {"error": "format deve ser csv ou xlsx"}, 400
+    
+    # Se fornecedor, só enxerga sua própria proposta
+    supplier_user_id = user.id if user.role == Role.FORNECEDOR else None
+    return exports.response(
+        fmt, f"processo-{proc_id}-itens-comerciais", "Itens comerciais",
+        exports.COMMERCIAL_HEADER, exports.commercial_rows(proc_id, supplier_user_id)
+    )
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required
+from ..utils import search
+from ..utils.auth import get_current_user
+
+bp = Blueprint("search", __name__)
+
+MAX_PAGE_SIZE = 100
+
+
+@bp.get("/search")
+@jwt_required()
+def search_trs():
+    """Busca textual em TRs e processos, por relevância (``cursor`` = próxima página)"""
+    user = get_current_user()
+    if not user:
+        return {"error": "Usuario nao encontrado"}, 404
+
+    limit = max(min(request.args.get("limit", 20, type=int), MAX_PAGE_SIZE), 1)
+    try:
+        result = search.search(user, request.args.get("q"), limit, request.args.get("cursor"))
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    result["q"] = request.args.get("q")
+    return result
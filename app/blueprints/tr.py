@@ -4,7 +4,9 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from .. import db, socketio
 from ..models import TR, TRServiceItem, Procurement, TRStatus, ProcurementStatus, Proposal, ProposalStatus, User, Role
+from ..utils import audit, price_stats, procurement_archive, quantity_report, search, timeline
 from ..utils.auth import get_current_user
+from ..utils.notifications import NotificationBatch
 
 bp = Blueprint("tr", __name__)
 
@@ -30,6 +32,8 @@ def create_or_update_tr(proc_id: int):
     if not tr:
         tr = TR(procurement_id=proc_id, created_by=user.id)
         db.session.add(tr)
+        db.session.flush()
+        timeline.record(proc_id, "tr.created", user.id, "tr", tr.id)
         action = "TR_CREATED"
     else:
         action = "TR_UPDATED"
@@ -69,8 +73,15 @@ def create_or_update_tr(proc_id: int):
                 qtde=item.get("qtde", 1)
             )
             db.session.add(service_item)
+        quantity_report.invalidate(proc_id)
     
+    search.index_tr(tr, proc)
     db.session.commit()
+    audit.record(action, user.id, "tr", tr.id, {
+        "procurement_id": proc_id,
+        "fields": [f for f in fields if f in data],
+        "service_items": len(data["planilha_servico"]) if isinstance(data.get("planilha_servico"), list) else None
+    })
     
     # Emitir evento real-time
     socketio.emit("tr.saved", {
@@ -119,8 +130,11 @@ def submit_tr_for_approval(tr_id: int):
     # Atualizar status do processo
     proc = Procurement.query.get(tr.procurement_id)
     proc.status = ProcurementStatus.TR_SUBMETIDO
+    timeline.record(proc.id, "tr.submitted", user.id, "tr", tr.id, status=proc.status.value)
+    search.index_tr(tr, proc)
     
     db.session.commit()
+    audit.record("TR_SUBMITTED", user.id, "tr", tr.id, {"procurement_id": tr.procurement_id})
     
     # Notificar compradores em real-time
     socketio.emit("tr.submitted", {
@@ -147,7 +161,14 @@ def get_tr_details(proc_id: int):
     tr = TR.query.filter_by(procurement_id=proc_id).first()
     
     if not tr:
-        return {"error": "TR não encontrado para este processo"}, 404
+        archived = procurement_archive.load(proc_id)
+        if not archived or not archived.tr:
+            return {"error": "TR não encontrado para este processo"}, 404
+        if user.role == Role.FORNECEDOR and archived.tr["status"] != TRStatus.APROVADO.value:
+            return {"error": "TR não disponível"}, 403
+        if user.role == Role.REQUISITANTE and archived.procurement["requisitante_id"] != user.id:
+            return {"error": "Não autorizado"}, 403
+        return archived.tr_detail()
     
     # Fornecedores só podem ver TR aprovados
     if user.role == Role.FORNECEDOR and tr.status != TRStatus.APROVADO:
@@ -247,15 +268,25 @@ def approve_tr(tr_id: int):
     else:
         return {"error": "Ação inválida"}, 400
     
-    db.session.commit()
+    timeline.record(proc.id, "tr.approved" if action == "approve" else "tr.rejected",
+                    user.id, "tr", tr.id, status=proc.status.value, comments=comments)
+    search.index_tr(tr, proc)
     
     # Notificar requisitante
-    socketio.emit("tr.approval_result", {
+    notifications = NotificationBatch()
+    notifications.add(tr.created_by, "tr.approval_result", {
         "tr_id": tr.id,
         "procurement_id": tr.procurement_id,
         "approved": action == "approve",
         "comments": comments
-    }, to=f"user:{tr.created_by}")
+    })
+    notifications.flush()
+    db.session.commit()
+    notifications.emit()
+    audit.record("TR_APPROVED" if action == "approve" else "TR_REJECTED", user.id, "tr", tr.id, {
+        "procurement_id": tr.procurement_id,
+        "comments": comments
+    })
     
     return {
         "message": message,
@@ -297,7 +328,14 @@ def review_technical_proposal(tr_id: int):
     else:
         proposal.status = ProposalStatus.REJEITADA_TECNICAMENTE
     
+    timeline.record(proposal.procurement_id, "proposal.technical_reviewed", user.id,
+                    "proposal", proposal.id, approved=bool(approved), score=score)
     db.session.commit()
+    audit.record(
+        "PROPOSAL_TECH_APPROVED" if approved else "PROPOSAL_TECH_REJECTED",
+        user.id, "proposal", proposal.id,
+        {"procurement_id": proposal.procurement_id, "tr_id": tr_id, "score": score}
+    )
     
     # Notificar comprador e fornecedor
     socketio.emit("proposal.technical_reviewed", {
@@ -369,7 +407,13 @@ def create_independent_tr():
             )
             db.session.add(service_item)
     
+    search.index_tr(tr)
     db.session.commit()
+    audit.record("TR_CREATED", user.id, "tr", tr.id, {
+        "procurement_id": None,
+        "fields": [f for f in data if f != "planilha_servico" and hasattr(TR, f)],
+        "service_items": len(data.get("planilha_servico") or [])
+    })
     
     # Notificar compradores
     socketio.emit("tr.created", {
@@ -441,19 +485,49 @@ def update_tr_by_id(tr_id: int):
                 qtde=item.get("qtde", 1)
             )
             db.session.add(service_item)
+        if tr.procurement_id:
+            quantity_report.invalidate(tr.procurement_id)
 
+    search.index_tr(tr)
     db.session.commit()
-
-    # Emite evento em tempo real para outros usuários no processo
-    socketio.emit("tr.saved", {
+    audit.record("TR_UPDATED", user.id, "tr", tr.id, {
         "procurement_id": tr.procurement_id,
-        "tr_id": tr.id,
-        "status": tr.status.value,
-        "updated_by": user.id
-    }, to=f"proc:{tr.procurement_id}" if tr.procurement_id else None)
+        "fields": [f for f in updatable_fields if f in data],
+        "service_items": len(data["planilha_servico"]) if isinstance(data.get("planilha_servico"), list) else None
+    })
+
+    # Emite evento em tempo real para outros usuários no processo.  TR
+    # independente não tem sala; ``to=None`` enviaria para todas as conexões.
+    if tr.procurement_id:
+        socketio.emit("tr.saved", {
+            "procurement_id": tr.procurement_id,
+            "tr_id": tr.id,
+            "status": tr.status.value,
+            "updated_by": user.id
+        }, to=f"proc:{tr.procurement_id}")
 
     return {
         "tr_id": tr.id,
         "status": tr.status.value,
         "message": "TR atualizado com sucesso"
     }
+
+
+@bp.get("/tr/<int:tr_id>/reference-prices")
+@jwt_required()
+def get_reference_prices(tr_id: int):
+    """Preços de referência históricos dos itens do TR - REQUISITANTE dono e COMPRADOR"""
+    user = get_current_user()
+    if user.role == Role.FORNECEDOR:
+        return {"error": "Não autorizado"}, 403
+
+    tr = TR.query.get_or_404(tr_id)
+    if user.role == Role.REQUISITANTE:
+        if tr.procurement_id:
+            proc = Procurement.query.get(tr.procurement_id)
+            if proc.requisitante_id != user.id:
+                return {"error": "Você não é o requisitante deste processo"}, 403
+        elif tr.created_by != user.id:
+            return {"error": "Você não criou este TR"}, 403
+
+    return price_stats.reference_prices(tr)
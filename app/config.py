@@ -15,3 +15,124 @@ class Config:
         SQLALCHEMY_DATABASE_URI = "sqlite:///concorrencia.db"
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # db.create_all() na inicialização: só no fallback SQLite local.  Com
+    # DATABASE_URL o esquema é responsabilidade de ``flask schema upgrade``
+    # (app/migrations), executado antes de subir a aplicação.
+    SCHEMA_AUTO_CREATE = os.getenv("SCHEMA_AUTO_CREATE", "0" if DATABASE_URL else "1") == "1"
+
+    # Pool de conexões.  No modo threading cada requisição em andamento segura
+    # uma conexão; quem passa de DB_POOL_SIZE + DB_MAX_OVERFLOW espera até
+    # DB_POOL_TIMEOUT segundos e recebe 503 (ver app/utils/database.py).
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # Segundos inteiros: o Flask-SQLAlchemy monta o engine via
+    # engine_from_config, que converte pool_timeout com int()
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+    # Reciclar antes do timeout de ociosidade do Postgres/proxy do Render
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    # Tempo máximo de cada statement no Postgres (0 desliga)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    # PgBouncer em transaction pooling não aceita parâmetros de startup: o
+    # statement_timeout passa a ser aplicado com SET LOCAL a cada transação
+    DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # SQLite em memória usa um pool de conexão única, sem estes parâmetros
+    if SQLALCHEMY_DATABASE_URI not in ("sqlite://", "sqlite:///:memory:"):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    if SQLALCHEMY_DATABASE_URI.startswith("postgresql"):
+        SQLALCHEMY_ENGINE_OPTIONS["connect_args"] = {"application_name": "concorrencia-api"}
+        if DB_STATEMENT_TIMEOUT_MS and not DB_PGBOUNCER:
+            SQLALCHEMY_ENGINE_OPTIONS["connect_args"]["options"] = (
+                f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+            )
+
+    # Perfil SQLite (app/utils/sqlite.py) para o fallback local/on-prem:
+    # WAL, busy_timeout, cache e mmap, com fila única de escrita no processo
+    SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1") == "1"
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "1") == "1"
+
+    # Réplicas de leitura (app/utils/replicas.py), separadas por vírgula.
+    # GETs leem de uma réplica; após escrever, o usuário lê do primário por
+    # REPLICA_STICKY_SECONDS para enxergar as próprias alterações.
+    DATABASE_REPLICA_URLS = [
+        url.strip().replace("postgres://", "postgresql+psycopg2://")
+        for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    SQLALCHEMY_BINDS = {f"replica_{n}": url for n, url in enumerate(DATABASE_REPLICA_URLS)}
+    REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
+    # Segundos sugeridos no Retry-After quando o banco está saturado
+    DB_RETRY_AFTER = int(os.getenv("DB_RETRY_AFTER", "2"))
+
+    # Realtime.  ``SOCKETIO_SERIALIZER`` escolhe o codec dos pacotes Socket.IO:
+    # "default" (JSON texto) ou "msgpack" (binário, requer o pacote msgpack).
+    # O frontend descobre o codec pela página e carrega o parser equivalente.
+    SOCKETIO_SERIALIZER = os.getenv("SOCKETIO_SERIALIZER", "default")
+    # Compressão deflate/gzip dos pacotes enviados por long-polling acima do
+    # limite em bytes.  O transporte WebSocket (simple-websocket) não negocia
+    # permessage-deflate; nesse caso a compressão fica a cargo do proxy.
+    SOCKETIO_HTTP_COMPRESSION = os.getenv("SOCKETIO_HTTP_COMPRESSION", "1") == "1"
+    SOCKETIO_COMPRESSION_THRESHOLD = int(os.getenv("SOCKETIO_COMPRESSION_THRESHOLD", "1024"))
+    # Fila de mensagens compartilhada (ex.: redis://localhost:6379/0) para que
+    # eventos emitidos em um worker cheguem aos clientes conectados nos demais
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+    # Segundos em que um worker confia na visibilidade pública de um processo
+    # lida do banco; mudanças feitas em outro worker aparecem depois disso
+    SOCKETIO_VISIBILITY_TTL = float(os.getenv("SOCKETIO_VISIBILITY_TTL", "30"))
+
+    # Instrumentação de consultas (app/utils/query_stats.py): formato de
+    # statement repetido a partir deste número de vezes é tratado como N+1
+    QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_N_PLUS_ONE_THRESHOLD", "5"))
+    # Cabeçalhos X-DB-* também fora do modo debug
+    QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "0") == "1"
+
+    # /metrics (formato Prometheus).  Se definido, exige
+    # ``Authorization: Bearer <METRICS_TOKEN>``
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # Operadores com acesso aos endpoints de /api/admin (lista separada por vírgulas)
+    ADMIN_EMAILS = {
+        e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()
+    }
+
+    # Profiler sob demanda (app/utils/profiler.py): cabeçalho X-Profile
+    # assinado com PROFILE_SECRET e/ou amostragem de uma fração das requisições
+    PROFILE_SECRET = os.getenv("PROFILE_SECRET")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+    # Auditoria (app/utils/audit.py): eventos enfileirados em memória e
+    # gravados em lote por uma thread de fundo
+    AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "1") == "1"
+    AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+    # Partições mensais no Postgres (app/utils/audit_store.py) e arquivamento
+    # dos meses antigos em JSONL compactado (``flask audit archive``)
+    AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "3"))
+    AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "12"))
+    AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", os.path.join(os.getcwd(), "audit-archive"))
+
+    # Processos FINALIZADO/CANCELADO sem alteração há este número de dias
+    # vão para procurement_archives (``flask procurements archive``)
+    PROCUREMENT_ARCHIVE_AFTER_DAYS = int(os.getenv("PROCUREMENT_ARCHIVE_AFTER_DAYS", "30"))
+
+    # Preços de referência (app/utils/price_stats.py): abaixo deste número de
+    # preços por (codigo, unid) a estatística não é exibida, para não expor
+    # o preço de um fornecedor isolado
+    PRICE_STATS_MIN_SAMPLES = int(os.getenv("PRICE_STATS_MIN_SAMPLES", "3"))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Migrações versionadas do esquema e backfills online
+
+    flask schema status
+    flask schema upgrade [--to 0007] [--chunk-size 5000] [--throttle 0.05]
+    flask schema stamp [--to 0007]     # banco já migrado pelo script antigo
+
+Novas migrações entram em ``versions.py`` com ``@migration``.
+"""
+
+import click
+from flask.cli import with_appcontext
+
+from . import versions  # noqa: F401  (registra as migrações)
+from .runner import (
+    MIGRATIONS, MigrationError, is_current, migration, pending, stamp, status, upgrade
+)
+
+__all__ = [
+    "MIGRATIONS", "MigrationError", "is_current", "migration", "pending", "stamp",
+    "status", "upgrade", "schema_cli",
+]
+
+
+def _engine():
+    from .. import db
+    return db.engine
+
+
+@click.group("schema")
+def schema_cli():
+    """Migrações do esquema do banco"""
+
+
+@schema_cli.command("status")
+@with_appcontext
+def status_command():
+    for version, name, applied_at, checkpoints in status(_engine()):
+        mark = f"aplicada {applied_at:%Y-%m-%d %H:%M}" if applied_at else "PENDENTE"
+        click.echo(f"{version}  {mark:24} {name}")
+        if not applied_at:
+            for cp in checkpoints:
+                state = "concluído" if cp.done else f"até id {cp.last_key}"
+                click.echo(f"        {cp.step}: {state}, {cp.rows} linhas")
+
+
+@schema_cli.command("upgrade")
+@click.option("--to", "target", help="Aplica até esta versão (inclusive)")
+@click.option("--chunk-size", default=5000, show_default=True, help="Faixa de ids por lote dos backfills")
+@click.option("--throttle", default=0.0, show_default=True, help="Pausa em segundos entre lotes")
+@with_appcontext
+def upgrade_command(target, chunk_size, throttle):
+    try:
+        applied = upgrade(_engine(), target, chunk_size=chunk_size, throttle=throttle, log=click.echo)
+    except MigrationError as exc:
+        raise click.ClickException(str(exc))
+    if applied:
+        click.echo(f"✅ {len(applied)} migração(ões) aplicada(s)")
+
+
+@schema_cli.command("stamp")
+@click.option("--to", "target", help="Marca até esta versão (inclusive)")
+@with_appcontext
+def stamp_command(target):
+    versions_ = stamp(_engine(), target)
+    click.echo(f"{len(versions_)} migração(ões) marcada(s) como aplicada(s)")
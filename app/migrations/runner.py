@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Executor de migrações versionadas
+
+Cada migração é uma função registrada com ``@migration(versao, descricao)``
+que recebe um ``MigrationContext``.  Os helpers do contexto são idempotentes
+(conferem o catálogo antes de alterar) e cada um roda na sua própria
+transação curta, para não segurar locks em tabelas grandes:
+
+* ``add_column`` / ``create_index`` / ``create_tables``;
+* ``backfill``: UPDATE aplicado em faixas da chave (``:lo <= id < :hi``),
+  com pausa entre lotes, relatório de progresso e checkpoint gravado na
+  mesma transação de cada lote.  Se o processo cair, a próxima execução
+  continua da última faixa concluída.
+
+As versões aplicadas ficam em ``schema_migrations`` e os checkpoints em
+``migration_checkpoints``.  No Postgres um advisory lock impede duas
+execuções simultâneas.
+"""
+
+import time
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, Integer, MetaData, String, Table,
+    inspect, select, text
+)
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations", metadata,
+    Column("version", String(32), primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+    Column("duration_ms", Integer),
+)
+
+migration_checkpoints = Table(
+    "migration_checkpoints", metadata,
+    Column("version", String(32), primary_key=True),
+    Column("step", String(64), primary_key=True),
+    Column("last_key", BigInteger),
+    Column("rows", BigInteger, nullable=False, default=0),
+    Column("done", Boolean, nullable=False, default=False),
+    Column("updated_at", DateTime),
+)
+
+# Chave arbitrária do advisory lock das migrações
+ADVISORY_LOCK_KEY = 72_040_001
+
+MIGRATIONS = []
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    __slots__ = ("version", "name", "fn")
+
+    def __init__(self, version, name, fn):
+        self.version = version
+        self.name = name
+        self.fn = fn
+
+
+def migration(version: str, name: str):
+    """Registra uma migração; as versões são ordenadas como texto ("0001"...)"""
+    def decorator(fn):
+        if any(m.version == version for m in MIGRATIONS):
+            raise MigrationError(f"versão duplicada: {version}")
+        MIGRATIONS.append(Migration(version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return decorator
+
+
+class MigrationContext:
+    def __init__(self, engine, version, chunk_size=5000, throttle=0.0, log=print):
+        self.engine = engine
+        self.version = version
+        self.chunk_size = chunk_size
+        self.throttle = throttle
+        self.log = log
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    def execute(self, sql, **params):
+        with self.engine.begin() as conn:
+            return conn.execute(text(sql), params)
+
+    # -- esquema --------------------------------------------------------
+
+    def has_table(self, table) -> bool:
+        return inspect(self.engine).has_table(table)
+
+    def has_column(self, table, column) -> bool:
+        return any(c["name"] == column for c in inspect(self.engine).get_columns(table))
+
+    def has_index(self, table, name) -> bool:
+        return any(i["name"] == name for i in inspect(self.engine).get_indexes(table))
+
+    def add_column(self, table, column, ddl):
+        """``ALTER TABLE ADD COLUMN`` se ainda não existir (coluna anulável: sem reescrita)"""
+        if self.has_column(table, column):
+            self.log(f"   = {table}.{column} já existe")
+            return
+        self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        self.log(f"   + {table}.{column}")
+
+    def create_index(self, name, table, columns, unique=False, using=None):
+        """No Postgres usa ``CONCURRENTLY``: não bloqueia escritas na tabela"""
+        if self.has_index(table, name):
+            self.log(f"   = índice {name} já existe")
+            return
+        cols = ", ".join(columns)
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        if self.dialect == "postgresql":
+            method = f" USING {using}" if using else ""
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table}{method} ({cols})"))
+        else:
+            self.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({cols})")
+        self.log(f"   + índice {name}")
+
+    def create_tables(self, *tables):
+        for table in tables:
+            if self.has_table(table.name):
+                self.log(f"   = tabela {table.name} já existe")
+                continue
+            table.create(self.engine, checkfirst=True)
+            self.log(f"   + tabela {table.name}")
+
+    # -- dados ----------------------------------------------------------
+
+    def _checkpoint(self, conn, step):
+        return conn.execute(
+            select(migration_checkpoints).where(
+                migration_checkpoints.c.version == self.version,
+                migration_checkpoints.c.step == step,
+            )
+        ).first()
+
+    def _save_checkpoint(self, conn, step, last_key, rows, done=False):
+        values = {"last_key": last_key, "rows": rows, "done": done, "updated_at": datetime.utcnow()}
+        updated = conn.execute(
+            migration_checkpoints.update().where(
+                migration_checkpoints.c.version == self.version,
+                migration_checkpoints.c.step == step,
+            ).values(**values)
+        ).rowcount
+        if not updated:
+            conn.execute(migration_checkpoints.insert().values(
+                version=self.version, step=step, **values
+            ))
+
+    def backfill(self, step, table, sql, key="id", chunk_size=None):
+        """Executa ``sql`` (com ``:lo``/``:hi`` sobre ``key``) em faixas retomáveis"""
+        chunk = chunk_size or self.chunk_size
+        with self.engine.begin() as conn:
+            state = self._checkpoint(conn, step)
+            if state and state.done:
+                self.log(f"   = {step}: concluído anteriormente ({state.rows} linhas)")
+                return state.rows
+            low, high = conn.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table}")).first()
+
+        if low is None:
+            with self.engine.begin() as conn:
+                self._save_checkpoint(conn, step, None, 0, done=True)
+            self.log(f"   = {step}: tabela {table} vazia")
+            return 0
+
+        rows = state.rows if state else 0
+        start = state.last_key + 1 if state and state.last_key is not None else low
+        if start > low:
+            self.log(f"   > {step}: retomando a partir de {key}={start}")
+        span = max(high - low + 1, 1)
+        started = time.perf_counter()
+        lo = start
+        while lo <= high:
+            hi = lo + chunk
+            with self.engine.begin() as conn:
+                rows += conn.execute(text(sql), {"lo": lo, "hi": hi}).rowcount or 0
+                self._save_checkpoint(conn, step, hi - 1, rows)
+            done_pct = min((hi - low) / span, 1) * 100
+            rate = rows / max(time.perf_counter() - started, 1e-9)
+            self.log(f"   . {step}: {done_pct:5.1f}%  {rows} linhas  ({rate:.0f} linhas/s)")
+            lo = hi
+            if self.throttle and lo <= high:
+                time.sleep(self.throttle)
+
+        with self.engine.begin() as conn:
+            self._save_checkpoint(conn, step, high, rows, done=True)
+        self.log(f"   ✓ {step}: {rows} linhas")
+        return rows
+
+
+def _lock(conn):
+    if conn.dialect.name != "postgresql":
+        return
+    if not conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": ADVISORY_LOCK_KEY}).scalar():
+        raise MigrationError("outra execução de migrações está em andamento")
+
+
+def applied_versions(engine) -> dict:
+    metadata.create_all(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return {row.version: row for row in conn.execute(select(schema_migrations))}
+
+
+def _record(engine, m, duration_ms):
+    with engine.begin() as conn:
+        conn.execute(schema_migrations.insert().values(
+            version=m.version, name=m.name, applied_at=datetime.utcnow(), duration_ms=duration_ms
+        ))
+
+
+def pending(engine, target=None):
+    applied = applied_versions(engine)
+    return [m for m in MIGRATIONS
+            if m.version not in applied and (target is None or m.version <= target)]
+
+
+def upgrade(engine, target=None, chunk_size=5000, throttle=0.0, log=print):
+    """Aplica as migrações pendentes em ordem; devolve as versões aplicadas"""
+    todo = pending(engine, target)
+    if not todo:
+        log("Esquema atualizado, nada a fazer")
+        return []
+
+    done = []
+    # A conexão do lock fica aberta durante toda a execução
+    with engine.connect() as lock_conn:
+        _lock(lock_conn)
+        # O advisory lock é de sessão: não deixa transação aberta
+        lock_conn.commit()
+        try:
+            for m in todo:
+                log(f"-> {m.version} {m.name}")
+                started = time.perf_counter()
+                m.fn(MigrationContext(engine, m.version, chunk_size, throttle, log))
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                _record(engine, m, duration_ms)
+                done.append(m.version)
+                log(f"   ok ({duration_ms} ms)")
+        finally:
+            if lock_conn.dialect.name == "postgresql":
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": ADVISORY_LOCK_KEY})
+                lock_conn.commit()
+    return done
+
+
+def is_current(engine) -> bool:
+    """Todas as migrações aplicadas?  Somente leitura (usado pelo /readyz)"""
+    if not inspect(engine).has_table("schema_migrations"):
+        return False
+    with engine.connect() as conn:
+        applied = {version for (version,) in conn.execute(select(schema_migrations.c.version))}
+    return all(m.version in applied for m in MIGRATIONS)
+
+
+def stamp(engine, target=None):
+    """Marca as migrações como aplicadas sem executá-las (bancos já migrados)"""
+    todo = pending(engine, target)
+    for m in todo:
+        _record(engine, m, None)
+    return [m.version for m in todo]
+
+
+def status(engine):
+    """[(versão, nome, aplicada_em, progresso dos backfills), ...]"""
+    applied = applied_versions(engine)
+    with engine.connect() as conn:
+        checkpoints = {}
+        for row in conn.execute(select(migration_checkpoints)):
+            checkpoints.setdefault(row.version, []).append(row)
+    return [
+        (m.version, m.name,
+         applied[m.version].applied_at if m.version in applied else None,
+         checkpoints.get(m.version, []))
+        for m in MIGRATIONS
+    ]
+
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Migrações do esquema, em ordem
+
+As etapas 0002-0007 portam o antigo ``app/migrate-complete.py`` (e o
+``fix_db.py``) com os backfills em lotes.  Em bancos que já rodaram o
+script antigo as alterações de esquema são detectadas e puladas, e os
+backfills só tocam linhas ainda pendentes.
+"""
+
+from sqlalchemy import text
+
+from .runner import migration
+
+# Mapeamento do status do TR para o status do processo (etapas pré-abertura)
+TR_TO_PROCUREMENT_STATUS = (
+    ("RASCUNHO", "TR_CRIADO"),
+    ("SUBMETIDO", "TR_SUBMETIDO"),
+    ("APROVADO", "TR_APROVADO"),
+    ("REJEITADO", "TR_REJEITADO"),
+)
+PRE_OPENING_STATUSES = "('TR_PENDENTE', 'TR_CRIADO', 'TR_SUBMETIDO', 'TR_APROVADO', 'TR_REJEITADO')"
+
+
+@migration("0001", "Esquema base (tabelas dos modelos)")
+def baseline(m):
+    from .. import db
+    from .. import models  # noqa: F401
+
+    # Cria apenas as tabelas ausentes; não altera tabelas existentes
+    m.create_tables(*db.metadata.sorted_tables)
+
+
+@migration("0002", "procurements.requisitante_id")
+def procurement_requisitante(m):
+    m.add_column("procurements", "requisitante_id", "INTEGER REFERENCES users(id)")
+
+
+@migration("0003", "tr_terms.rejection_reason")
+def tr_rejection_reason(m):
+    m.add_column("tr_terms", "rejection_reason", "TEXT")
+
+
+@migration("0004", "Vínculo invites.supplier_user_id")
+def invite_supplier_user(m):
+    m.add_column("invites", "supplier_user_id", "INTEGER REFERENCES users(id)")
+    m.create_index("ix_invites_supplier_user_id", "invites", ["supplier_user_id"])
+    m.backfill("supplier_user_id", "invites", """
+        UPDATE invites
+        SET supplier_user_id = (
+            SELECT users.id FROM users
+            WHERE users.email = invites.email AND users.role = 'FORNECEDOR'
+        )
+        WHERE id >= :lo AND id < :hi
+          AND supplier_user_id IS NULL
+          AND email IN (SELECT email FROM users WHERE role = 'FORNECEDOR')
+    """)
+
+
+@migration("0005", "Status legados de processos (RASCUNHO/DRAFT/OPEN)")
+def legacy_procurement_status(m):
+    # CAST: no Postgres a coluna é enum e os valores antigos não existem nele
+    for old, new in (("RASCUNHO", "TR_PENDENTE"), ("DRAFT", "TR_PENDENTE"), ("OPEN", "ABERTO")):
+        m.backfill(f"status_{old.lower()}", "procurements", f"""
+            UPDATE procurements SET status = '{new}'
+            WHERE id >= :lo AND id < :hi AND CAST(status AS VARCHAR(32)) = '{old}'
+        """)
+
+
+@migration("0006", "Requisitante dos processos existentes")
+def assign_requisitante(m):
+    m.backfill("requisitante_criador", "procurements", """
+        UPDATE procurements SET requisitante_id = created_by
+        WHERE id >= :lo AND id < :hi
+          AND requisitante_id IS NULL
+          AND created_by IN (SELECT id FROM users WHERE role = 'REQUISITANTE')
+    """)
+    # Processos restantes ficam com o primeiro requisitante cadastrado
+    m.backfill("requisitante_padrao", "procurements", """
+        UPDATE procurements
+        SET requisitante_id = (SELECT MIN(id) FROM users WHERE role = 'REQUISITANTE')
+        WHERE id >= :lo AND id < :hi
+          AND requisitante_id IS NULL
+          AND EXISTS (SELECT 1 FROM users WHERE role = 'REQUISITANTE')
+    """)
+
+
+@migration("0007", "Status dos processos sincronizado com o TR")
+def sync_status_with_tr(m):
+    # Um UPDATE por status e por lote em vez de um por processo.  Só processos
+    # ainda na fase de TR: os já abertos ou encerrados não regridem.
+    for tr_status, proc_status in TR_TO_PROCUREMENT_STATUS:
+        m.backfill(f"tr_{tr_status.lower()}", "procurements", f"""
+            UPDATE procurements SET status = '{proc_status}'
+            WHERE id >= :lo AND id < :hi
+              AND status IN {PRE_OPENING_STATUSES}
+              AND status <> '{proc_status}'
+              AND EXISTS (
+                  SELECT 1 FROM tr_terms
+                  WHERE tr_terms.procurement_id = procurements.id
+                    AND tr_terms.status = '{tr_status}'
+              )
+        """)
+
+
+# Tabela-mãe particionada de audit_logs (Postgres).  A PK inclui a chave de
+# partição; o id continua vindo da sequência da tabela original.
+AUDIT_LOGS_PARTITIONED_DDL = """
+    CREATE TABLE audit_logs (
+        id BIGINT NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        action VARCHAR(100) NOT NULL,
+        entity_type VARCHAR(50),
+        entity_id INTEGER,
+        details JSON,
+        ip_address VARCHAR(45),
+        created_at TIMESTAMP NOT NULL DEFAULT timezone('utc', now()),
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+"""
+AUDIT_LOGS_COLUMNS = "id, user_id, action, entity_type, entity_id, details, ip_address, created_at"
+
+
+@migration("0008", "audit_logs: índices de consulta e partições mensais (Postgres)")
+def audit_logs_partitions(m):
+    from ..models import AuditLog
+    from ..utils.audit_store import ensure_partitions, is_partitioned
+
+    indexes = [(ix.name, [c.name for c in ix.columns]) for ix in AuditLog.__table__.indexes]
+    if m.dialect != "postgresql":
+        for name, columns in indexes:
+            m.create_index(name, "audit_logs", columns)
+        return
+
+    # 1) Troca a tabela comum pela particionada numa transação curta (só
+    #    DDL); os dados antigos ficam em audit_logs_legacy
+    with m.engine.begin() as conn:
+        if not is_partitioned(conn):
+            conn.execute(text("ALTER TABLE audit_logs RENAME TO audit_logs_legacy"))
+            conn.execute(text("ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_pkey TO audit_logs_legacy_pkey"))
+            # A sequência passa para a tabela nova (não cai com a antiga)
+            conn.execute(text("ALTER SEQUENCE audit_logs_id_seq AS BIGINT OWNED BY NONE"))
+            for name, _ in indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.execute(text(AUDIT_LOGS_PARTITIONED_DDL))
+            conn.execute(text("ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id"))
+            for name, columns in indexes:
+                conn.execute(text(f"CREATE INDEX {name} ON audit_logs ({', '.join(columns)})"))
+            conn.execute(text("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT"))
+            m.log("   + audit_logs particionada (antiga renomeada para audit_logs_legacy)")
+
+    # 2) Partições desde o evento mais antigo e cópia em lotes (retomável)
+    oldest = None
+    if m.has_table("audit_logs_legacy"):
+        with m.engine.connect() as conn:
+            oldest = conn.execute(text("SELECT MIN(created_at) FROM audit_logs_legacy")).scalar()
+    ensure_partitions(m.engine, since=oldest, log=m.log)
+    if m.has_table("audit_logs_legacy"):
+        m.backfill("copiar_legado", "audit_logs_legacy", f"""
+            INSERT INTO audit_logs ({AUDIT_LOGS_COLUMNS})
+            SELECT id, user_id, action, entity_type, entity_id, details, ip_address,
+                   COALESCE(created_at, timezone('utc', now()))
+            FROM audit_logs_legacy
+            WHERE id >= :lo AND id < :hi
+        """)
+        m.execute("DROP TABLE audit_logs_legacy")
+        m.log("   - audit_logs_legacy")
+
+
+@migration("0009", "procurement_events (linha do tempo) com histórico reconstruído")
+def procurement_events(m):
+    from ..models import ProcurementEvent
+    from ..utils import timeline
+
+    m.create_tables(ProcurementEvent.__table__)
+    for source in timeline.BACKFILL_SOURCES:
+        m.backfill(source[0], source[1], timeline.backfill_sql(m.dialect, source))
+
+
+@migration("0010", "procurement_archives e archived_proposals (processos encerrados)")
+def procurement_archives(m):
+    from ..models import ArchivedProposal, ProcurementArchive
+
+    m.create_tables(ProcurementArchive.__table__, ArchivedProposal.__table__)
+
+
+@migration("0011", "tr_search_documents (busca textual em TRs)")
+def tr_search_documents(m):
+    from ..models import TRSearchDocument
+    from ..utils import search
+
+    m.create_tables(TRSearchDocument.__table__)
+    # Postgres: coluna gerada antes do backfill (tabela vazia, sem reescrita) e
+    # GIN no fim; SQLite: FTS5 e triggers antes, o backfill já indexa
+    if m.dialect == "postgresql":
+        m.add_column(search.TABLE, "document", search.DOCUMENT_DDL)
+    else:
+        search.ensure_index(m.engine)
+    m.backfill("tr_documents", "tr_terms", search.backfill_sql(m.dialect))
+    # Processos já arquivados (0010): documentos a partir dos snapshots
+    m.log(f"   ✓ arquivados: {search.index_archives()} documento(s)")
+    if m.dialect == "postgresql":
+        m.create_index(search.GIN_INDEX, search.TABLE, ["document"], using="gin")
+
+
+@migration("0012", "price_samples e price_stats (índice histórico de preços)")
+def price_stats_index(m):
+    from ..models import PriceSample, PriceStat
+    from ..utils import price_stats
+
+    m.create_tables(PriceSample.__table__, PriceStat.__table__)
+    m.backfill("price_samples", "proposals", price_stats.samples_sql())
+    m.log(f"   ✓ arquivados: {price_stats.sample_archives()} preço(s)")
+    m.log(f"   ✓ price_stats: {price_stats.rebuild()} código(s) de serviço")
+
+
+@migration("0013", "quantity_reports (cache do relatório de desvio de quantidades)")
+def quantity_reports(m):
+    from ..models import QuantityReport
+
+    m.create_tables(QuantityReport.__table__)
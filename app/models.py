@@ -174,6 +174,9 @@ class Invite(db.Model):
     procurement_id = db.Column(db.Integer, db.ForeignKey("procurements.id"), nullable=False)
     email = db.Column(db.String(255), nullable=False)
     token = db.Column(db.String(64), nullable=False, unique=True)
+    # Fornecedor já cadastrado com este email; preenchido no convite, no
+    # cadastro e no aceite para evitar o JOIN por email nas consultas
+    supplier_user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True, index=True)
     accepted = db.Column(db.Boolean, default=False)
     accepted_at = db.Column(db.DateTime)
     created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -237,13 +240,169 @@ class ProposalPrice(db.Model):
     )
 
 class AuditLog(db.Model):
-    """Log de auditoria para todas as ações importantes"""
+    """Log de auditoria para todas as ações importantes
+
+    No Postgres a tabela é particionada por mês em ``created_at`` (migração
+    0008, manutenção em app/utils/audit_store.py).
+    """
     __tablename__ = "audit_logs"
-    id = db.Column(db.Integer, primary_key=True)
+    # BIGINT no Postgres; no SQLite precisa ser INTEGER para ser o rowid
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     action = db.Column(db.String(100), nullable=False)
     entity_type = db.Column(db.String(50))
     entity_id = db.Column(db.Integer)
     details = db.Column(db.JSON)
     ip_address = db.Column(db.String(45))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Paginação por chave (created_at, id) DESC com cada filtro da consulta
+        db.Index("ix_audit_logs_entity", "entity_type", "entity_id", "created_at", "id"),
+        db.Index("ix_audit_logs_user", "user_id", "created_at", "id"),
+        db.Index("ix_audit_logs_created", "created_at", "id"),
+    )
+
+
+class ProcurementEvent(db.Model):
+    """Histórico do processo, somente inserção: uma linha por transição de estado
+
+    Gravado na mesma transação da mudança (app/utils/timeline.py); a linha
+    do tempo é uma varredura do índice (procurement_id, created_at, id).
+    """
+    __tablename__ = "procurement_events"
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    procurement_id = db.Column(db.Integer, db.ForeignKey("procurements.id"), nullable=False)
+    event = db.Column(db.String(50), nullable=False)
+    actor_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    entity_type = db.Column(db.String(30))
+    entity_id = db.Column(db.Integer)
+    details = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_procurement_events_timeline", "procurement_id", "created_at", "id"),
+    )
+
+
+class ProcurementArchive(db.Model):
+    """Processo encerrado (FINALIZADO/CANCELADO) fora das tabelas quentes
+
+    O grafo inteiro (processo, TR, itens, convites, propostas, quantidades,
+    preços e linha do tempo) fica em ``snapshot``: JSON compactado com gzip
+    (app/utils/procurement_archive.py).  As colunas soltas servem à
+    listagem e às permissões sem descompactar.
+    """
+    __tablename__ = "procurement_archives"
+    procurement_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(32), nullable=False)
+    org_id = db.Column(db.Integer)
+    requisitante_id = db.Column(db.Integer, index=True)
+    created_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime)
+    closed_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    snapshot = db.Column(db.LargeBinary, nullable=False)
+
+
+class ArchivedProposal(db.Model):
+    """Proposta arquivada -> processo (para /proposals/<id> continuar respondendo)"""
+    __tablename__ = "archived_proposals"
+    proposal_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    procurement_id = db.Column(db.Integer, nullable=False, index=True)
+    supplier_user_id = db.Column(db.Integer, nullable=False)
+
+
+class TRSearchDocument(db.Model):
+    """Texto pesquisável de um TR e os campos do filtro por papel
+
+    Regravado junto com o TR (app/utils/search.py).  O índice textual é
+    mantido pelo banco: coluna ``document`` (tsvector + GIN) no Postgres,
+    tabela FTS5 ``tr_search_fts`` no SQLite.  Sem chave estrangeira: o
+    documento continua pesquisável depois do arquivamento do processo.
+    """
+    __tablename__ = "tr_search_documents"
+    tr_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    procurement_id = db.Column(db.Integer, index=True)
+    # Requisitante do processo ou, no TR independente, quem o criou
+    owner_id = db.Column(db.Integer, index=True)
+    tr_status = db.Column(db.String(20), nullable=False)
+    archived = db.Column(db.Boolean, nullable=False, default=False)
+    title = db.Column(db.String(200))
+    objetivo = db.Column(db.Text)
+    descricao_servicos = db.Column(db.Text)
+    normas_observar = db.Column(db.Text)
+    itens = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class PriceSample(db.Model):
+    """Preço unitário já contabilizado em ``price_stats`` (um por item de proposta enviada)
+
+    Guarda o valor que entrou no agregado, para que o reenvio de uma
+    proposta com preços alterados troque o valor antigo pelo novo.  Sem
+    chave estrangeira: o histórico sobrevive ao arquivamento do processo.
+    """
+    __tablename__ = "price_samples"
+    proposal_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    service_item_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    codigo = db.Column(db.String(80), nullable=False)
+    unid = db.Column(db.String(20), nullable=False)
+    unit_price = db.Column(db.Numeric(18, 2), nullable=False)
+    recorded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_price_samples_key", "codigo", "unid", "unit_price"),
+    )
+
+
+class PriceStat(db.Model):
+    """Agregado de preços unitários por (codigo, unid) (app/utils/price_stats.py)"""
+    __tablename__ = "price_stats"
+    codigo = db.Column(db.String(80), primary_key=True)
+    unid = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Numeric(24, 2), nullable=False, default=0)
+    min_price = db.Column(db.Numeric(18, 2))
+    max_price = db.Column(db.Numeric(18, 2))
+    # Esboço de quantis serializado (QuantileSketch.to_json)
+    sketch = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class QuantityReport(db.Model):
+    """Relatório de desvio de quantidades em cache (app/utils/quantity_report.py)
+
+    ``version`` sobe a cada mudança de quantidade, preço ou planilha do TR e
+    zera ``report``; um cálculo só é gravado se a versão não mudou enquanto
+    ele rodava.  Sem chave estrangeira: o arquivamento apaga a linha.
+    """
+    __tablename__ = "quantity_reports"
+    procurement_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    report = db.Column(db.JSON)
+    computed_at = db.Column(db.DateTime)
+
+
+class Notification(db.Model):
+    """Caixa de entrada persistente: eventos enviados para ``user:{id}``"""
+    __tablename__ = "notifications"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    event = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON)
+    read_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Paginação por chave (user_id, id DESC)
+        db.Index("ix_notifications_user_id_id", "user_id", "id"),
+    )
+
+
+class NotificationCounter(db.Model):
+    """Contador de não lidas mantido incrementalmente por usuário"""
+    __tablename__ = "notification_counters"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0)
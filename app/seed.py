@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+Gerador de massa de dados sintética em larga escala
+
+Uso: flask --app run seed --procurements 10000 --items-per-tr 20 --seed 42
+
+A geração é determinística a partir de ``--seed`` (exceto o hash bcrypt da
+senha padrão "123456") e usa INSERTs em lote do SQLAlchemy Core em blocos
+de ``--chunk-size`` linhas, com IDs atribuídos pelo gerador.  Um conjunto de
+um milhão de linhas carrega em minutos no SQLite ou num Postgres local.
+"""
+
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, text
+
+from . import db
+from .models import (
+    Organization, User, Role, Procurement, ProcurementStatus, TR, TRStatus,
+    TRServiceItem, Invite, Proposal, ProposalStatus, ProposalService,
+    ProposalPrice, ProcurementEvent, TRSearchDocument, PriceSample, PriceStat
+)
+from .utils import price_stats, search, timeline
+from .utils.passwords import hash_password
+
+DEFAULT_PASSWORD = "123456"
+START_DATE = datetime(2024, 1, 1)
+
+# Ordem de gravação respeitando as chaves estrangeiras
+TABLE_ORDER = [
+    Organization, User, Procurement, TR, TRServiceItem, Invite,
+    Proposal, ProposalService, ProposalPrice
+]
+
+# Status do TR correspondente a cada status do processo (None = sem TR)
+TR_STATUS_BY_PROCUREMENT = {
+    ProcurementStatus.TR_PENDENTE: None,
+    ProcurementStatus.TR_CRIADO: TRStatus.RASCUNHO,
+    ProcurementStatus.TR_SUBMETIDO: TRStatus.SUBMETIDO,
+    ProcurementStatus.TR_REJEITADO: TRStatus.REJEITADO,
+}
+
+# Status de proposta possíveis em cada fase do processo (None = sem propostas)
+PROPOSAL_STATUSES_BY_PROCUREMENT = {
+    ProcurementStatus.ABERTO: [ProposalStatus.RASCUNHO, ProposalStatus.ENVIADA],
+    ProcurementStatus.ANALISE_TECNICA: [
+        ProposalStatus.ENVIADA, ProposalStatus.EM_ANALISE_TECNICA,
+        ProposalStatus.APROVADA_TECNICAMENTE, ProposalStatus.REJEITADA_TECNICAMENTE
+    ],
+    ProcurementStatus.ANALISE_COMERCIAL: [
+        ProposalStatus.APROVADA_TECNICAMENTE, ProposalStatus.REJEITADA_TECNICAMENTE,
+        ProposalStatus.COMERCIAL_ABERTA
+    ],
+    ProcurementStatus.FINALIZADO: [
+        ProposalStatus.FINALIZADA, ProposalStatus.APROVADA_TECNICAMENTE,
+        ProposalStatus.REJEITADA_TECNICAMENTE
+    ],
+    ProcurementStatus.CANCELADO: [ProposalStatus.ENVIADA, ProposalStatus.RASCUNHO],
+}
+
+UNITS = ["UN", "M2", "M3", "M", "KG", "H", "VB", "MES"]
+SERVICES = [
+    "Pintura", "Reboco", "Demolição", "Alvenaria", "Instalação elétrica",
+    "Instalação hidráulica", "Impermeabilização", "Forro", "Piso cerâmico",
+    "Limpeza", "Locação de andaime", "Mão de obra especializada",
+]
+TR_TEXTS = [
+    "Execução de serviços de manutenção predial com fornecimento de materiais",
+    "Reforma das instalações conforme projeto executivo e memorial descritivo",
+    "Adequação às normas NR-10, NR-18 e NR-35 e às normas ABNT aplicáveis",
+    "Serviços contínuos com equipe residente e plantão para emergências",
+]
+
+
+class _BulkWriter:
+    """Acumula linhas por tabela e grava em blocos na ordem das FKs"""
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.buffers = {model: [] for model in TABLE_ORDER}
+        self.totals = {model.__tablename__: 0 for model in TABLE_ORDER}
+        self.pending = 0
+
+    def add(self, model, row: dict):
+        self.buffers[model].append(row)
+        self.pending += 1
+        if self.pending >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        for model in TABLE_ORDER:
+            rows = self.buffers[model]
+            if rows:
+                db.session.execute(insert(model.__table__), rows)
+                self.totals[model.__tablename__] += len(rows)
+                self.buffers[model] = []
+        db.session.commit()
+        self.pending = 0
+
+
+def _next_ids():
+    """Primeiro ID livre de cada tabela, para semear um banco não vazio"""
+    return {
+        model: (db.session.query(func.max(model.__table__.c.id)).scalar() or 0) + 1
+        for model in TABLE_ORDER if "id" in model.__table__.c
+    }
+
+
+def _reset_sequences():
+    """No Postgres os IDs explícitos não avançam as sequences"""
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in TABLE_ORDER:
+        if "id" not in model.__table__.c:
+            continue
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+    db.session.commit()
+
+
+def seed_database(seed=42, organizations=50, requisitantes=20, compradores=10,
+                  fornecedores=200, procurements=1000, items_per_tr=20,
+                  invites_per_procurement=8, proposals_per_procurement=5,
+                  catalog_size=500, chunk_size=5000, log=None):
+    """Gera a massa de dados e devolve o total de linhas por tabela"""
+    rng = random.Random(seed)
+    log = log or (lambda msg: None)
+    writer = _BulkWriter(chunk_size)
+    ids = _next_ids()
+    password_hash = hash_password(DEFAULT_PASSWORD)
+    tag = f"s{seed}"
+    if db.session.query(User.id).filter(User.email.like(f"%.{tag}@seed.local")).first():
+        # Mesma semente num banco que já a recebeu: e-mails, nomes e CNPJs
+        # levam o deslocamento de IDs para não violar as chaves únicas
+        tag = f"{tag}o{ids[User]}"
+        log(f"semente já usada neste banco; e-mails com o sufixo .{tag}@seed.local")
+
+    def next_id(model):
+        value = ids[model]
+        ids[model] += 1
+        return value
+
+    def moment(max_days=730):
+        return START_DATE + timedelta(seconds=rng.randrange(max_days * 86400))
+
+    # Catálogo de serviços: o mesmo código sempre com a mesma unidade e um
+    # preço de referência, para que o histórico de preços seja coerente
+    catalog = [(
+        f"SRV-{n:05d}",
+        f"{rng.choice(SERVICES)} - item {n}",
+        rng.choice(UNITS),
+        Decimal(rng.randrange(500, 500000)) / 100
+    ) for n in range(1, catalog_size + 1)]
+
+    org_ids = []
+    for n in range(organizations):
+        org_id = next_id(Organization)
+        org_ids.append(org_id)
+        writer.add(Organization, {
+            "id": org_id,
+            "name": f"Fornecedor {tag}-{n} Ltda",
+            "cnpj": f"{tag}{n:010d}"[-18:],
+            "address": f"Rua {n}, {rng.randrange(1, 2000)}",
+            "phone": f"(11) 9{rng.randrange(10000000, 99999999)}",
+        })
+
+    users = {role: [] for role in Role}
+    counts = {
+        Role.REQUISITANTE: requisitantes,
+        Role.COMPRADOR: compradores,
+        Role.FORNECEDOR: fornecedores,
+    }
+    for role, count in counts.items():
+        for n in range(count):
+            user_id = next_id(User)
+            email = f"{role.value.lower()}{n}.{tag}@seed.local"
+            users[role].append((user_id, email))
+            writer.add(User, {
+                "id": user_id,
+                "email": email,
+                "password_hash": password_hash,
+                "full_name": f"{role.value.title()} {n}",
+                "role": role,
+                "org_id": rng.choice(org_ids) if role == Role.FORNECEDOR and org_ids else None,
+                "is_active": True,
+                "created_at": moment(),
+            })
+    log(f"organizações e usuários: {organizations} / {sum(counts.values())}")
+
+    if not users[Role.COMPRADOR] or not users[Role.REQUISITANTE]:
+        writer.flush()
+        _reset_sequences()
+        return writer.totals
+
+    statuses = list(ProcurementStatus)
+    for n in range(procurements):
+        proc_id = next_id(Procurement)
+        status = statuses[n % len(statuses)]
+        buyer_id = rng.choice(users[Role.COMPRADOR])[0]
+        requisitante_id = rng.choice(users[Role.REQUISITANTE])[0]
+        created_at = moment()
+        writer.add(Procurement, {
+            "id": proc_id,
+            "title": f"Processo {tag}-{n}",
+            "description": rng.choice(TR_TEXTS),
+            "status": status,
+            "orcamento_disponivel": Decimal(rng.randrange(10000, 5000000)),
+            "requisitante_id": requisitante_id,
+            "created_by": buyer_id,
+            "deadline_proposals": created_at + timedelta(days=30),
+            "created_at": created_at,
+            "updated_at": created_at + timedelta(days=rng.randrange(1, 60)),
+        })
+
+        tr_status = TR_STATUS_BY_PROCUREMENT.get(status, TRStatus.APROVADO)
+        if tr_status is None:
+            continue
+
+        tr_id = next_id(TR)
+        approved = tr_status == TRStatus.APROVADO
+        writer.add(TR, {
+            "id": tr_id,
+            "procurement_id": proc_id,
+            "objetivo": rng.choice(TR_TEXTS),
+            "descricao_servicos": rng.choice(TR_TEXTS),
+            "normas_observar": "NR-10, NR-18, NR-35",
+            "prazo_execucao": f"{rng.randrange(1, 24)} meses",
+            "status": tr_status,
+            "submitted_at": created_at + timedelta(days=2) if tr_status != TRStatus.RASCUNHO else None,
+            "approved_at": created_at + timedelta(days=5) if approved else None,
+            "approved_by": buyer_id if approved else None,
+            "created_by": requisitante_id,
+            "created_at": created_at + timedelta(days=1),
+            "updated_at": created_at + timedelta(days=2),
+        })
+
+        items = []
+        for ordem, (codigo, descricao, unid, ref_price) in enumerate(
+                rng.sample(catalog, min(items_per_tr, len(catalog))), start=1):
+            item_id = next_id(TRServiceItem)
+            qtde = Decimal(rng.randrange(1, 100000)) / 100
+            items.append((item_id, qtde, ref_price))
+            writer.add(TRServiceItem, {
+                "id": item_id,
+                "tr_id": tr_id,
+                "item_ordem": ordem,
+                "codigo": codigo,
+                "descricao": descricao,
+                "unid": unid,
+                "qtde": qtde,
+            })
+
+        if not approved or not users[Role.FORNECEDOR]:
+            continue
+
+        invited = rng.sample(users[Role.FORNECEDOR],
+                             min(invites_per_procurement, len(users[Role.FORNECEDOR])))
+        for supplier_id, email in invited:
+            accepted = rng.random() < 0.7
+            writer.add(Invite, {
+                "id": next_id(Invite),
+                "procurement_id": proc_id,
+                "email": email,
+                "token": f"{tag}-{proc_id}-{supplier_id}-{rng.getrandbits(64):016x}",
+                "supplier_user_id": supplier_id,
+                "accepted": accepted,
+                "accepted_at": created_at + timedelta(days=7) if accepted else None,
+                "created_by": buyer_id,
+                "created_at": created_at + timedelta(days=6),
+            })
+
+        proposal_statuses = PROPOSAL_STATUSES_BY_PROCUREMENT.get(status)
+        if not proposal_statuses:
+            continue
+
+        for supplier_id, _ in invited[:proposals_per_procurement]:
+            proposal_id = next_id(Proposal)
+            prop_status = rng.choice(proposal_statuses)
+            reviewed = prop_status in (
+                ProposalStatus.APROVADA_TECNICAMENTE, ProposalStatus.REJEITADA_TECNICAMENTE,
+                ProposalStatus.COMERCIAL_ABERTA, ProposalStatus.FINALIZADA
+            )
+            submitted_at = created_at + timedelta(days=15) if prop_status != ProposalStatus.RASCUNHO else None
+            writer.add(Proposal, {
+                "id": proposal_id,
+                "procurement_id": proc_id,
+                "supplier_user_id": supplier_id,
+                "status": prop_status,
+                "technical_description": rng.choice(TR_TEXTS),
+                "technical_submitted_at": submitted_at,
+                "commercial_submitted_at": submitted_at,
+                "technical_score": rng.randrange(40, 100) if reviewed else None,
+                "technical_reviewed_by": requisitante_id if reviewed else None,
+                "technical_reviewed_at": created_at + timedelta(days=20) if reviewed else None,
+                "payment_conditions": "30/60/90 dias",
+                "delivery_time": f"{rng.randrange(15, 180)} dias",
+                "warranty_terms": "12 meses",
+                "created_at": created_at + timedelta(days=10),
+                "updated_at": created_at + timedelta(days=15),
+            })
+            for item_id, qtde, ref_price in items:
+                writer.add(ProposalService, {
+                    "proposal_id": proposal_id,
+                    "service_item_id": item_id,
+                    "qty": (qtde * Decimal(rng.randrange(80, 121)) / 100).quantize(Decimal("0.001")),
+                })
+                writer.add(ProposalPrice, {
+                    "proposal_id": proposal_id,
+                    "service_item_id": item_id,
+                    "unit_price": (ref_price * Decimal(rng.randrange(70, 141)) / 100).quantize(Decimal("0.01")),
+                })
+
+        if (n + 1) % 1000 == 0:
+            log(f"processos: {n + 1}/{procurements}")
+
+    writer.flush()
+    _reset_sequences()
+    totals = dict(writer.totals)
+    totals[TRSearchDocument.__tablename__] = search.index_missing(chunk_size)
+    totals[ProcurementEvent.__tablename__] = timeline.backfill_missing(chunk_size)
+    totals[PriceSample.__tablename__] = price_stats.sample_missing(chunk_size)
+    totals[PriceStat.__tablename__] = price_stats.rebuild()
+    return totals
+
+
+@click.command("seed")
+@click.option("--seed", default=42, show_default=True, help="Semente do gerador")
+@click.option("--organizations", default=50, show_default=True)
+@click.option("--requisitantes", default=20, show_default=True)
+@click.option("--compradores", default=10, show_default=True)
+@click.option("--fornecedores", default=200, show_default=True)
+@click.option("--procurements", default=1000, show_default=True)
+@click.option("--items-per-tr", default=20, show_default=True)
+@click.option("--invites-per-procurement", default=8, show_default=True)
+@click.option("--proposals-per-procurement", default=5, show_default=True)
+@click.option("--catalog-size", default=500, show_default=True, help="Códigos de serviço distintos")
+@click.option("--chunk-size", default=5000, show_default=True, help="Linhas por INSERT em lote")
+@with_appcontext
+def seed_command(**options):
+    """Gera massa de dados sintética para testes de carga e benchmarks"""
+    started = time.perf_counter()
+    totals = seed_database(log=click.echo, **options)
+    elapsed = time.perf_counter() - started
+
+    for table, count in totals.items():
+        click.echo(f"   {table:20} {count:>10}")
+    total = sum(totals.values())
+    click.echo(f"✅ {total} linhas em {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} linhas/s)")
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Trilha de auditoria assíncrona
+
+Os handlers chamam ``record(...)`` depois do commit da própria transação; o
+registro vai para uma fila em memória e uma thread de fundo grava os
+eventos em ``audit_logs`` com um INSERT multi-linha por lote (até
+``AUDIT_BATCH_SIZE`` linhas ou a cada ``AUDIT_FLUSH_INTERVAL`` segundos).
+A requisição só paga o ``put`` na fila.
+
+* Fila limitada (``AUDIT_QUEUE_SIZE``): se o banco não acompanhar, a
+  requisição não espera — o evento é descartado e contado em
+  ``audit_dropped_total`` (e no log), para que o alerta venha da métrica.
+* ``flush()`` espera a gravação do que já está na fila; no encerramento do
+  processo (``atexit``) a fila é esvaziada antes de sair.
+* SQLite em memória: cada conexão é um banco diferente, então a gravação é
+  síncrona, na sessão da própria requisição.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import insert
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("audit_events_total", "counter", "Eventos de auditoria gravados")
+metrics.describe("audit_dropped_total", "counter", "Eventos de auditoria descartados, por motivo")
+metrics.describe("audit_queue_depth", "gauge", "Eventos de auditoria aguardando gravação")
+metrics.describe("audit_batch_seconds", "histogram", "Tempo de gravação de um lote de auditoria",
+                 buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+
+_STOP = object()
+
+
+class _Flush:
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AuditWriter:
+    def __init__(self, app, db, queue_size=10000, batch_size=500, interval=1.0, synchronous=False):
+        self.app = app
+        self.db = db
+        self.batch_size = batch_size
+        self.interval = interval
+        self.synchronous = synchronous
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def queue_depth(self):
+        return [("audit_queue_depth", (), self._queue.qsize())]
+
+    # -- produtor -------------------------------------------------------
+
+    def record(self, row: dict):
+        if self.synchronous:
+            self._write([row], self.db.session)
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.inc("audit_dropped_total", (("reason", "queue_full"),))
+            logger.error("auditoria: fila cheia, evento descartado: %s %s:%s",
+                         row["action"], row["entity_type"], row["entity_id"])
+
+    def flush(self, timeout=None) -> bool:
+        """Espera a gravação de tudo que foi enfileirado até agora"""
+        if self.synchronous or not self._alive():
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout=10):
+        """Esvazia a fila e encerra a thread (chamado no ``atexit``)"""
+        if not self._alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # -- thread de gravação ---------------------------------------------
+
+    def _alive(self) -> bool:
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_started(self):
+        # Início preguiçoso: nada roda na subida, e após um fork o processo
+        # filho cria a sua própria thread
+        if self._alive():
+            return
+        with self._start_lock:
+            if self._alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        batch, waiters, stop = [], [], False
+        while not stop:
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, _Flush):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+            if batch:
+                with self.app.app_context():
+                    try:
+                        self._write(batch, self.db.session)
+                    finally:
+                        self.db.session.remove()
+                batch = []
+            for marker in waiters:
+                marker.done.set()
+            waiters = []
+
+    def _write(self, rows, session):
+        started = time.perf_counter()
+        try:
+            session.execute(insert(self._model()), rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            metrics.inc("audit_dropped_total", (("reason", "db_error"),), len(rows))
+            logger.exception("auditoria: falha ao gravar %d evento(s)", len(rows))
+            return
+        metrics.inc("audit_events_total", value=len(rows))
+        metrics.observe("audit_batch_seconds", time.perf_counter() - started)
+
+    @staticmethod
+    def _model():
+        from ..models import AuditLog
+        return AuditLog
+
+
+def record(action: str, user_id: int, entity_type: str = None, entity_id: int = None, details=None):
+    """Enfileira um evento de auditoria (chamar depois do commit)"""
+    writer = current_app.extensions.get("audit")
+    if writer is None:
+        return
+    ip_address = request.remote_addr if has_request_context() else None
+    writer.record({
+        "user_id": user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "details": details,
+        "ip_address": ip_address,
+        "created_at": datetime.utcnow(),
+    })
+
+
+def flush(timeout=None) -> bool:
+    writer = current_app.extensions.get("audit")
+    return writer.flush(timeout) if writer else True
+
+
+def init_audit(app, db):
+    if not app.config["AUDIT_ENABLED"]:
+        return
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    writer = AuditWriter(
+        app, db,
+        queue_size=app.config["AUDIT_QUEUE_SIZE"],
+        batch_size=app.config["AUDIT_BATCH_SIZE"],
+        interval=app.config["AUDIT_FLUSH_INTERVAL"],
+        synchronous=uri in ("sqlite://", "sqlite:///:memory:"),
+    )
+    app.extensions["audit"] = writer
+    metrics.gauge_callback(writer.queue_depth)
+    atexit.register(writer.close)
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento da auditoria: partições, consulta e arquivamento
+
+* Postgres: ``audit_logs`` é particionada por mês em ``created_at``
+  (``audit_logs_pAAAAMM``) com uma partição ``audit_logs_default`` que
+  recebe o que cair fora das partições criadas.  ``ensure_partitions``
+  cria os meses à frente (``AUDIT_PARTITIONS_AHEAD``) e move para a
+  partição nova as linhas do mês que estavam na default.  No SQLite a
+  tabela é única e os "meses" são apenas faixas de ``created_at``.
+* ``query_logs``: paginação por chave em (``created_at``, ``id``) DESC com
+  filtros por entidade, usuário, ação e período, servida pelos índices
+  ``ix_audit_logs_*``.
+* ``archive``: meses anteriores ao corte vão para
+  ``AUDIT_ARCHIVE_DIR/audit-AAAA-MM.jsonl.gz`` (uma linha JSON por evento)
+  e saem da tabela — no Postgres com ``DETACH`` + ``DROP`` da partição, sem
+  DELETE linha a linha.  O arquivo é gravado como ``.part`` e só é
+  promovido depois do commit da remoção; ``read_archive`` lê de volta em
+  streaming com os mesmos filtros da consulta.
+
+Manutenção periódica (ex.: cron diário):
+
+    flask audit partitions
+    flask audit archive --keep-months 12
+    flask audit cat 2025-01 --entity-type tr --entity-id 42
+"""
+
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, func, select, text, tuple_
+
+from .pagination import decode_cursor, encode_cursor
+
+ARCHIVE_RE = re.compile(r"^audit-(\d{4}-\d{2})\.jsonl\.gz$")
+FILTERS = ("entity_type", "entity_id", "user_id", "action")
+
+
+# -- meses ---------------------------------------------------------------
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_month(value: str) -> date:
+    """``AAAA-MM`` -> primeiro dia do mês (ValueError se inválido)"""
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def _partition_name(month: date) -> str:
+    return f"audit_logs_p{month:%Y%m}"
+
+
+def _table():
+    from ..models import AuditLog
+    return AuditLog.__table__
+
+
+# -- partições (Postgres) ------------------------------------------------
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    kind = conn.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'audit_logs' AND n.nspname = current_schema()"
+    )).scalar()
+    return kind == "p"
+
+
+def partitions(conn) -> list:
+    """Nomes das partições mensais existentes, em ordem"""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'audit_logs'::regclass"
+    )).scalars()
+    return sorted(name for name in rows if name.startswith("audit_logs_p"))
+
+
+def ensure_partitions(engine, since=None, ahead=3, log=print) -> list:
+    """Cria as partições de ``since`` (padrão: mês corrente) até ``ahead`` meses à frente"""
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return []
+        existing = set(partitions(conn))
+
+    current = month_start(datetime.utcnow())
+    month = month_start(since) if since else current
+    last = add_months(current, ahead)
+    created = []
+    while month <= last:
+        name = _partition_name(month)
+        following = add_months(month, 1)
+        if name not in existing:
+            # Uma transação por mês.  A tabela nasce solta, recebe as linhas
+            # do mês que estavam na default e só então é anexada (o ATTACH
+            # falharia com essas linhas ainda na default).
+            with engine.begin() as conn:
+                conn.execute(text(f"CREATE TABLE {name} (LIKE audit_logs INCLUDING DEFAULTS)"))
+                conn.execute(text(
+                    f"WITH moved AS (DELETE FROM audit_logs_default "
+                    f"WHERE created_at >= :lo AND created_at < :hi RETURNING *) "
+                    f"INSERT INTO {name} SELECT * FROM moved"
+                ), {"lo": month, "hi": following})
+                conn.execute(text(
+                    f"ALTER TABLE audit_logs ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{month}') TO ('{following}')"
+                ))
+            created.append(name)
+            log(f"   + partição {name}")
+        month = following
+    return created
+
+
+# -- consulta ------------------------------------------------------------
+
+def parse_filters(args) -> dict:
+    """Filtros da query string; ValueError com a mensagem para o 400"""
+    filters = {}
+    for name in FILTERS:
+        value = args.get(name)
+        if value in (None, ""):
+            continue
+        if name in ("entity_id", "user_id"):
+            try:
+                value = int(value)
+            except ValueError:
+                raise ValueError(f"{name} deve ser inteiro")
+        filters[name] = value
+    for name in ("since", "until"):
+        value = args.get(name)
+        if value:
+            try:
+                filters[name] = datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"{name} deve ser uma data ISO 8601")
+    if "entity_id" in filters and "entity_type" not in filters:
+        raise ValueError("entity_id exige entity_type")
+    return filters
+
+
+def _where(table, filters):
+    clauses = [table.c[name] == filters[name] for name in FILTERS if name in filters]
+    if "since" in filters:
+        clauses.append(table.c.created_at >= filters["since"])
+    if "until" in filters:
+        clauses.append(table.c.created_at < filters["until"])
+    return clauses
+
+
+def serialize(row) -> dict:
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "action": row.action,
+        "entity_type": row.entity_type,
+        "entity_id": row.entity_id,
+        "details": row.details,
+        "ip_address": row.ip_address,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def query_logs(session, filters: dict, limit: int = 50, cursor: str = None) -> dict:
+    """Uma página, do mais recente ao mais antigo"""
+    table = _table()
+    stmt = select(table).where(*_where(table, filters))
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(table.c.created_at, table.c.id) < tuple_(created_at, row_id))
+    rows = session.execute(
+        stmt.order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [serialize(r) for r in rows],
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+    }
+
+
+# -- arquivamento --------------------------------------------------------
+
+def archive_path(directory, month: date) -> str:
+    return os.path.join(directory, f"audit-{month:%Y-%m}.jsonl.gz")
+
+
+def _range(table, month):
+    return and_(table.c.created_at >= month, table.c.created_at < add_months(month, 1))
+
+
+def _has_rows(conn, table, month) -> bool:
+    return conn.execute(select(table.c.id).where(_range(table, month)).limit(1)).first() is not None
+
+
+def _promote(part, final):
+    """Move o ``.part`` para o arquivo final (anexa se já houver: gzip multi-membro)"""
+    if os.path.exists(final):
+        with open(final, "ab") as out, open(part, "rb") as src:
+            out.write(src.read())
+            out.flush()
+            os.fsync(out.fileno())
+        os.remove(part)
+    else:
+        os.replace(part, final)
+
+
+def archive_month(engine, directory, month: date, log=print) -> int:
+    table = _table()
+    final = archive_path(directory, month)
+    part = final + ".part"
+
+    # Sobra de uma execução interrompida: se as linhas já saíram do banco o
+    # commit aconteceu e o .part é o arquivo; senão é descartado e refeito
+    if os.path.exists(part):
+        with engine.connect() as conn:
+            if _has_rows(conn, table, month):
+                os.remove(part)
+            else:
+                _promote(part, final)
+                log(f"   ✓ {month:%Y-%m}: arquivo recuperado de execução anterior")
+
+    with engine.connect() as conn:
+        partitioned = is_partitioned(conn)
+        name = _partition_name(month)
+        has_partition = partitioned and name in partitions(conn)
+        if not _has_rows(conn, table, month):
+            if has_partition:
+                conn.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+                conn.commit()
+            return 0
+
+    rows = 0
+    with gzip.open(part, "wt", encoding="utf-8") as out:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=2000).execute(
+                select(table).where(_range(table, month)).order_by(table.c.created_at, table.c.id)
+            )
+            for row in result:
+                out.write(json.dumps(serialize(row), ensure_ascii=False, default=str))
+                out.write("\n")
+                rows += 1
+    with open(part, "rb") as fh:
+        os.fsync(fh.fileno())
+
+    # Remoção numa única transação: ou o mês inteiro sai, ou nada sai
+    with engine.begin() as conn:
+        if has_partition:
+            conn.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        else:
+            conn.execute(table.delete().where(_range(table, month)))
+    _promote(part, final)
+    log(f"   ✓ {month:%Y-%m}: {rows} eventos -> {os.path.basename(final)}")
+    return rows
+
+
+def archive(engine, directory, before: date, log=print) -> dict:
+    """Arquiva todos os meses anteriores a ``before``; {mês: eventos}"""
+    os.makedirs(directory, exist_ok=True)
+    table = _table()
+    with engine.connect() as conn:
+        oldest = conn.execute(select(func.min(table.c.created_at))).scalar()
+    done = {}
+    if oldest is None:
+        return done
+    month = month_start(oldest)
+    cutoff = month_start(before)
+    while month < cutoff:
+        done[f"{month:%Y-%m}"] = archive_month(engine, directory, month, log)
+        month = add_months(month, 1)
+    return done
+
+
+def list_archives(directory) -> list:
+    if not os.path.isdir(directory):
+        return []
+    archives = []
+    for name in sorted(os.listdir(directory)):
+        match = ARCHIVE_RE.match(name)
+        if match:
+            archives.append({
+                "month": match.group(1),
+                "file": name,
+                "bytes": os.path.getsize(os.path.join(directory, name)),
+            })
+    return archives
+
+
+def read_archive(directory, month: date, filters: dict = None):
+    """Gera os eventos arquivados do mês (dicts), aplicando os filtros"""
+    path = archive_path(directory, month)
+    if not os.path.exists(path):
+        return
+    filters = filters or {}
+    since, until = filters.get("since"), filters.get("until")
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            event = json.loads(line)
+            if any(event.get(name) != filters[name] for name in FILTERS if name in filters):
+                continue
+            if since or until:
+                created_at = datetime.fromisoformat(event["created_at"])
+                if (since and created_at < since) or (until and created_at >= until):
+                    continue
+            yield event
+
+
+def archive_exists(directory, month: date) -> bool:
+    return os.path.exists(archive_path(directory, month))
+
+
+# -- linha de comando ----------------------------------------------------
+
+def _engine():
+    from .. import db
+    return db.engine
+
+
+@click.group("audit")
+def audit_cli():
+    """Partições e arquivamento da auditoria"""
+
+
+@audit_cli.command("partitions")
+@click.option("--ahead", type=int, help="Meses à frente (padrão: AUDIT_PARTITIONS_AHEAD)")
+@with_appcontext
+def partitions_command(ahead):
+    from flask import current_app
+    ahead = current_app.config["AUDIT_PARTITIONS_AHEAD"] if ahead is None else ahead
+    created = ensure_partitions(_engine(), ahead=ahead, log=click.echo)
+    click.echo(f"{len(created)} partição(ões) criada(s)")
+
+
+@audit_cli.command("archive")
+@click.option("--before", help="Arquiva os meses anteriores a AAAA-MM")
+@click.option("--keep-months", type=int, help="Mantém este número de meses (padrão: AUDIT_RETENTION_MONTHS)")
+@with_appcontext
+def archive_command(before, keep_months):
+    from flask import current_app
+    if before:
+        try:
+            cutoff = parse_month(before)
+        except ValueError:
+            raise click.BadParameter("use AAAA-MM", param_hint="--before")
+    else:
+        keep = current_app.config["AUDIT_RETENTION_MONTHS"] if keep_months is None else keep_months
+        cutoff = add_months(month_start(datetime.utcnow()), -keep)
+    done = archive(_engine(), current_app.config["AUDIT_ARCHIVE_DIR"], cutoff, log=click.echo)
+    click.echo(f"{sum(done.values())} evento(s) arquivado(s) de {len(done)} mês(es) anteriores a {cutoff:%Y-%m}")
+
+
+@audit_cli.command("cat")
+@click.argument("month")
+@click.option("--entity-type")
+@click.option("--entity-id")
+@click.option("--user-id")
+@click.option("--action")
+@with_appcontext
+def cat_command(month, **options):
+    """Imprime os eventos arquivados do mês (JSON por linha)"""
+    from flask import current_app
+    try:
+        filters = parse_filters(options)
+        month_ = parse_month(month)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    for event in read_archive(current_app.config["AUDIT_ARCHIVE_DIR"], month_, filters):
+        click.echo(json.dumps(event, ensure_ascii=False))
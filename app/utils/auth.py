@@ -4,26 +4,70 @@ Helper functions para autenticação JWT
 Resolve o problema de compatibilidade entre diferentes formatos de JWT
 """
 
+from flask import current_app, g, has_app_context
 from flask_jwt_extended import get_jwt_identity
 from ..models import User
 
-def get_current_user():
-    identity = get_jwt_identity()
-    
+def user_id_from_identity(identity):
+    """Extrai o ID do usuário de qualquer formato de identidade JWT"""
     # Converter para int se for string
     if isinstance(identity, str):
         try:
-            user_id = int(identity)
+            return int(identity)
         except:
             return None
     elif isinstance(identity, int):
-        user_id = identity
+        return identity
     elif isinstance(identity, dict):
-        user_id = identity.get("user_id")
-    else:
-        return None
-    
-    return User.query.get(user_id) if user_id else None
+        return identity.get("user_id")
+    return None
+
+
+def get_current_user():
+    # Memoizado em g por identidade JWT: decorators e handlers da mesma
+    # requisição não repetem a consulta.  No Flask 3 várias requisições podem
+    # compartilhar o mesmo app context (e o mesmo g), por isso a identidade
+    # é conferida a cada chamada e o cache é limpo em ``init_request_user``.
+    identity = get_jwt_identity()
+    cached = g.get("current_user") if has_app_context() else None
+    if cached is not None and cached[0] == identity:
+        return cached[1]
+    user_id = user_id_from_identity(identity)
+    user = User.query.get(user_id) if user_id else None
+    if has_app_context():
+        g.current_user = (identity, user)
+    return user
+
+
+def loaded_user():
+    """Usuário já carregado nesta requisição, sem consultar (profiler/réplicas)"""
+    cached = g.get("current_user")
+    return cached[1] if cached is not None else None
+
+
+def init_request_user(app):
+    @app.before_request
+    def _forget_user():
+        g.pop("current_user", None)
+
+
+def is_admin(user) -> bool:
+    return bool(user) and user.email.lower() in current_app.config["ADMIN_EMAILS"]
+
+
+def require_admin(f):
+    """Decorator para endpoints operacionais restritos a ``ADMIN_EMAILS``"""
+    from functools import wraps
+    from flask_jwt_extended import jwt_required
+
+    @wraps(f)
+    @jwt_required()
+    def decorated_function(*args, **kwargs):
+        if not is_admin(get_current_user()):
+            return {"error": "Acesso restrito a administradores"}, 403
+        return f(*args, **kwargs)
+
+    return decorated_function
 
 
 def require_roles(*allowed_roles):
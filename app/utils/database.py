@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Comportamento do banco sob saturação
+
+* Pool esgotado (``sqlalchemy.exc.TimeoutError`` após ``DB_POOL_TIMEOUT``)
+  e statement cancelado pelo ``statement_timeout`` do Postgres viram
+  ``503`` com ``Retry-After``: o cliente tenta de novo em vez de a thread
+  ficar pendurada e a requisição terminar em 500.
+* Em modo PgBouncer (``DB_PGBOUNCER``) o ``statement_timeout`` é aplicado
+  com ``SET LOCAL`` no início de cada transação.
+"""
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from werkzeug.exceptions import InternalServerError
+
+from .metrics import metrics
+
+# SQLSTATE query_canceled (statement_timeout)
+QUERY_CANCELED = "57014"
+
+
+def _set_local_statement_timeout(timeout_ms):
+    def on_begin(conn):
+        # Direto no cursor DBAPI: executar pela Connection dispararia o
+        # autobegin de novo dentro do próprio evento
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+        finally:
+            cursor.close()
+    return on_begin
+
+
+def _unavailable(reason):
+    from .. import db
+
+    db.session.rollback()
+    metrics.inc("db_unavailable_total", (("reason", reason),))
+    retry_after = str(current_app.config["DB_RETRY_AFTER"])
+    return {"error": "Banco de dados ocupado, tente novamente"}, 503, {"Retry-After": retry_after}
+
+
+def init_database(app, db):
+    timeout_ms = app.config["DB_STATEMENT_TIMEOUT_MS"]
+    if app.config["DB_PGBOUNCER"] and timeout_ms:
+        with app.app_context():
+            for engine in db.engines.values():
+                if engine.dialect.name == "postgresql":
+                    event.listen(engine, "begin", _set_local_statement_timeout(timeout_ms))
+
+    @app.errorhandler(PoolTimeoutError)
+    def _pool_exhausted(exc):
+        app.logger.warning("pool de conexões esgotado: %s", exc)
+        return _unavailable("pool_timeout")
+
+    @app.errorhandler(OperationalError)
+    def _operational_error(exc):
+        if getattr(exc.orig, "pgcode", None) == QUERY_CANCELED:
+            app.logger.warning("statement_timeout excedido: %s", exc.statement)
+            return _unavailable("statement_timeout")
+        app.logger.exception("erro operacional do banco")
+        return InternalServerError(original_exception=exc)
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação em planilha (CSV e XLSX) por streaming
+
+As linhas saem do banco por cursor no servidor (``yield_per``: cursor
+nomeado no Postgres, leitura em lotes no SQLite) e cada lote vira bytes da
+resposta na hora — a memória não cresce com o tamanho do processo e o
+cabeçalho chega ao cliente antes da primeira consulta terminar.
+
+* CSV no padrão do Excel em português: ``;`` como separador, vírgula
+  decimal e BOM UTF-8.  Textos que começam com ``= + - @`` ganham um
+  apóstrofo para não virarem fórmula (injeção de CSV).
+* XLSX montado com ``zipfile`` sobre um destino sem ``seek`` (o zip usa
+  descritores de dados), com strings inline — sem a tabela de strings
+  compartilhadas, que exigiria conhecer todas as linhas antes.  Passando
+  do limite de linhas do Excel, a exportação continua numa nova aba.
+
+Fontes: ``comparison_rows`` (itens × fornecedores aprovados, o comparativo
+em formato de planilha) e ``commercial_rows`` (uma linha por proposta e
+item, como ``list_commercial_items``).
+"""
+
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from flask import current_app, stream_with_context
+from sqlalchemy import Float, and_, cast, select
+
+from .. import db
+from ..models import Proposal, ProposalPrice, ProposalService, TR, TRServiceItem, User
+
+FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+YIELD_PER = 2000            # linhas por lote do cursor
+FLUSH_ROWS = 500            # linhas por pedaço da resposta
+XLSX_MAX_ROWS = 1048576     # limite de linhas de uma aba do Excel (com o cabeçalho)
+
+_CSV_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def response(fmt: str, filename: str, sheet: str, header, rows):
+    """Resposta em streaming no formato ``fmt`` (ver ``FORMATS``)"""
+    chunks = csv_chunks(header, rows) if fmt == "csv" else xlsx_chunks(sheet, header, rows)
+    return current_app.response_class(
+        stream_with_context(chunks),
+        mimetype=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+# -- CSV --------------------------------------------------------------------
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(value).replace(".", ",")
+    if isinstance(value, str) and value.startswith(_CSV_FORMULA):
+        return "'" + value
+    return value
+
+
+def csv_chunks(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";", lineterminator="\r\n")
+    writer.writerow(header)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(v) for v in row])
+        pending += 1
+        if pending >= FLUSH_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode("utf-8")
+
+
+# -- XLSX -------------------------------------------------------------------
+
+class _Sink:
+    """Destino do ZipFile sem ``seek``: acumula bytes até o gerador repassá-los"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _xml_cell(value, style="") -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if value != value or value in (float("inf"), float("-inf")):
+            return "<c/>"
+        return f"<c{style}><v>{value!r}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xml_row(number: int, values, style="") -> str:
+    return f'<row r="{number}">' + "".join(_xml_cell(v, style) for v in values) + "</row>"
+
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    "</sheetView></sheetViews><sheetData>"
+)
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    "</styleSheet>"
+)
+
+
+def _workbook_parts(names):
+    sheets = "".join(
+        f'<sheet name="{escape(name)}" sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(names, 1)
+    )
+    rels = "".join(
+        f'<Relationship Id="rId{i}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(names) + 1)
+    )
+    overrides = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(names) + 1)
+    )
+    n = len(names) + 1
+    return {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f"{overrides}</Types>"
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f"<sheets>{sheets}</sheets></workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f"{rels}"
+            f'<Relationship Id="rId{n}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/></Relationships>'
+        ),
+        "xl/styles.xml": _STYLES,
+    }
+
+
+def xlsx_chunks(sheet, header, rows):
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+    head = (_SHEET_HEAD + _xml_row(1, header, ' s="1"')).encode("utf-8")
+    names = [sheet]
+    part = archive.open("xl/worksheets/sheet1.xml", "w")
+    part.write(head)
+    yield sink.take()
+
+    number, lines = 1, []
+    for row in rows:
+        if number >= XLSX_MAX_ROWS:
+            # Aba cheia: fecha e continua numa nova, com o mesmo cabeçalho
+            part.write(("".join(lines) + _SHEET_TAIL).encode("utf-8"))
+            part.close()
+            names.append(f"{sheet} ({len(names) + 1})")
+            part = archive.open(f"xl/worksheets/sheet{len(names)}.xml", "w")
+            part.write(head)
+            number, lines = 1, []
+        number += 1
+        lines.append(_xml_row(number, row))
+        if len(lines) >= FLUSH_ROWS:
+            part.write("".join(lines).encode("utf-8"))
+            lines = []
+            data = sink.take()
+            if data:
+                yield data
+    part.write(("".join(lines) + _SHEET_TAIL).encode("utf-8"))
+    part.close()
+
+    # Pasta de trabalho por último: só agora se sabe quantas abas houve
+    for name, content in _workbook_parts(names).items():
+        archive.writestr(name, content)
+    archive.close()
+    yield sink.take()
+
+
+# -- fontes -----------------------------------------------------------------
+
+def _total(qty, price):
+    # Quantidade com 3 casas × preço com 2: 5 casas são exatas, o resto é ruído
+    # de float; a soma da coluna bate com ``total_price`` do comparativo
+    return round(qty * price, 5)
+
+
+def _stream(stmt):
+    return db.session.execute(stmt.execution_options(yield_per=YIELD_PER))
+
+
+def comparison_header(suppliers):
+    header = ["Item", "Código", "Descrição", "Unid", "Qtde TR"]
+    for name in suppliers:
+        header += [f"Qtde - {name}", f"Preço unit. - {name}", f"Total - {name}"]
+    return header + ["Menor preço unit.", "Fornecedor do menor preço"]
+
+
+def comparison_rows(tr_id: int, proposals):
+    """Uma linha por item do TR, com quantidade, preço e total de cada proposta
+
+    ``proposals``: [(proposal_id, nome do fornecedor)], na ordem das colunas.
+    A última linha traz o total de cada proposta.
+    """
+    column = {pid: i for i, (pid, _) in enumerate(proposals)}
+    stmt = (
+        select(
+            TRServiceItem.id, TRServiceItem.item_ordem, TRServiceItem.codigo, TRServiceItem.descricao,
+            TRServiceItem.unid, cast(TRServiceItem.qtde, Float), ProposalService.proposal_id,
+            cast(ProposalService.qty, Float), cast(ProposalPrice.unit_price, Float),
+        )
+        .select_from(TRServiceItem)
+        .outerjoin(ProposalService, and_(
+            ProposalService.service_item_id == TRServiceItem.id,
+            ProposalService.proposal_id.in_(list(column)),
+        ))
+        .outerjoin(ProposalPrice, and_(
+            ProposalPrice.proposal_id == ProposalService.proposal_id,
+            ProposalPrice.service_item_id == ProposalService.service_item_id,
+        ))
+        .where(TRServiceItem.tr_id == tr_id)
+        .order_by(TRServiceItem.item_ordem, TRServiceItem.id, ProposalService.proposal_id)
+    )
+    totals = [0.0] * len(proposals)
+
+    def emit(item, cells):
+        row = list(item)
+        best = None
+        for i, (qty, price) in enumerate(cells):
+            total = _total(qty, price) if qty is not None and price is not None else None
+            if total is not None:
+                totals[i] += total
+            if price is not None and (best is None or price < best[0]):
+                best = (price, proposals[i][1])
+            row += [qty, price, total]
+        return row + (list(best) if best else [None, None])
+
+    current, item, cells = None, None, None
+    for item_id, ordem, codigo, descricao, unid, qtde, pid, qty, price in _stream(stmt):
+        if item_id != current:
+            if current is not None:
+                yield emit(item, cells)
+            current, item = item_id, (ordem, codigo, descricao, unid, qtde)
+            cells = [(None, None)] * len(proposals)
+        if pid is not None:
+            cells[column[pid]] = (qty, price)
+    if current is not None:
+        yield emit(item, cells)
+
+    row = ["Total", None, None, None, None]
+    for total in totals:
+        row += [None, None, round(total, 2)]
+    yield row + [None, None]
+
+
+COMMERCIAL_HEADER = [
+    "Proposta", "Fornecedor", "Item", "Código", "Descrição", "Unid", "Qtde TR",
+    "Qtde proposta", "Preço unit.", "Total item",
+]
+
+
+def commercial_rows(proc_id: int, supplier_user_id=None):
+    """Uma linha por proposta e item do TR (itens sem cotação com zero, como no JSON)"""
+    stmt = (
+        select(
+            Proposal.id, User.full_name, TRServiceItem.item_ordem, TRServiceItem.codigo,
+            TRServiceItem.descricao, TRServiceItem.unid, cast(TRServiceItem.qtde, Float),
+            cast(ProposalService.qty, Float), cast(ProposalPrice.unit_price, Float),
+        )
+        .select_from(Proposal)
+        .join(User, User.id == Proposal.supplier_user_id)
+        .join(TR, TR.procurement_id == Proposal.procurement_id)
+        .join(TRServiceItem, TRServiceItem.tr_id == TR.id)
+        .outerjoin(ProposalService, and_(
+            ProposalService.proposal_id == Proposal.id,
+            ProposalService.service_item_id == TRServiceItem.id,
+        ))
+        .outerjoin(ProposalPrice, and_(
+            ProposalPrice.proposal_id == Proposal.id,
+            ProposalPrice.service_item_id == TRServiceItem.id,
+        ))
+        .where(Proposal.procurement_id == proc_id)
+        .order_by(Proposal.id, TRServiceItem.item_ordem)
+    )
+    if supplier_user_id is not None:
+        stmt = stmt.where(Proposal.supplier_user_id == supplier_user_id)
+    for pid, supplier, ordem, codigo, descricao, unid, qtde, qty, price in _stream(stmt):
+        qty, price = qty or 0.0, price or 0.0
+        yield [pid, supplier, ordem, codigo, descricao, unid, qtde, qty, price, _total(qty, price)]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Resolução em lote de convites para fornecedores cadastrados
+
+Substitui o ``User.query.filter_by(email=..., role=FORNECEDOR)`` por convite:
+uma única consulta com JOIN na organização devolve todos os fornecedores
+indexados por email.  Convites já vinculados (``supplier_user_id``) são
+resolvidos pela chave primária, sem comparar emails.
+"""
+
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+
+from ..models import Role, User
+
+
+def resolve_suppliers(emails=(), user_ids=()):
+    """Devolve ``{email: User}`` com ``organization`` já carregada"""
+    emails = set(emails)
+    user_ids = set(user_ids)
+    conditions = []
+    if user_ids:
+        conditions.append(User.id.in_(user_ids))
+    if emails:
+        conditions.append(User.email.in_(emails))
+    if not conditions:
+        return {}
+
+    users = User.query.options(joinedload(User.organization)).filter(
+        User.role == Role.FORNECEDOR,
+        or_(*conditions)
+    ).all()
+    return {u.email: u for u in users}
+
+
+def resolve_invite_suppliers(invites):
+    """Mapeia o email de cada convite para o fornecedor cadastrado, se houver"""
+    return resolve_suppliers(
+        emails=(inv.email for inv in invites if not inv.supplier_user_id),
+        user_ids=(inv.supplier_user_id for inv in invites if inv.supplier_user_id),
+    )
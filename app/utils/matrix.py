@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Matriz fornecedor × item com NumPy (análise comparativa e relatórios)
+
+O NumPy só é importado no primeiro uso, fora da inicialização da app
+(``LAZY_MODULES`` em benchmarks/bench_startup.py).
+"""
+
+from itertools import chain
+
+_numpy = None
+
+# ``positions`` usa uma tabela direta quando os ids cabem em até
+# DENSE_FACTOR × len(ids) posições (ids de um mesmo TR são quase contíguos)
+DENSE_FACTOR = 4
+
+
+def np():
+    global _numpy
+    if _numpy is None:
+        import numpy
+        _numpy = numpy
+    return _numpy
+
+
+def columns(rows, width):
+    """Colunas float de uma lista de linhas numéricas (resultado de consulta)
+
+    Uma passada em C sobre as linhas achatadas, em vez de uma lista Python
+    por coluna convertida depois.  NULL vira NaN.
+    """
+    numpy = np()
+    count = len(rows) * width
+    try:
+        flat = numpy.fromiter(chain.from_iterable(rows), dtype=float, count=count)
+    except TypeError:
+        flat = numpy.fromiter(
+            (numpy.nan if v is None else v for v in chain.from_iterable(rows)),
+            dtype=float, count=count,
+        )
+    return tuple(flat.reshape(len(rows), width).T)
+
+
+def positions(ids, values):
+    """Posição de cada valor em ``ids`` (-1 se ausente)
+
+    Tabela direta se os ids forem densos, senão busca binária.
+    """
+    numpy = np()
+    ids = numpy.asarray(ids, dtype=numpy.int64)
+    values = numpy.asarray(values, dtype=numpy.int64)
+    if not len(ids):
+        return numpy.full(len(values), -1, dtype=numpy.intp)
+    low, high = int(ids.min()), int(ids.max())
+    if high - low < DENSE_FACTOR * len(ids):
+        table = numpy.full(high - low + 1, -1, dtype=numpy.intp)
+        table[ids - low] = numpy.arange(len(ids))
+        if not len(values) or (values.min() >= low and values.max() <= high):
+            return table[values - low]
+        inside = (values >= low) & (values <= high)
+        out = numpy.full(len(values), -1, dtype=numpy.intp)
+        out[inside] = table[values[inside] - low]
+        return out
+    order = numpy.argsort(ids)
+    found = numpy.minimum(numpy.searchsorted(ids, values, sorter=order), len(ids) - 1)
+    pos = order[found]
+    return numpy.where(ids[pos] == values, pos, -1)
+
+
+def fill(shape, rows, cols, *series):
+    """Matrizes ``shape`` (NaN onde não há valor) com ``series`` nas células (rows, cols)
+
+    ``rows``/``cols`` vêm de ``positions``; células com -1 são ignoradas.
+    """
+    numpy = np()
+    keep = (rows >= 0) & (cols >= 0)
+    partial = not keep.all()
+    if partial:
+        rows, cols = rows[keep], cols[keep]
+    out = []
+    for values in series:
+        values = numpy.asarray(values, dtype=float)
+        matrix = numpy.full(shape, numpy.nan)
+        matrix[rows, cols] = values[keep] if partial else values
+        out.append(matrix)
+    return out
+
+
+def column_quantile(ordered, n, q):
+    """Quantil ``q`` (interpolação linear) de cada coluna já ordenada, NaN no fim
+
+    ``np.nanpercentile`` cai num laço Python por coluna quando há NaN; com a
+    matriz ordenada basta indexar as posições de cada coluna.
+    """
+    numpy = np()
+    if not ordered.shape[0]:
+        return numpy.full(ordered.shape[1], numpy.nan)
+    last = numpy.maximum(n - 1, 0)
+    pos = last * q
+    lo = numpy.floor(pos).astype(numpy.intp)
+    hi = numpy.minimum(lo + 1, last)
+    cols = numpy.arange(ordered.shape[1])
+    a, b = ordered[lo, cols], ordered[hi, cols]
+    return a + (b - a) * (pos - lo)
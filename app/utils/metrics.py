@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas operacionais no formato texto do Prometheus (``GET /metrics``)
+
+A coleta não usa lock no caminho quente: cada thread escreve apenas no seu
+próprio shard (contadores e histogramas em dicts simples) e o lock só é
+tomado quando uma thread nova registra o shard e na raspagem.  No modo
+threading do Werkzeug cada requisição roda numa thread nova; os shards de
+threads encerradas são consolidados num agregado único e descartados.
+
+Gauges derivados de estado (uso do pool, clientes Socket.IO por tipo de
+sala) são lidos no momento da raspagem por callbacks.
+
+Métricas expostas:
+
+* ``http_requests_total`` / ``http_request_duration_seconds`` por
+  blueprint, endpoint e método; ``http_requests_in_flight``;
+* ``db_pool_checkout_seconds`` (espera por conexão do pool),
+  ``db_pool_connections`` (em uso, ociosas, overflow, tamanho),
+  ``db_pool_events_total`` e ``db_unavailable_total`` (respostas 503);
+* ``socketio_connected_clients``, ``socketio_room_members`` por tipo de
+  sala e ``socketio_emits_total`` por evento;
+* ``bcrypt_in_flight`` (hashes em andamento, a fila de CPU do login) e
+  ``bcrypt_duration_seconds``.
+"""
+
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask_socketio import SocketIO
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Threads novas registradas entre duas varreduras de shards encerrados
+_SWEEP_EVERY = 256
+
+
+class _Shard:
+    """Valores acumulados por uma única thread"""
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}    # (nome, labels) -> valor
+        self.histograms = {}  # (nome, labels) -> [contagem por bucket..., soma]
+
+    def merge(self, other):
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, values in other.histograms.items():
+            current = self.histograms.get(key)
+            if current is None:
+                self.histograms[key] = list(values)
+            else:
+                for i, v in enumerate(values):
+                    current[i] += v
+
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []         # [(weakref da thread, _Shard), ...]
+        self._retired = _Shard()  # soma dos shards de threads encerradas
+        self._new_threads = 0
+        self._meta = {}           # nome -> (tipo, ajuda, buckets)
+        self._callbacks = []
+
+    # -- declaração -----------------------------------------------------
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._meta[name] = (kind, help_text, buckets)
+
+    def gauge_callback(self, fn):
+        """``fn()`` devolve [(nome, labels, valor), ...] na raspagem"""
+        if fn not in self._callbacks:
+            self._callbacks.append(fn)
+        return fn
+
+    # -- caminho quente (sem lock) --------------------------------------
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+                self._new_threads += 1
+                if self._new_threads >= _SWEEP_EVERY:
+                    self._sweep()
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        histograms = self._shard().histograms
+        buckets = self._meta[name][2]
+        key = (name, labels)
+        values = histograms.get(key)
+        if values is None:
+            # Um contador por bucket, o do +Inf e a soma no final
+            values = histograms[key] = [0] * (len(buckets) + 2)
+        values[bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    @contextmanager
+    def in_flight(self, name, labels=()):
+        self.inc(name, labels)
+        try:
+            yield
+        finally:
+            self.inc(name, labels, -1)
+
+    # -- raspagem -------------------------------------------------------
+
+    def _sweep(self):
+        """Consolida shards de threads encerradas (chamar com o lock)"""
+        alive = []
+        for ref, shard in self._shards:
+            thread = ref()
+            if thread is None or not thread.is_alive():
+                self._retired.merge(shard)
+            else:
+                alive.append((ref, shard))
+        self._shards = alive
+        self._new_threads = 0
+
+    def snapshot(self) -> _Shard:
+        with self._lock:
+            self._sweep()
+            total = _Shard()
+            total.merge(self._retired)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            # dict.copy() é atômico sob o GIL; a thread dona segue escrevendo
+            copy = _Shard()
+            copy.counters = shard.counters.copy()
+            copy.histograms = {k: list(v) for k, v in shard.histograms.copy().items()}
+            total.merge(copy)
+        return total
+
+    def render(self) -> str:
+        data = self.snapshot()
+        series = {}
+        for (name, labels), value in data.counters.items():
+            series.setdefault(name, []).append((labels, value))
+        for fn in self._callbacks:
+            try:
+                rows = fn()
+            except Exception:
+                continue
+            for name, labels, value in rows:
+                series.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (hname, labels), values in sorted(data.histograms.items()):
+                    if hname != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets, values):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', _num(bound)),))} {cumulative}")
+                    count = cumulative + values[len(buckets)]
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_num(values[-1])}")
+                    lines.append(f"{name}_count{_labels(labels)} {count}")
+            else:
+                for labels, value in sorted(series.get(name, ())):
+                    lines.append(f"{name}{_labels(labels)} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _num(value) -> str:
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+metrics = Registry()
+
+metrics.describe("http_requests_total", "counter", "Requisições HTTP atendidas")
+metrics.describe("http_request_duration_seconds", "histogram",
+                 "Latência das requisições HTTP", LATENCY_BUCKETS)
+metrics.describe("http_requests_in_flight", "gauge", "Requisições HTTP em andamento")
+metrics.describe("db_pool_checkout_seconds", "histogram",
+                 "Espera para obter uma conexão do pool", POOL_WAIT_BUCKETS)
+metrics.describe("db_pool_connections", "gauge", "Conexões do pool por estado")
+metrics.describe("db_pool_events_total", "counter",
+                 "Conexões abertas (connect) e descartadas (invalidate) pelo pool")
+metrics.describe("db_unavailable_total", "counter",
+                 "Requisições respondidas com 503 por pool esgotado ou statement_timeout")
+metrics.describe("db_route_total", "counter", "Requisições roteadas ao primário ou a uma réplica")
+metrics.describe("sqlite_writer_timeouts_total", "counter",
+                 "Escritas SQLite que desistiram da fila de escrita")
+metrics.describe("socketio_connected_clients", "gauge", "Conexões Socket.IO autenticadas")
+metrics.describe("socketio_room_members", "gauge", "Participações em salas por tipo de sala")
+metrics.describe("socketio_emits_total", "counter", "Eventos Socket.IO emitidos pelo servidor")
+metrics.describe("bcrypt_in_flight", "gauge", "Operações bcrypt em andamento")
+metrics.describe("bcrypt_duration_seconds", "histogram",
+                 "Duração das operações bcrypt", LATENCY_BUCKETS)
+
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO que conta os eventos emitidos por nome"""
+
+    def emit(self, event, *args, **kwargs):
+        metrics.inc("socketio_emits_total", (("event", event),))
+        return super().emit(event, *args, **kwargs)
+
+
+def _count_pool_event(name, labels):
+    labels = labels + (("event", name),)
+
+    def handler(*args):
+        metrics.inc("db_pool_events_total", labels)
+    return handler
+
+
+def instrument_engine(engine, bind="default"):
+    """Mede a espera por conexão: ``raw_connection`` é onde o pool bloqueia"""
+    if getattr(engine, "_metrics_bind", None):
+        return
+    raw_connection = engine.raw_connection
+    labels = (("bind", bind),)
+
+    def timed_raw_connection():
+        started = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            metrics.observe("db_pool_checkout_seconds", time.perf_counter() - started, labels)
+
+    engine.raw_connection = timed_raw_connection
+    engine._metrics_bind = bind
+
+    # Invalidações incluem conexões mortas detectadas pelo pre-ping
+    for name in ("connect", "invalidate"):
+        event.listen(engine, name, _count_pool_event(name, labels))
+
+    @metrics.gauge_callback
+    def pool_usage():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            return []
+        return [
+            ("db_pool_connections", labels + (("state", "checked_out"),), pool.checkedout()),
+            ("db_pool_connections", labels + (("state", "idle"),), pool.checkedin()),
+            ("db_pool_connections", labels + (("state", "overflow"),), max(pool.overflow(), 0)),
+            ("db_pool_connections", labels + (("state", "size"),), pool.size()),
+        ]
+
+
+def _socket_rooms():
+    from . import sockets
+    clients, rooms = sockets.room_stats()
+    rows = [("socketio_connected_clients", (), clients)]
+    rows.extend(("socketio_room_members", (("room_type", kind),), n) for kind, n in rooms.items())
+    return rows
+
+
+def init_metrics(app, db):
+    from flask import g, request
+
+    metrics.gauge_callback(_socket_rooms)
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            instrument_engine(engine, bind or "default")
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics_started = time.perf_counter()
+        metrics.inc("http_requests_in_flight")
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.get("_metrics_started")
+        if started is None:
+            return response
+        # Rotas inexistentes agrupadas para não explodir a cardinalidade
+        endpoint = request.endpoint or "unmatched"
+        route = (
+            ("blueprint", request.blueprint or ""),
+            ("endpoint", endpoint),
+            ("method", request.method),
+        )
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - started, route)
+        metrics.inc("http_requests_total", route + (("status", str(response.status_code)),))
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        if g.pop("_metrics_started", None) is not None:
+            metrics.inc("http_requests_in_flight", value=-1)
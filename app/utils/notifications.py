@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Notificações persistentes por usuário
+
+Os eventos enviados para ``user:{id}`` também são gravados na tabela
+``notifications`` para que usuários offline não os percam.  As gravações
+passam por ``NotificationBatch``: um fan-out para centenas de fornecedores
+vira um único INSERT multi-linha e um UPDATE por valor de incremento nos
+contadores de não lidas.
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import insert, update
+
+from .. import db, socketio
+from ..models import Notification, NotificationCounter
+
+
+def insert_ignore(model):
+    """INSERT ... ON CONFLICT DO NOTHING no dialeto da sessão"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(model)
+    return dialect_insert(model).on_conflict_do_nothing()
+
+
+def bump_unread(counts: dict):
+    """Soma ``counts[user_id]`` ao contador de não lidas de cada usuário"""
+    if not counts:
+        return
+    db.session.execute(
+        insert_ignore(NotificationCounter),
+        [{"user_id": uid, "unread": 0} for uid in counts],
+    )
+    by_increment = defaultdict(list)
+    for uid, n in counts.items():
+        by_increment[n].append(uid)
+    for n, uids in by_increment.items():
+        db.session.execute(
+            update(NotificationCounter)
+            .where(NotificationCounter.user_id.in_(uids))
+            .values(unread=NotificationCounter.unread + n)
+            .execution_options(synchronize_session=False)
+        )
+
+
+class NotificationBatch:
+    """
+    Acumula notificações de uma requisição.
+
+    ``flush()`` grava tudo na transação corrente (antes do commit) e
+    ``emit()`` envia os eventos em tempo real depois do commit.
+    """
+
+    def __init__(self):
+        self._rows = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, user_id: int, event: str, payload: dict):
+        self._rows.append({"user_id": user_id, "event": event, "payload": payload})
+
+    def flush(self):
+        if not self._rows:
+            return
+        db.session.execute(insert(Notification), self._rows)
+        counts = defaultdict(int)
+        for row in self._rows:
+            counts[row["user_id"]] += 1
+        bump_unread(counts)
+
+    def emit(self):
+        for row in self._rows:
+            socketio.emit(row["event"], row["payload"], to=f"user:{row['user_id']}")
+        self._rows = []
+
+
+def serialize(n: Notification) -> dict:
+    return {
+        "id": n.id,
+        "event": n.event,
+        "payload": n.payload,
+        "read": n.read_at is not None,
+        "read_at": n.read_at.isoformat() if n.read_at else None,
+        "created_at": n.created_at.isoformat() if n.created_at else None,
+    }
+
+
+def unread_count(user_id: int) -> int:
+    counter = NotificationCounter.query.get(user_id)
+    return counter.unread if counter else 0
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Cursores opacos para paginação por chave em (created_at, id)
+
+Listagens ordenadas só por ``id`` usam o próprio id como cursor (ver
+/api/notifications); quando a ordem é por data, o cursor leva o par.  A
+busca ordena por relevância e usa o par (score, id).
+"""
+
+import base64
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> str:
+    return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+
+
+def decode_cursor(cursor: str):
+    """(created_at, id); ValueError se o cursor for inválido"""
+    try:
+        created_at, row_id = _decode(cursor).rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError("cursor inválido") from exc
+
+
+def encode_score_cursor(score: float, row_id: int) -> str:
+    # repr() preserva o float exato: a próxima página compara com igualdade
+    raw = f"{score!r}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_score_cursor(cursor: str):
+    """(score, id); ValueError se o cursor for inválido"""
+    try:
+        score, row_id = _decode(cursor).rsplit("|", 1)
+        return float(score), int(row_id)
+    except (UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError("cursor inválido") from exc
@@ -1,12 +1,33 @@
 # -*- coding: utf-8 -*-
-from passlib.hash import bcrypt
+import time
 from typing import Optional
+from .metrics import metrics
+
+_bcrypt = None
+
+def _hasher():
+    # passlib (e o backend bcrypt) só é carregado no primeiro cadastro/login,
+    # fora do caminho de inicialização da aplicação
+    global _bcrypt
+    if _bcrypt is None:
+        from passlib.hash import bcrypt
+        _bcrypt = bcrypt
+    return _bcrypt
+
+def _timed(op, fn, *args):
+    # bcrypt é CPU-bound: o gauge de operações em andamento é a fila do login
+    started = time.perf_counter()
+    with metrics.in_flight("bcrypt_in_flight"):
+        try:
+            return fn(*args)
+        finally:
+            metrics.observe("bcrypt_duration_seconds", time.perf_counter() - started, (("op", op),))
 
 def hash_password(password: str) -> str:
-    return bcrypt.hash(password)
+    return _timed("hash", _hasher().hash, password)
 
 def verify_password(password: str, password_hash: str) -> bool:
     try:
-        return bcrypt.verify(password, password_hash)
+        return _timed("verify", _hasher().verify, password, password_hash)
     except Exception:
         return False
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Detecção de anomalias de preço na análise comparativa
+
+Trabalha sobre a matriz fornecedor × item de preços unitários (NumPy, sem
+laço por célula) e marca:
+
+* ``outlier_high``/``outlier_low``: fora da faixa dos concorrentes no item.
+  O z-score robusto (mediana/MAD), as cercas de Tukey (IQR) e um desvio
+  mínimo de ``MIN_DEVIATION`` sobre a mediana precisam concordar — com
+  poucas propostas o MAD oscila muito e cada regra sozinha marca demais;
+* ``unit_error``: preço ≈ 10, 100 ou 1000 vezes a referência (ou a fração),
+  típico de unidade trocada (m² × cm², R$ mil, vírgula no lugar errado);
+* ``above_history``/``below_history``: fora da faixa p10–p90 histórica do
+  código de serviço (``price_stats``), com folga de ``HISTORY_BAND``;
+* ``zero_price``: item cotado a zero.
+
+A referência de cada item é a mediana dos concorrentes (3+ propostas),
+senão a mediana histórica, senão a outra proposta (2 propostas — aí as
+duas são marcadas num erro de unidade, não há como saber qual errou).  Por
+fornecedor, o desvio ponderado pelo valor compara o total dele com o total
+das referências nas mesmas quantidades.
+
+O NumPy só é importado na primeira análise (app/utils/matrix.py).
+"""
+
+import time
+
+from . import matrix
+from .metrics import metrics
+
+Z_LIMIT = 3.5           # |z| robusto acima disso é candidato a outlier
+IQR_K = 1.5             # cercas de Tukey: [Q1 - k·IQR, Q3 + k·IQR]
+MIN_DEVIATION = 0.5     # outlier fica a pelo menos 50% da mediana do item
+MIN_PEERS = 3           # propostas no item para usar as estatísticas do próprio item
+UNIT_FACTORS = 3        # potências de 10 testadas: 10, 100, 1000
+UNIT_TOLERANCE = 0.1    # distância máxima de log10(preço/referência) a um inteiro
+HISTORY_BAND = 1.25     # folga sobre p10/p90 históricos
+
+metrics.describe("price_anomaly_seconds", "histogram", "Tempo da análise de anomalias de preço",
+                 buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5))
+
+def analyze(proposal_ids, items, cells, history=None) -> dict:
+    """Anomalias da matriz de preços
+
+    ``cells``: colunas (proposal_ids, service_item_ids, qtys, unit_prices)
+    dos itens cotados, de preferência já arrays (``matrix.columns``);
+    ``history``: resumo de ``price_stats.lookup`` por item.
+    """
+    started = time.perf_counter()
+    np = matrix.np()
+    history = history or {}
+    cols = {item.id: c for c, item in enumerate(items)}
+    shape = (len(proposal_ids), len(items))
+
+    pids, item_ids, qtys, unit_prices = cells
+    # Ids viram posições na matriz (tabela direta ou busca binária), sem laço Python
+    qty, prices = matrix.fill(
+        shape, matrix.positions(proposal_ids, pids),
+        matrix.positions([item.id for item in items], item_ids), qtys, unit_prices
+    )
+    qty = np.nan_to_num(qty, copy=False)
+
+    quoted = ~np.isnan(prices)
+    zero = quoted & (prices <= 0)
+    P = np.where(zero, np.nan, prices)
+    valid = quoted & ~zero
+    n = valid.sum(axis=0)
+
+    # Estatísticas por item (coluna)
+    ordered = np.sort(P, axis=0)
+    q1, med, q3 = (matrix.column_quantile(ordered, n, q) for q in (0.25, 0.5, 0.75))
+    spread = np.abs(P - med)
+    mad = matrix.column_quantile(np.sort(spread, axis=0), n, 0.5)
+    # MAD zero (maioria com o mesmo preço): desvio absoluto médio como escala
+    mean_ad = np.where(n > 0, np.nansum(spread, axis=0) / np.maximum(n, 1), 0)
+    scale = np.where(mad > 0, mad / 0.6745, mean_ad * 1.2533)
+    peers = n >= MIN_PEERS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(scale > 0, (P - med) / scale, 0.0)
+        iqr = q3 - q1
+        outside = (P > q3 + IQR_K * iqr) | (P < q1 - IQR_K * iqr)
+        material = np.abs(P / med - 1) > MIN_DEVIATION
+        outlier = valid & peers & (np.abs(z) > Z_LIMIT) & outside & material
+
+        hist = np.full((3, shape[1]), np.nan)  # p10, p50, p90
+        for item_id, summary in history.items():
+            if item_id in cols and "p50" in summary:
+                hist[:, cols[item_id]] = (summary["p10"], summary["p50"], summary["p90"])
+        other = np.nansum(P, axis=0) - P  # a outra proposta, quando há duas
+        ref = np.where(peers, med, hist[1])
+        ref = np.where(np.isnan(ref) & (n == 2), other, ref)
+        ref = np.where(ref > 0, ref, np.nan)
+        source = np.where(peers, "peers", np.where(np.isnan(hist[1]), "other_proposal", "history"))
+
+        ratio = P / ref
+        lr = np.log10(ratio)
+        k = np.rint(lr)
+        unit_error = valid & (k != 0) & (np.abs(k) <= UNIT_FACTORS) & (np.abs(lr - k) < UNIT_TOLERANCE)
+        above = valid & (P > hist[2] * HISTORY_BAND)
+        below = valid & (P < hist[0] / HISTORY_BAND)
+
+        # Por fornecedor: total nas referências × total cotado, mesmas quantidades
+        has_ref = valid & ~np.isnan(ref) & (qty > 0)
+        quoted_value = np.where(has_ref, qty * P, 0).sum(axis=1)
+        ref_value = np.where(has_ref, qty * ref, 0).sum(axis=1)
+        weighted = np.where(ref_value > 0, quoted_value / ref_value - 1, np.nan)
+        log_dev = np.where(has_ref, np.abs(np.log(ratio)), 0).sum(axis=1)
+        typical = np.exp(log_dev / np.maximum(has_ref.sum(axis=1), 1)) - 1
+
+    reasons = {
+        "outlier_high": outlier & (P > med),
+        "outlier_low": outlier & (P < med),
+        "unit_error": unit_error,
+        "above_history": above,
+        "below_history": below,
+        "zero_price": zero,
+    }
+    flagged = np.zeros(shape, dtype=bool)
+    for mask in reasons.values():
+        flagged |= mask
+
+    # Valores das células marcadas tirados de uma vez; o laço só monta os dicts
+    rs, cs = np.nonzero(flagged)
+    names = list(reasons)
+    cell_reasons = np.stack([reasons[name][rs, cs] for name in names], axis=1).tolist()
+    cell_prices = prices[rs, cs].tolist()
+    cell_refs = np.where(np.isnan(ref[rs, cs]), None, ref[rs, cs]).tolist()
+    cell_factors = np.where(unit_error[rs, cs], 10.0 ** k[rs, cs], np.nan).tolist()
+    cell_z = np.where(peers[cs] & ~zero[rs, cs], z[rs, cs], np.nan).tolist()
+    sources = source.tolist()
+    flags = []
+    for i, (r, c) in enumerate(zip(rs.tolist(), cs.tolist())):
+        item = items[c]
+        cell_ref = cell_refs[i]
+        flag = {
+            "proposal_id": proposal_ids[r],
+            "service_item_id": item.id,
+            "item_ordem": item.item_ordem,
+            "codigo": item.codigo,
+            "descricao": item.descricao,
+            "unit_price": cell_prices[i],
+            "reference": None if cell_ref is None else round(cell_ref, 2),
+            "reference_source": None if cell_ref is None else sources[c],
+            "reasons": [name for name, on in zip(names, cell_reasons[i]) if on],
+        }
+        if cell_factors[i] == cell_factors[i]:
+            flag["factor"] = cell_factors[i]
+        if cell_z[i] == cell_z[i]:
+            flag["robust_z"] = round(cell_z[i], 2)
+        flags.append(flag)
+
+    per_supplier = {name: mask.sum(axis=1).tolist() for name, mask in reasons.items()}
+    items_quoted = quoted.sum(axis=1).tolist()
+    items_compared = has_ref.sum(axis=1).tolist()
+    suppliers = []
+    for r, pid in enumerate(proposal_ids):
+        suppliers.append({
+            "proposal_id": pid,
+            "items_quoted": items_quoted[r],
+            "items_compared": items_compared[r],
+            "weighted_deviation_pct": None if np.isnan(weighted[r]) else round(float(weighted[r]) * 100, 1),
+            "typical_deviation_pct": round(float(typical[r]) * 100, 1),
+            "flags": {name: counts[r] for name, counts in per_supplier.items() if counts[r]},
+        })
+
+    counts = {name: int(mask.sum()) for name, mask in reasons.items()}
+    if counts["unit_error"] or counts["zero_price"]:
+        risk = "Alto"
+    elif counts["outlier_high"] + counts["outlier_low"] + counts["above_history"] + counts["below_history"]:
+        risk = "Médio"
+    else:
+        risk = "Baixo"
+    metrics.observe("price_anomaly_seconds", time.perf_counter() - started)
+    return {
+        "items_analyzed": shape[1],
+        "items_with_history": int((~np.isnan(hist[1])).sum()),
+        "counts": counts,
+        "price_risk": risk,
+        "flags": flags,
+        "suppliers": suppliers,
+    }
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Índice histórico de preços unitários por código de serviço
+
+Cada preço de proposta enviada entra no agregado do seu (codigo, unid) em
+``price_stats``: contagem, soma (média), mínimo, máximo e um esboço de
+quantis.  A atualização é incremental, na transação do envio
+(``record_proposal``):
+
+* ``price_samples`` guarda o valor contabilizado de cada item; no reenvio,
+  só os preços alterados saem do agregado (valor antigo) e entram de novo;
+* as linhas de ``price_stats`` afetadas são travadas em ordem de chave
+  (``FOR UPDATE`` no Postgres), então envios simultâneos não perdem
+  atualizações nem entram em deadlock.
+
+``GET /api/tr/<id>/reference-prices`` devolve os preços de referência de
+todos os itens do TR com uma consulta, para estimar o ``orcamento_estimado``.
+"""
+
+import gzip
+import json
+import math
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, select, text, tuple_
+
+from .. import db
+from ..models import (
+    PriceSample, PriceStat, ProcurementArchive, Proposal, ProposalPrice, TRServiceItem
+)
+from .notifications import insert_ignore
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class QuantileSketch:
+    """Histograma em escala logarítmica (DDSketch) com erro relativo ``alpha``
+
+    O preço ``x`` cai no balde ``ceil(log(x) / log(gamma))``; o quantil
+    devolvido fica a no máximo ``alpha`` (1%) do valor exato, com um balde
+    por faixa de ~2% de preço.  Como são só contagens, remover um valor é
+    decrementar o balde — o que o reenvio de uma proposta precisa.
+    """
+
+    def __init__(self, alpha=0.01, bins=None, zeros=0):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = bins or {}
+        self.zeros = zeros
+
+    @classmethod
+    def from_json(cls, data: dict):
+        return cls(data["alpha"], {int(k): v for k, v in data["bins"].items()}, data["zeros"])
+
+    def to_json(self) -> dict:
+        return {"alpha": self.alpha, "zeros": self.zeros,
+                "bins": {str(k): v for k, v in sorted(self.bins.items())}}
+
+    @property
+    def count(self) -> int:
+        return self.zeros + sum(self.bins.values())
+
+    def _bin(self, x: float) -> int:
+        return math.ceil(math.log(x) / self._log_gamma)
+
+    def add(self, x: float, n=1):
+        if x <= 0:
+            self.zeros += n
+            return
+        k = self._bin(x)
+        self.bins[k] = self.bins.get(k, 0) + n
+
+    def remove(self, x: float):
+        if x <= 0:
+            self.zeros = max(self.zeros - 1, 0)
+            return
+        k = self._bin(x)
+        left = self.bins.get(k, 0) - 1
+        if left > 0:
+            self.bins[k] = left
+        else:
+            self.bins.pop(k, None)
+
+    def quantile(self, q: float):
+        n = self.count
+        if not n:
+            return None
+        rank = q * (n - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if rank < seen:
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+def _key(codigo, unid):
+    """(codigo, unid) normalizados, ou None para item sem código"""
+    codigo = (codigo or "").strip()
+    if not codigo:
+        return None
+    return codigo, (unid or "").strip().upper()
+
+
+# -- atualização incremental ----------------------------------------------
+
+def record_proposal(proposal_id: int) -> int:
+    """Contabiliza os preços da proposta enviada (chamar antes do commit)"""
+    current = {}
+    for sid, codigo, unid, price in db.session.execute(
+        select(ProposalPrice.service_item_id, TRServiceItem.codigo, TRServiceItem.unid,
+               ProposalPrice.unit_price)
+        .join(TRServiceItem, TRServiceItem.id == ProposalPrice.service_item_id)
+        .where(ProposalPrice.proposal_id == proposal_id)
+    ):
+        key = _key(codigo, unid)
+        if key and price is not None:
+            current[sid] = (key, Decimal(price))
+
+    added, removed = defaultdict(list), defaultdict(list)
+    counted = PriceSample.query.filter_by(proposal_id=proposal_id).all()
+    for sample in counted:
+        old = ((sample.codigo, sample.unid), sample.unit_price)
+        new = current.pop(sample.service_item_id, None)
+        if new == old:
+            continue
+        removed[old[0]].append(old[1])
+        if new is None:
+            db.session.delete(sample)
+            continue
+        added[new[0]].append(new[1])
+        (sample.codigo, sample.unid), sample.unit_price = new
+    for sid, (key, price) in current.items():
+        added[key].append(price)
+        db.session.add(PriceSample(proposal_id=proposal_id, service_item_id=sid,
+                                   codigo=key[0], unid=key[1], unit_price=price))
+
+    keys = sorted(set(added) | set(removed))
+    if keys:
+        _apply(keys, added, removed)
+    return sum(len(v) for v in added.values())
+
+
+def _apply(keys, added, removed):
+    empty = QuantileSketch().to_json()
+    db.session.execute(insert_ignore(PriceStat), [
+        {"codigo": c, "unid": u, "count": 0, "total": 0, "sketch": empty} for c, u in keys
+    ])
+    stats = db.session.execute(
+        select(PriceStat)
+        .where(tuple_(PriceStat.codigo, PriceStat.unid).in_(keys))
+        .order_by(PriceStat.codigo, PriceStat.unid)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalars().all()
+
+    for stat in stats:
+        key = (stat.codigo, stat.unid)
+        plus, minus = added.get(key, []), removed.get(key, [])
+        sketch = QuantileSketch.from_json(stat.sketch)
+        for price in plus:
+            sketch.add(float(price))
+        for price in minus:
+            sketch.remove(float(price))
+        stat.count += len(plus) - len(minus)
+        if stat.count <= 0:
+            db.session.delete(stat)
+            continue
+        stat.total = Decimal(stat.total) + sum(plus, Decimal(0)) - sum(minus, Decimal(0))
+        stat.sketch = sketch.to_json()
+        if any(p in (stat.min_price, stat.max_price) for p in minus):
+            # Saiu um extremo: relê do histórico (índice codigo, unid, unit_price)
+            stat.min_price, stat.max_price = db.session.execute(
+                select(func.min(PriceSample.unit_price), func.max(PriceSample.unit_price))
+                .where(PriceSample.codigo == stat.codigo, PriceSample.unid == stat.unid)
+            ).one()
+        elif plus:
+            stat.min_price = min(plus + ([stat.min_price] if stat.min_price is not None else []))
+            stat.max_price = max(plus + ([stat.max_price] if stat.max_price is not None else []))
+
+
+# -- carga a partir do histórico -------------------------------------------
+
+def samples_sql() -> str:
+    """INSERT ... SELECT dos preços de propostas enviadas com ``proposals.id`` em [:lo, :hi)"""
+    return """
+        INSERT INTO price_samples (proposal_id, service_item_id, codigo, unid, unit_price, recorded_at)
+        SELECT pp.proposal_id, pp.service_item_id, TRIM(i.codigo), UPPER(TRIM(i.unid)), pp.unit_price,
+               p.commercial_submitted_at
+        FROM proposals p
+        JOIN proposal_prices pp ON pp.proposal_id = p.id
+        JOIN tr_service_items i ON i.id = pp.service_item_id
+        WHERE p.id >= :lo AND p.id < :hi
+          AND p.commercial_submitted_at IS NOT NULL
+          AND TRIM(COALESCE(i.codigo, '')) <> ''
+          AND NOT EXISTS (
+              SELECT 1 FROM price_samples s
+              WHERE s.proposal_id = pp.proposal_id AND s.service_item_id = pp.service_item_id
+          )
+    """
+
+
+def sample_missing(chunk_size=5000) -> int:
+    """Preços de propostas enviadas das tabelas quentes que ainda não estão no histórico"""
+    low, high = db.session.execute(select(func.min(Proposal.id), func.max(Proposal.id))).first()
+    if low is None:
+        return 0
+    sql = text(samples_sql())
+    rows = 0
+    for lo in range(low, high + 1, chunk_size):
+        rows += db.session.execute(sql, {"lo": lo, "hi": lo + chunk_size}).rowcount or 0
+        db.session.commit()
+    return rows
+
+
+def sample_archives(batch_size=200) -> int:
+    """Preços das propostas enviadas de processos arquivados, a partir dos snapshots"""
+    rows, last = 0, 0
+    while True:
+        archives = db.session.execute(
+            select(ProcurementArchive)
+            .where(ProcurementArchive.procurement_id > last)
+            .order_by(ProcurementArchive.procurement_id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not archives:
+            return rows
+        for archive in archives:
+            graph = json.loads(gzip.decompress(archive.snapshot))
+            submitted = {p["id"]: p["commercial_submitted_at"] for p in graph["proposals"]
+                         if p["commercial_submitted_at"]}
+            proposal_ids = list(submitted)
+            counted = set(db.session.execute(
+                select(PriceSample.proposal_id, PriceSample.service_item_id)
+                .where(PriceSample.proposal_id.in_(proposal_ids))
+            ).all()) if proposal_ids else set()
+            items = {i["id"]: i for i in graph["tr_service_items"]}
+            samples = []
+            for price in graph["proposal_prices"]:
+                pair = (price["proposal_id"], price["service_item_id"])
+                item = items.get(price["service_item_id"])
+                key = _key(item["codigo"], item["unid"]) if item else None
+                if price["proposal_id"] not in submitted or pair in counted or not key:
+                    continue
+                samples.append({
+                    "proposal_id": pair[0], "service_item_id": pair[1], "codigo": key[0], "unid": key[1],
+                    "unit_price": Decimal(price["unit_price"]),
+                    "recorded_at": datetime.fromisoformat(submitted[pair[0]]),
+                })
+            if samples:
+                db.session.execute(insert(PriceSample), samples)
+                rows += len(samples)
+        db.session.commit()
+        last = archives[-1].procurement_id
+
+
+def rebuild(batch_size=1000) -> int:
+    """Recalcula ``price_stats`` inteiro a partir de ``price_samples``"""
+    db.session.execute(delete(PriceStat))
+    rows, batch = 0, []
+    key = sketch = None
+    prices = []
+
+    def close():
+        batch.append({
+            "codigo": key[0], "unid": key[1], "count": len(prices), "total": sum(prices, Decimal(0)),
+            "min_price": min(prices), "max_price": max(prices), "sketch": sketch.to_json(),
+        })
+
+    result = db.session.execute(
+        select(PriceSample.codigo, PriceSample.unid, PriceSample.unit_price)
+        .order_by(PriceSample.codigo, PriceSample.unid)
+        .execution_options(yield_per=10000)
+    )
+    for codigo, unid, price in result:
+        if (codigo, unid) != key:
+            if key is not None:
+                close()
+            key, sketch, prices = (codigo, unid), QuantileSketch(), []
+            if len(batch) >= batch_size:
+                db.session.execute(insert(PriceStat), batch)
+                rows += len(batch)
+                batch = []
+        price = Decimal(price)
+        prices.append(price)
+        sketch.add(float(price))
+    if key is not None:
+        close()
+    if batch:
+        db.session.execute(insert(PriceStat), batch)
+        rows += len(batch)
+    db.session.commit()
+    return rows
+
+
+# -- consulta ---------------------------------------------------------------
+
+def summarize(stat: PriceStat, min_samples: int) -> dict:
+    if stat.count < min_samples:
+        return {"count": stat.count, "insufficient": True}
+    sketch = QuantileSketch.from_json(stat.sketch)
+    summary = {
+        "count": stat.count,
+        "mean": round(float(stat.total) / stat.count, 2),
+        "min": float(stat.min_price),
+        "max": float(stat.max_price),
+    }
+    for q in QUANTILES:
+        summary[f"p{int(q * 100)}"] = round(sketch.quantile(q), 2)
+    return summary
+
+
+def lookup(items) -> dict:
+    """Resumo histórico por ``service_item_id`` dos itens informados (uma consulta)"""
+    keys = {item.id: _key(item.codigo, item.unid) for item in items}
+    wanted = sorted(set(keys.values()) - {None})
+    if not wanted:
+        return {}
+    min_samples = current_app.config["PRICE_STATS_MIN_SAMPLES"]
+    stats = {
+        (s.codigo, s.unid): summarize(s, min_samples)
+        for s in PriceStat.query.filter(tuple_(PriceStat.codigo, PriceStat.unid).in_(wanted))
+    }
+    return {item_id: stats[key] for item_id, key in keys.items() if key in stats}
+
+
+def reference_prices(tr) -> dict:
+    """Preço de referência de cada item do TR (uma consulta para todos)"""
+    items = TRServiceItem.query.filter_by(tr_id=tr.id).order_by(TRServiceItem.item_ordem).all()
+    stats = lookup(items)
+
+    out, estimate, covered = [], 0.0, 0
+    for item in items:
+        summary = stats.get(item.id)
+        qtde = float(item.qtde)
+        total = None
+        if summary and "p50" in summary:
+            total = round(qtde * summary["p50"], 2)
+            estimate += total
+            covered += 1
+        out.append({
+            "service_item_id": item.id,
+            "item_ordem": item.item_ordem,
+            "codigo": item.codigo,
+            "descricao": item.descricao,
+            "unid": item.unid,
+            "qtde": qtde,
+            "reference": summary,
+            "estimated_total": total,
+        })
+    return {
+        "tr_id": tr.id,
+        "items": out,
+        "covered_items": covered,
+        "orcamento_estimado_sugerido": round(estimate, 2),
+        "min_samples": current_app.config["PRICE_STATS_MIN_SAMPLES"],
+    }
+
+
+# -- linha de comando -------------------------------------------------------
+
+@click.group("prices")
+def prices_cli():
+    """Índice histórico de preços"""
+
+
+@prices_cli.command("rebuild")
+@click.option("--chunk-size", default=5000, show_default=True, help="Faixa de ids de proposta por lote")
+@with_appcontext
+def rebuild_command(chunk_size):
+    """Completa o histórico de preços e recalcula os agregados"""
+    samples = sample_missing(chunk_size) + sample_archives()
+    click.echo(f"   {samples} preço(s) novo(s) no histórico")
+    click.echo(f"✅ {rebuild()} código(s) de serviço com estatística")
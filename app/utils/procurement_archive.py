@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Arquivamento de processos encerrados
+
+Processos FINALIZADO/CANCELADO sem alteração há ``PROCUREMENT_ARCHIVE_AFTER_DAYS``
+saem das tabelas quentes em lotes (``flask procurements archive``).  Para
+cada lote, numa única transação:
+
+1. o grafo de cada processo é lido com uma consulta IN por tabela;
+2. vira uma linha em ``procurement_archives`` com o snapshot JSON
+   compactado (mais ``archived_proposals`` para as propostas);
+3. as linhas são removidas das tabelas quentes, filhos antes dos pais;
+4. o documento de busca do TR fica, marcado como arquivado, e o relatório
+   de quantidades em cache é descartado.
+
+Listagens, subconsultas de visibilidade e contagens passam a varrer só o
+trabalho ativo.  Os endpoints de detalhe caem em ``load``/``load_by_proposal``
+quando o processo não está nas tabelas quentes e respondem com o mesmo
+formato, mais ``"archived": true``.
+"""
+
+import gzip
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from enum import Enum
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, select
+
+from .. import db
+from ..models import (
+    ArchivedProposal, Invite, Organization, Procurement, ProcurementArchive, ProcurementEvent,
+    ProcurementStatus, Proposal, ProposalPrice, ProposalService, Role, TR, TRServiceItem, User
+)
+from . import quantity_report, search
+from .pagination import decode_cursor, encode_cursor
+
+ARCHIVABLE_STATUSES = (ProcurementStatus.FINALIZADO, ProcurementStatus.CANCELADO)
+
+# Ordem de remoção: filhos antes dos pais
+DELETE_ORDER = (
+    ProcurementEvent, ProposalPrice, ProposalService, Proposal,
+    Invite, TRServiceItem, TR, Procurement,
+)
+
+
+def _jsonable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _dt(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _rows(model, *where):
+    table = model.__table__
+    return [
+        {c: _jsonable(v) for c, v in row._mapping.items()}
+        for row in db.session.execute(select(table).where(*where))
+    ]
+
+
+def _load_graphs(proc_ids) -> dict:
+    """{procurement_id: {tabela: [linhas]}} com uma consulta por tabela"""
+    graphs = {pid: {m.__tablename__: [] for m in DELETE_ORDER} for pid in proc_ids}
+
+    def add(model, rows, owner):
+        for row in rows:
+            graphs[owner(row)][model.__tablename__].append(row)
+
+    add(Procurement, _rows(Procurement, Procurement.id.in_(proc_ids)), lambda r: r["id"])
+    trs = _rows(TR, TR.procurement_id.in_(proc_ids))
+    add(TR, trs, lambda r: r["procurement_id"])
+    tr_owner = {r["id"]: r["procurement_id"] for r in trs}
+    if tr_owner:
+        add(TRServiceItem, _rows(TRServiceItem, TRServiceItem.tr_id.in_(list(tr_owner))),
+            lambda r: tr_owner[r["tr_id"]])
+    add(Invite, _rows(Invite, Invite.procurement_id.in_(proc_ids)), lambda r: r["procurement_id"])
+    proposals = _rows(Proposal, Proposal.procurement_id.in_(proc_ids))
+    add(Proposal, proposals, lambda r: r["procurement_id"])
+    proposal_owner = {r["id"]: r["procurement_id"] for r in proposals}
+    if proposal_owner:
+        ids = list(proposal_owner)
+        add(ProposalService, _rows(ProposalService, ProposalService.proposal_id.in_(ids)),
+            lambda r: proposal_owner[r["proposal_id"]])
+        add(ProposalPrice, _rows(ProposalPrice, ProposalPrice.proposal_id.in_(ids)),
+            lambda r: proposal_owner[r["proposal_id"]])
+    add(ProcurementEvent, _rows(ProcurementEvent, ProcurementEvent.procurement_id.in_(proc_ids)),
+        lambda r: r["procurement_id"])
+    return graphs
+
+
+def _delete_graphs(graphs):
+    proc_ids = list(graphs)
+    tr_ids = [r["id"] for g in graphs.values() for r in g[TR.__tablename__]]
+    proposal_ids = [r["id"] for g in graphs.values() for r in g[Proposal.__tablename__]]
+    keys = {
+        ProcurementEvent: ProcurementEvent.procurement_id.in_(proc_ids),
+        ProposalPrice: ProposalPrice.proposal_id.in_(proposal_ids),
+        ProposalService: ProposalService.proposal_id.in_(proposal_ids),
+        Proposal: Proposal.id.in_(proposal_ids),
+        Invite: Invite.procurement_id.in_(proc_ids),
+        TRServiceItem: TRServiceItem.tr_id.in_(tr_ids),
+        TR: TR.id.in_(tr_ids),
+        Procurement: Procurement.id.in_(proc_ids),
+    }
+    for model in DELETE_ORDER:
+        db.session.execute(delete(model).where(keys[model]).execution_options(synchronize_session=False))
+
+
+def archive_batch(batch_size=100, older_than_days=30) -> int:
+    """Arquiva até ``batch_size`` processos encerrados; devolve quantos"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    proc_ids = list(db.session.execute(
+        select(Procurement.id)
+        .where(Procurement.status.in_(ARCHIVABLE_STATUSES), Procurement.updated_at < cutoff)
+        .order_by(Procurement.id)
+        .limit(batch_size)
+    ).scalars())
+    if not proc_ids:
+        return 0
+
+    try:
+        graphs = _load_graphs(proc_ids)
+        now = datetime.utcnow()
+        archives, proposals = [], []
+        for pid, graph in graphs.items():
+            proc = graph[Procurement.__tablename__][0]
+            archives.append({
+                "procurement_id": pid,
+                "title": proc["title"],
+                "status": proc["status"],
+                "org_id": proc["org_id"],
+                "requisitante_id": proc["requisitante_id"],
+                "created_by": proc["created_by"],
+                "created_at": _dt(proc["created_at"]),
+                "closed_at": _dt(proc["updated_at"]),
+                "archived_at": now,
+                "snapshot": gzip.compress(json.dumps(graph, ensure_ascii=False).encode("utf-8")),
+            })
+            proposals.extend({
+                "proposal_id": p["id"],
+                "procurement_id": pid,
+                "supplier_user_id": p["supplier_user_id"],
+            } for p in graph[Proposal.__tablename__])
+        db.session.execute(insert(ProcurementArchive), archives)
+        if proposals:
+            db.session.execute(insert(ArchivedProposal), proposals)
+        _delete_graphs(graphs)
+        search.mark_archived(proc_ids)
+        quantity_report.discard(proc_ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(proc_ids)
+
+
+def archive(batch_size=100, older_than_days=30, max_batches=None, log=print) -> int:
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        done = archive_batch(batch_size, older_than_days)
+        if not done:
+            break
+        total += done
+        batches += 1
+        log(f"   . lote {batches}: {done} processo(s) arquivado(s)")
+    return total
+
+
+# -- leitura ---------------------------------------------------------------
+
+class ArchivedProcurement:
+    """Snapshot descompactado, com as mesmas respostas dos endpoints quentes"""
+
+    def __init__(self, row: ProcurementArchive):
+        self.row = row
+        self.graph = json.loads(gzip.decompress(row.snapshot))
+        self.procurement = self.graph[Procurement.__tablename__][0]
+        trs = self.graph[TR.__tablename__]
+        self.tr = trs[0] if trs else None
+
+    @property
+    def id(self) -> int:
+        return self.row.procurement_id
+
+    def _users(self, ids) -> dict:
+        ids = {i for i in ids if i}
+        if not ids:
+            return {}
+        return {u.id: u for u in User.query.filter(User.id.in_(ids))}
+
+    def supplier_invited(self, user) -> bool:
+        return any(
+            inv["email"] == user.email or inv["supplier_user_id"] == user.id
+            for inv in self.graph[Invite.__tablename__]
+        )
+
+    def _archived(self, payload):
+        payload["archived"] = True
+        payload["archived_at"] = self.row.archived_at.isoformat()
+        return payload
+
+    def detail(self, user) -> dict:
+        proc = self.procurement
+        org = Organization.query.get(proc["org_id"]) if proc["org_id"] else None
+        response = {
+            "id": proc["id"],
+            "title": proc["title"],
+            "description": proc["description"],
+            "status": proc["status"],
+            "created_at": proc["created_at"],
+            "updated_at": proc["updated_at"],
+            "deadline": proc["deadline_proposals"],
+            "organization": {"id": proc["org_id"], "name": org.name if org else None},
+        }
+        if self.tr:
+            response["tr"] = {
+                "id": self.tr["id"],
+                "status": self.tr["status"],
+                "submitted_at": self.tr["submitted_at"],
+                "approved_at": self.tr["approved_at"],
+            }
+        if user.role == Role.COMPRADOR:
+            response["proposals_count"] = len(self.graph[Proposal.__tablename__])
+            response["invites_count"] = len(self.graph[Invite.__tablename__])
+        return self._archived(response)
+
+    def tr_detail(self) -> dict:
+        tr = self.tr
+        items = sorted(self.graph[TRServiceItem.__tablename__], key=lambda i: i["item_ordem"])
+        fields = (
+            "objetivo", "situacao_atual", "descricao_servicos", "local_horario_trabalhos",
+            "prazo_execucao", "local_canteiro", "atividades_preliminares", "garantia",
+            "matriz_responsabilidades", "descricoes_gerais", "normas_observar",
+            "regras_responsabilidades", "relacoes_contratada_fiscalizacao", "sst",
+            "credenciamento_observacoes", "anexos_info", "submitted_at", "approved_at",
+            "approval_comments", "credenciamento", "observacoes", "prazo_maximo_execucao",
+        )
+        data = {"id": tr["id"], "tr_id": tr["id"], "procurement_id": tr["procurement_id"],
+                "status": tr["status"]}
+        data.update({f: tr.get(f) for f in fields})
+        data["orcamento_estimado"] = _float(tr.get("orcamento_estimado"))
+        data["service_items"] = [{
+            "id": i["id"],
+            "item_ordem": i["item_ordem"],
+            "codigo": i["codigo"],
+            "descricao": i["descricao"],
+            "unid": i["unid"],
+            "qtde": float(i["qtde"]),
+        } for i in items]
+        return self._archived(data)
+
+    def _prices(self):
+        return {(p["proposal_id"], p["service_item_id"]): Decimal(p["unit_price"])
+                for p in self.graph[ProposalPrice.__tablename__]}
+
+    def proposals(self, user) -> list:
+        proposals = self.graph[Proposal.__tablename__]
+        users = self._users(p["supplier_user_id"] for p in proposals)
+        prices = self._prices()
+        result = []
+        for prop in proposals:
+            supplier = users.get(prop["supplier_user_id"])
+            data = {
+                "id": prop["id"],
+                "supplier": {
+                    "name": supplier.full_name if supplier else None,
+                    "organization": supplier.organization.name if supplier and supplier.organization else None,
+                },
+                "status": prop["status"],
+                "technical_score": prop["technical_score"],
+                "technical_review": prop["technical_review"],
+                "submitted_at": prop["technical_submitted_at"],
+                "archived": True,
+            }
+            if user.role == Role.COMPRADOR:
+                total = sum(
+                    float(s["qty"]) * float(prices[(prop["id"], s["service_item_id"])])
+                    for s in self.graph[ProposalService.__tablename__]
+                    if s["proposal_id"] == prop["id"] and (prop["id"], s["service_item_id"]) in prices
+                )
+                data["total_value"] = round(total, 2)
+                data["payment_conditions"] = prop["payment_conditions"]
+                data["delivery_time"] = prop["delivery_time"]
+            result.append(data)
+        return result
+
+    def proposal(self, proposal_id: int) -> dict:
+        prop = next(p for p in self.graph[Proposal.__tablename__] if p["id"] == proposal_id)
+        tr_items = {i["id"]: i for i in self.graph[TRServiceItem.__tablename__]}
+        prices = self._prices()
+        supplier = self._users([prop["supplier_user_id"]]).get(prop["supplier_user_id"])
+        items = []
+        for service in self.graph[ProposalService.__tablename__]:
+            if service["proposal_id"] != proposal_id:
+                continue
+            tr_item = tr_items[service["service_item_id"]]
+            price = prices.get((proposal_id, service["service_item_id"]))
+            qty = Decimal(service["qty"])
+            items.append({
+                "service_item_id": service["service_item_id"],
+                "item_ordem": tr_item["item_ordem"],
+                "codigo": tr_item["codigo"],
+                "descricao": tr_item["descricao"],
+                "unid": tr_item["unid"],
+                "qty_proposed": float(qty),
+                "qty_baseline": float(tr_item["qtde"]),
+                "unit_price": float(price) if price is not None else 0,
+                "total": float(qty * price) if price is not None else 0,
+                "technical_notes": service["technical_notes"],
+            })
+        return self._archived({
+            "id": prop["id"],
+            "procurement_id": prop["procurement_id"],
+            "supplier": {
+                "id": prop["supplier_user_id"],
+                "name": supplier.full_name if supplier else None,
+                "organization": supplier.organization.name if supplier and supplier.organization else None,
+            },
+            "status": prop["status"],
+            "technical_description": prop["technical_description"],
+            "technical_review": prop["technical_review"],
+            "technical_score": prop["technical_score"],
+            "payment_conditions": prop["payment_conditions"],
+            "delivery_time": prop["delivery_time"],
+            "warranty_terms": prop["warranty_terms"],
+            "items": items,
+            "total_value": sum(item["total"] for item in items),
+            "submitted_at": prop["technical_submitted_at"],
+        })
+
+    def timeline(self, limit=100, cursor=None) -> dict:
+        events = sorted(self.graph[ProcurementEvent.__tablename__],
+                        key=lambda e: (e["created_at"], e["id"]))
+        if cursor:
+            created_at, event_id = decode_cursor(cursor)
+            events = [e for e in events if (_dt(e["created_at"]), e["id"]) > (created_at, event_id)]
+        page, has_more = events[:limit], len(events) > limit
+        users = self._users(e["actor_id"] for e in page)
+        items = [{
+            "id": e["id"],
+            "event": e["event"],
+            "actor_id": e["actor_id"],
+            "actor_name": users[e["actor_id"]].full_name if e["actor_id"] in users else None,
+            "entity_type": e["entity_type"],
+            "entity_id": e["entity_id"],
+            "details": e["details"],
+            "created_at": e["created_at"],
+        } for e in page]
+        last = page[-1] if page else None
+        return self._archived({
+            "items": items,
+            "next_cursor": encode_cursor(_dt(last["created_at"]), last["id"]) if has_more else None,
+        })
+
+
+def load(procurement_id: int):
+    row = ProcurementArchive.query.get(procurement_id)
+    return ArchivedProcurement(row) if row else None
+
+
+def load_by_proposal(proposal_id: int):
+    link = ArchivedProposal.query.get(proposal_id)
+    return load(link.procurement_id) if link else None
+
+
+def list_archived(user) -> list:
+    """Resumo dos arquivados visíveis ao usuário (sem descompactar snapshots)"""
+    query = ProcurementArchive.query
+    if user.role == Role.REQUISITANTE:
+        query = query.filter(ProcurementArchive.requisitante_id == user.id)
+    elif user.role != Role.COMPRADOR:
+        return []
+    return [{
+        "id": a.procurement_id,
+        "title": a.title,
+        "status": a.status,
+        "created_at": a.created_at.isoformat() if a.created_at else None,
+        "closed_at": a.closed_at.isoformat() if a.closed_at else None,
+        "archived_at": a.archived_at.isoformat(),
+        "archived": True,
+    } for a in query.order_by(ProcurementArchive.procurement_id.desc())]
+
+
+# -- linha de comando --------------------------------------------------------
+
+@click.group("procurements")
+def procurements_cli():
+    """Manutenção dos processos"""
+
+
+@procurements_cli.command("archive")
+@click.option("--batch-size", default=100, show_default=True)
+@click.option("--older-than-days", type=int, help="Padrão: PROCUREMENT_ARCHIVE_AFTER_DAYS")
+@click.option("--max-batches", type=int)
+@with_appcontext
+def archive_command(batch_size, older_than_days, max_batches):
+    """Move processos FINALIZADO/CANCELADO para procurement_archives"""
+    from flask import current_app
+    days = current_app.config["PROCUREMENT_ARCHIVE_AFTER_DAYS"] if older_than_days is None else older_than_days
+    total = archive(batch_size, days, max_batches, log=click.echo)
+    click.echo(f"{total} processo(s) arquivado(s)")
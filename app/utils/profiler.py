@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Profiler sob demanda para requisições em produção
+
+Uma requisição é perfilada (cProfile) quando:
+
+* traz o cabeçalho ``X-Profile`` assinado com ``PROFILE_SECRET``
+  (ver ``sign_profile_request``), ou
+* é sorteada pela taxa ``PROFILE_SAMPLE_RATE`` (0.0 desliga).
+
+Gerando a assinatura para um endpoint lento::
+
+    python -c "from app.utils.profiler import sign_profile_request as s; \\
+               print(s('<PROFILE_SECRET>', '/api/procurements/42/comparison'))"
+    curl -H "X-Profile: <saída>" -H "Authorization: Bearer ..." ...
+
+Cada perfil vira ``<id>.prof`` (formato pstats) mais ``<id>.json`` com rota,
+papel do usuário, número de consultas e duração, num anel de no máximo
+``PROFILE_MAX_FILES`` perfis em ``PROFILE_DIR``.  Só uma requisição é
+perfilada por vez no processo; as concorrentes seguem sem profiler.
+"""
+
+import hashlib
+import hmac
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request
+
+HEADER = "X-Profile"
+SIGNATURE_TTL = 300  # segundos
+
+NAME_RE = re.compile(r"^[0-9T]+-[A-Za-z0-9_.]+$")
+
+# O cProfile não suporta dois perfis ativos ao mesmo tempo (Python 3.12+)
+_busy = threading.Lock()
+
+
+def _signature(secret: str, expires: int, path: str) -> str:
+    message = f"{expires}:{path}".encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def sign_profile_request(secret: str, path: str, ttl: int = SIGNATURE_TTL) -> str:
+    """Valor do cabeçalho ``X-Profile`` válido por ``ttl`` segundos para ``path``"""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_signature(secret, expires, path)}"
+
+
+def _signed(secret: str) -> bool:
+    value = request.headers.get(HEADER)
+    if not value or not secret:
+        return False
+    expires, _, signature = value.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(secret, int(expires), request.path))
+
+
+def list_profiles(directory: str):
+    """Metadados dos perfis guardados, do mais recente ao mais antigo"""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as fh:
+                profiles.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(directory: str, name: str):
+    """Caminho do ``.prof`` ou None se o nome for inválido/inexistente"""
+    if not NAME_RE.match(name):
+        return None
+    path = os.path.join(directory, f"{name}.prof")
+    return path if os.path.isfile(path) else None
+
+
+def render_text(path: str, limit: int = 40, sort: str = "cumulative") -> str:
+    import pstats
+
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def _trim(directory: str, keep: int):
+    names = sorted(n[:-5] for n in os.listdir(directory) if n.endswith(".prof"))
+    for name in names[:max(len(names) - keep, 0)]:
+        for ext in (".prof", ".json"):
+            try:
+                os.remove(os.path.join(directory, name + ext))
+            except OSError:
+                pass
+
+
+def _save(app, profile, response, trigger, elapsed):
+    directory = app.config["PROFILE_DIR"]
+    os.makedirs(directory, exist_ok=True)
+
+    endpoint = request.endpoint or "unmatched"
+    name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{endpoint}"
+    from .auth import loaded_user
+    user = loaded_user()
+    meta = {
+        "name": name,
+        "created_at": datetime.utcnow().isoformat(),
+        "method": request.method,
+        "path": request.path,
+        "route": request.url_rule.rule if request.url_rule else None,
+        "endpoint": endpoint,
+        "status": response.status_code,
+        "role": user.role.value if user else None,
+        "user_id": user.id if user else None,
+        "queries": g.get("query_count"),
+        "duration_ms": round(elapsed * 1000, 2),
+        "trigger": trigger,
+    }
+    profile.dump_stats(os.path.join(directory, f"{name}.prof"))
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    _trim(directory, app.config["PROFILE_MAX_FILES"])
+    response.headers["X-Profile-Id"] = name
+
+
+def init_profiler(app):
+    """Registrar antes de ``init_query_stats``: o after_request daqui roda
+    depois do dele e já encontra ``g.query_count``"""
+    secret = app.config["PROFILE_SECRET"]
+    rate = app.config["PROFILE_SAMPLE_RATE"]
+    if not secret and rate <= 0:
+        return
+
+    @app.before_request
+    def _start_profile():
+        if _signed(secret):
+            trigger = "header"
+        elif rate > 0 and random.random() < rate:
+            trigger = "sample"
+        else:
+            return
+        if not _busy.acquire(blocking=False):
+            return
+        import cProfile  # só quando há perfil a coletar
+
+        profile = cProfile.Profile()
+        g._profile = (profile, trigger, time.perf_counter())
+        profile.enable()
+
+    @app.after_request
+    def _finish_profile(response):
+        state = g.pop("_profile", None)
+        if state is None:
+            return response
+        profile, trigger, started = state
+        profile.disable()
+        try:
+            _save(app, profile, response, trigger, time.perf_counter() - started)
+        except OSError:
+            app.logger.exception("falha ao gravar perfil")
+        finally:
+            _busy.release()
+        return response
+
+    @app.teardown_request
+    def _release_profile(exc):
+        # Requisição abortada antes do after_request
+        state = g.pop("_profile", None)
+        if state is not None:
+            state[0].disable()
+            _busy.release()
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Relatório de desvio de quantidades de um processo
+
+Numa passada sobre a matriz fornecedor × item (NumPy) compara a quantidade
+proposta (``ProposalService.qty``) com a do TR (``TRServiceItem.qtde``) em
+todas as propostas enviadas:
+
+* por item: quantas propostas ficaram abaixo, igual e acima do TR, a faixa
+  (mínimo, mediana, máximo) e a dispersão relativa à quantidade do TR;
+* por fornecedor: itens sub e sobrecotados, desvio médio de quantidade e,
+  para o comprador, o total como proposto e o total rebaseado — os preços
+  do fornecedor nas quantidades do TR, a comparação justa entre propostas.
+
+O resultado fica em ``quantity_reports`` até a próxima mudança de
+quantidade, preço, envio de proposta ou planilha do TR: quem altera chama
+``invalidate`` na mesma transação, o que sobe ``version``.  O cálculo lê a
+versão antes dos dados e só grava se ela não mudou — uma alteração
+concorrente nunca fica escondida atrás de um relatório antigo, em nenhum
+worker.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Float, and_, cast, delete, select, update
+
+from .. import db
+from ..models import (
+    Organization, Proposal, ProposalPrice, ProposalService, ProposalStatus,
+    QuantityReport, TRServiceItem, User
+)
+from . import matrix
+from .metrics import metrics
+from .notifications import insert_ignore
+
+# Quantidades são Numeric(18, 3): diferenças menores que isso são arredondamento
+QTY_TOLERANCE = 0.0005
+
+# Campos derivados de preço: só o comprador vê (ver list_procurement_proposals)
+PRICE_FIELDS = ("total_proposed", "total_rebased", "rebased_rank", "value_weighted_deviation_pct")
+
+metrics.describe("quantity_report_cache_total", "counter",
+                 "Relatórios de desvio de quantidade servidos do cache (hit) ou recalculados (miss)")
+
+
+def invalidate(procurement_id: int):
+    """Descarta o relatório em cache do processo (chamar antes do commit da mudança)"""
+    db.session.execute(
+        update(QuantityReport)
+        .where(QuantityReport.procurement_id == procurement_id)
+        .values(version=QuantityReport.version + 1, report=None, computed_at=None)
+    )
+
+
+def discard(procurement_ids):
+    """Remove os relatórios de processos arquivados"""
+    db.session.execute(delete(QuantityReport).where(QuantityReport.procurement_id.in_(procurement_ids)))
+
+
+def get(proc) -> dict:
+    """Relatório do processo, do cache ou recalculado"""
+    row = db.session.get(QuantityReport, proc.id)
+    if row is not None and row.report is not None:
+        metrics.inc("quantity_report_cache_total", (("result", "hit"),))
+        return dict(row.report, cached=True)
+
+    if row is None:
+        db.session.execute(insert_ignore(QuantityReport), [{"procurement_id": proc.id, "version": 0}])
+        db.session.commit()
+    version = db.session.execute(
+        select(QuantityReport.version).where(QuantityReport.procurement_id == proc.id)
+    ).scalar_one()
+    report = build(proc)
+    db.session.execute(
+        update(QuantityReport)
+        .where(QuantityReport.procurement_id == proc.id, QuantityReport.version == version)
+        .values(report=report, computed_at=datetime.utcnow())
+    )
+    db.session.commit()
+    metrics.inc("quantity_report_cache_total", (("result", "miss"),))
+    return dict(report, cached=False)
+
+
+def for_role(report: dict, include_prices: bool) -> dict:
+    if include_prices:
+        return report
+    suppliers = [{k: v for k, v in s.items() if k not in PRICE_FIELDS} for s in report["suppliers"]]
+    return dict(report, suppliers=suppliers)
+
+
+def _num(value, digits=3):
+    """float JSON-serializável (NaN vira None)"""
+    value = float(value)
+    return None if value != value else round(value, digits)
+
+
+def build(proc) -> dict:
+    """Calcula o relatório (sem cache)"""
+    np = matrix.np()
+    items = TRServiceItem.query.filter_by(tr_id=proc.tr.id).order_by(TRServiceItem.item_ordem).all() \
+        if proc.tr else []
+    submitted = and_(Proposal.procurement_id == proc.id, Proposal.status != ProposalStatus.RASCUNHO)
+    proposals = db.session.execute(
+        select(Proposal.id, Proposal.supplier_user_id, User.full_name, Organization.name)
+        .join(User, User.id == Proposal.supplier_user_id)
+        .outerjoin(Organization, Organization.id == User.org_id)
+        .where(submitted)
+        .order_by(Proposal.id)
+    ).all()
+    cells = db.session.execute(
+        select(ProposalService.proposal_id, ProposalService.service_item_id,
+               cast(ProposalService.qty, Float), cast(ProposalPrice.unit_price, Float))
+        .join(Proposal, Proposal.id == ProposalService.proposal_id)
+        .outerjoin(ProposalPrice, and_(
+            ProposalPrice.proposal_id == ProposalService.proposal_id,
+            ProposalPrice.service_item_id == ProposalService.service_item_id
+        ))
+        .where(submitted)
+    ).all()
+
+    proposal_ids = [p.id for p in proposals]
+    shape = (len(proposals), len(items))
+    pids, item_ids, qtys, prices = matrix.columns(cells, 4)
+    Q, P = matrix.fill(
+        shape, matrix.positions(proposal_ids, pids),
+        matrix.positions([i.id for i in items], item_ids), qtys, prices
+    )
+    base = np.array([float(i.qtde) for i in items], dtype=float)
+
+    quoted = ~np.isnan(Q)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        equal = quoted & (np.abs(Q - base) <= QTY_TOLERANCE)
+        under = quoted & ~equal & (Q < base)
+        over = quoted & ~equal & (Q > base)
+        ratio = np.where(quoted & (base > 0), Q / base - 1, np.nan)
+
+        # Por item
+        n = quoted.sum(axis=0)
+        ordered = np.sort(Q, axis=0)
+        lowest = matrix.column_quantile(ordered, n, 0.0)
+        median = matrix.column_quantile(ordered, n, 0.5)
+        highest = matrix.column_quantile(ordered, n, 1.0)
+        spread = np.where(base > 0, (highest - lowest) / base, np.nan)
+
+        # Por fornecedor: quantidades proposta × TR com os preços do próprio fornecedor
+        priced = quoted & ~np.isnan(P)
+        proposed_value = np.where(priced, Q * P, 0).sum(axis=1)
+        rebased_value = np.where(priced, base * P, 0).sum(axis=1)
+        weighted = np.where(rebased_value > 0, proposed_value / rebased_value - 1, np.nan)
+        counted = ~np.isnan(ratio)
+        mean_deviation = np.where(counted, ratio, 0).sum(axis=1) / np.maximum(counted.sum(axis=1), 1)
+        complete = priced.sum(axis=1) == len(items)
+
+    # Ranking rebaseado só entre propostas que cotaram todos os itens
+    rank = {}
+    for position, r in enumerate(sorted(np.nonzero(complete)[0], key=lambda r: rebased_value[r]), start=1):
+        rank[int(r)] = position
+
+    report_items = []
+    for c, item in enumerate(items):
+        report_items.append({
+            "service_item_id": item.id,
+            "item_ordem": item.item_ordem,
+            "codigo": item.codigo,
+            "descricao": item.descricao,
+            "unid": item.unid,
+            "qty_baseline": float(item.qtde),
+            "quoted": int(n[c]),
+            "missing": int(shape[0] - n[c]),
+            "under": int(under[:, c].sum()),
+            "equal": int(equal[:, c].sum()),
+            "over": int(over[:, c].sum()),
+            "qty_min": _num(lowest[c]),
+            "qty_median": _num(median[c]),
+            "qty_max": _num(highest[c]),
+            "spread_pct": _num(spread[c] * 100, 1),
+        })
+
+    report_suppliers = []
+    for r, proposal in enumerate(proposals):
+        report_suppliers.append({
+            "proposal_id": proposal.id,
+            "supplier_user_id": proposal.supplier_user_id,
+            "supplier": proposal.full_name,
+            "organization": proposal.name,
+            "items_quoted": int(quoted[r].sum()),
+            "items_missing": int(shape[1] - quoted[r].sum()),
+            "under": int(under[r].sum()),
+            "equal": int(equal[r].sum()),
+            "over": int(over[r].sum()),
+            "mean_qty_deviation_pct": _num(mean_deviation[r] * 100, 1),
+            "value_weighted_deviation_pct": _num(weighted[r] * 100, 1),
+            "items_priced": int(priced[r].sum()),
+            "total_proposed": round(float(proposed_value[r]), 2),
+            "total_rebased": round(float(rebased_value[r]), 2),
+            "rebased_rank": rank.get(r),
+        })
+
+    return {
+        "procurement_id": proc.id,
+        "proposals": shape[0],
+        "items": report_items,
+        "suppliers": report_suppliers,
+        "totals": {
+            "cells_quoted": int(quoted.sum()),
+            "cells_missing": int(shape[0] * shape[1] - quoted.sum()),
+            "under": int(under.sum()),
+            "equal": int(equal.sum()),
+            "over": int(over.sum()),
+            "items_with_divergence": int((under | over).any(axis=0).sum()),
+        },
+        "computed_at": datetime.utcnow().isoformat(),
+    }
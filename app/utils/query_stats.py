@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Contagem de consultas SQL por requisição e detector de N+1
+
+Os eventos ``before_cursor_execute``/``after_cursor_execute`` do SQLAlchemy
+contam os statements e o tempo total de banco de cada requisição.  Um mesmo
+formato de statement repetido ``QUERY_N_PLUS_ONE_THRESHOLD`` vezes ou mais é
+marcado como provável N+1.
+
+* Em debug (ou com ``QUERY_STATS_HEADERS``) os números vão nos cabeçalhos
+  ``X-DB-Query-Count``, ``X-DB-Query-Time-Ms`` e ``X-DB-N-Plus-One``.
+* Em produção cada requisição gera um log estruturado (JSON) no logger
+  ``app.sql``; N+1 é registrado como WARNING.
+* Para testes, ``assert_max_queries(n)`` fixa o orçamento de consultas:
+
+      with assert_max_queries(5):
+          client.get("/api/procurements", headers=headers)
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.sql")
+
+_listeners_installed = False
+_active_counters = defaultdict(list)  # thread id -> [QueryCounter, ...]
+
+
+def _shape(statement: str) -> str:
+    """Formato do statement: SQL já parametrizado, sem espaços redundantes"""
+    return " ".join(statement.split())
+
+
+class QueryCounter:
+    """Acumula quantidade, tempo e formatos dos statements executados"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[_shape(statement)] += 1
+
+    @property
+    def milliseconds(self) -> float:
+        return round(self.seconds * 1000, 2)
+
+    def repeated(self, threshold: int):
+        """Formatos repetidos ao menos ``threshold`` vezes (prováveis N+1)"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+
+    for counter in _active_counters.get(threading.get_ident(), ()):
+        counter.add(statement, elapsed)
+
+    if has_app_context():
+        stats = g.get("_query_stats")
+        if stats is not None:
+            stats.add(statement, elapsed)
+
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _listeners_installed = True
+
+
+def current_stats():
+    """Estatísticas da requisição corrente, ou None fora de requisição"""
+    return g.get("_query_stats") if has_app_context() else None
+
+
+def init_query_stats(app):
+    _install_listeners()
+    threshold = app.config["QUERY_N_PLUS_ONE_THRESHOLD"]
+
+    @app.before_request
+    def _start_query_stats():
+        g._query_stats = QueryCounter()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.pop("_query_stats", None)
+        if stats is None:
+            return response
+
+        repeated = stats.repeated(threshold)
+        if app.debug or app.config["QUERY_STATS_HEADERS"]:
+            response.headers["X-DB-Query-Count"] = str(stats.count)
+            response.headers["X-DB-Query-Time-Ms"] = str(stats.milliseconds)
+            response.headers["X-DB-N-Plus-One"] = str(len(repeated))
+
+        # Mantido em g para quem roda depois (profiler, métricas)
+        g.query_count = stats.count
+
+        level = logging.WARNING if repeated else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "queries": stats.count,
+                "db_ms": stats.milliseconds,
+                "n_plus_one": [
+                    {"statement": shape[:300], "count": n} for shape, n in repeated
+                ],
+            }, ensure_ascii=False))
+        return response
+
+
+@contextmanager
+def count_queries():
+    """Conta os statements executados pela thread corrente dentro do bloco"""
+    _install_listeners()
+    counter = QueryCounter()
+    counters = _active_counters[threading.get_ident()]
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+        if not counters:
+            _active_counters.pop(threading.get_ident(), None)
+
+
+@contextmanager
+def assert_max_queries(n: int):
+    """Falha (AssertionError) se o bloco executar mais de ``n`` statements"""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > n:
+        top = "\n".join(f"  {c}x {shape[:200]}" for shape, c in counter.shapes.most_common(5))
+        raise AssertionError(
+            f"{counter.count} consultas executadas, orçamento de {n}:\n{top}"
+        )
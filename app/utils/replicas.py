@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Roteamento de leituras para réplicas
+
+Com ``DATABASE_REPLICA_URLS`` definido, cada réplica vira um bind
+``replica_<n>`` do Flask-SQLAlchemy e a ``RoutingSession`` decide o engine
+de cada statement:
+
+* requisições GET/HEAD leem de uma réplica sorteada no início da requisição;
+* escritas (flush, INSERT/UPDATE/DELETE) sempre vão ao primário, e depois
+  da primeira escrita o restante da sessão também;
+* read-your-writes: após uma requisição de escrita bem-sucedida, o mesmo
+  usuário lê do primário por ``REPLICA_STICKY_SECONDS`` (cookie
+  ``db_primary_until`` entre workers, mais um mapa por usuário no processo
+  para clientes que não guardam cookies);
+* fora de requisições (CLI, Socket.IO, jobs) tudo vai ao primário.
+
+Réplicas SQLite também funcionam (dois arquivos locais), o que permite
+exercitar o roteamento sem Postgres.
+"""
+
+import random
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+from .metrics import metrics
+
+REPLICA_PREFIX = "replica_"
+STICKY_COOKIE = "db_primary_until"
+READ_METHODS = ("GET", "HEAD")
+
+_recent_writers = {}  # user_id -> instante até quando lê do primário
+_writers_lock = threading.Lock()
+
+
+class RoutingSession(Session):
+    """Sessão que envia leituras da requisição para a réplica escolhida"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            replica = g.get("db_replica")
+            if replica is not None:
+                if self._flushing or getattr(clause, "is_dml", False):
+                    # Leituras seguintes precisam enxergar o que foi escrito
+                    g.db_replica = None
+                else:
+                    return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_keys(db):
+    return sorted(key for key in db.engines if key and key.startswith(REPLICA_PREFIX))
+
+
+def _request_user_id():
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+    from .auth import user_id_from_identity  # importa os modelos, que dependem de db
+    try:
+        verify_jwt_in_request(optional=True)
+        return user_id_from_identity(get_jwt_identity())
+    except Exception:
+        # Token inválido: o próprio endpoint responde 401 depois
+        return None
+
+
+def _sticky(now):
+    until = request.cookies.get(STICKY_COOKIE, type=float)
+    if until and until > now:
+        return True
+    user_id = _request_user_id()
+    return bool(user_id) and _recent_writers.get(user_id, 0) > now
+
+
+def _mark_writer(user_id, until, now):
+    with _writers_lock:
+        _recent_writers[user_id] = until
+        if len(_recent_writers) > 10000:
+            for uid in [u for u, t in _recent_writers.items() if t <= now]:
+                del _recent_writers[uid]
+
+
+def init_replicas(app, db):
+    with app.app_context():
+        keys = replica_keys(db)
+    if not keys:
+        return
+    sticky_seconds = app.config["REPLICA_STICKY_SECONDS"]
+
+    @app.before_request
+    def _choose_replica():
+        g.db_replica = None
+        if request.method not in READ_METHODS or _sticky(time.time()):
+            metrics.inc("db_route_total", (("target", "primary"),))
+            return
+        g.db_replica = random.choice(keys)
+        metrics.inc("db_route_total", (("target", "replica"),))
+
+    @app.after_request
+    def _remember_write(response):
+        if request.method in READ_METHODS or response.status_code >= 400:
+            return response
+        now = time.time()
+        until = now + sticky_seconds
+        from .auth import loaded_user
+        user = loaded_user()
+        if user is not None:
+            _mark_writer(user.id, until, now)
+        response.set_cookie(STICKY_COOKIE, f"{until:.3f}", max_age=sticky_seconds,
+                            httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""
+Busca textual em TRs e processos
+
+Cada TR tem uma linha em ``tr_search_documents`` com o texto pesquisável
+(título do processo, objetivo, descrição dos serviços, itens da planilha e
+normas) e os campos do filtro por papel.  ``index_tr`` regrava a linha na
+mesma transação de quem salva o TR; o índice textual é mantido pelo banco:
+
+* Postgres: coluna gerada ``document`` (tsvector com o dicionário
+  ``portuguese`` e pesos A–D) e índice GIN; a consulta usa
+  ``websearch_to_tsquery`` (aspas, ``or``, ``-termo``) e ``ts_rank_cd``.
+* SQLite: tabela FTS5 ``tr_search_fts`` de conteúdo externo, sincronizada
+  por triggers.  Sem stemming em português, cada termo perde o sufixo
+  flexional e vira prefixo (``instalações`` -> ``instal*``); ranking
+  ``bm25`` com os mesmos pesos e trechos destacados em Python, só para a
+  página.
+
+A paginação é por chave em (score, tr_id).  Processos arquivados continuam
+pesquisáveis: o documento guarda o próprio texto e só ganha
+``archived = true``.
+"""
+
+import gzip
+import json
+import re
+import time
+import unicodedata
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import (
+    Float, and_, cast, column, delete, exists, func, literal_column, or_, select, table, text
+)
+
+from .. import db
+from ..models import (
+    Invite, Procurement, ProcurementArchive, ProcurementStatus, Role, TR, TRSearchDocument,
+    TRServiceItem, TRStatus
+)
+from .pagination import decode_score_cursor, encode_score_cursor
+
+TABLE = TRSearchDocument.__tablename__
+TS_CONFIG = "portuguese"
+GIN_INDEX = "ix_tr_search_documents_document"
+HIGHLIGHT = ("<mark>", "</mark>")
+MAX_TERMS = 16
+
+# Processos que o fornecedor vê sem convite (mesma regra de /api/procurements)
+SUPPLIER_OPEN_STATUSES = (ProcurementStatus.ABERTO, ProcurementStatus.ANALISE_TECNICA)
+
+DOCUMENT_DDL = f"""tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('{TS_CONFIG}', coalesce(title, '') || ' ' || coalesce(objetivo, '')), 'A') ||
+    setweight(to_tsvector('{TS_CONFIG}', coalesce(descricao_servicos, '')), 'B') ||
+    setweight(to_tsvector('{TS_CONFIG}', coalesce(itens, '')), 'C') ||
+    setweight(to_tsvector('{TS_CONFIG}', coalesce(normas_observar, '')), 'D')
+) STORED"""
+
+_FTS_COLUMNS = "title, objetivo, descricao_servicos, itens, normas_observar"
+_FTS_NEW = ", ".join(f"new.{c.strip()}" for c in _FTS_COLUMNS.split(","))
+_FTS_OLD = ", ".join(f"old.{c.strip()}" for c in _FTS_COLUMNS.split(","))
+# Pesos do bm25 na ordem das colunas (equivalentes aos pesos A–D do Postgres)
+_BM25_WEIGHTS = "10.0, 10.0, 4.0, 2.0, 1.0"
+
+SQLITE_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS tr_search_fts USING fts5(
+        {_FTS_COLUMNS}, content='{TABLE}', content_rowid='tr_id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS tr_search_fts_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO tr_search_fts(rowid, {_FTS_COLUMNS}) VALUES (new.tr_id, {_FTS_NEW});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tr_search_fts_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO tr_search_fts(tr_search_fts, rowid, {_FTS_COLUMNS})
+        VALUES ('delete', old.tr_id, {_FTS_OLD});
+    END""",
+    # Só as colunas de texto: mudar status ou ``archived`` não reindexa
+    f"""CREATE TRIGGER IF NOT EXISTS tr_search_fts_au AFTER UPDATE OF {_FTS_COLUMNS} ON {TABLE} BEGIN
+        INSERT INTO tr_search_fts(tr_search_fts, rowid, {_FTS_COLUMNS})
+        VALUES ('delete', old.tr_id, {_FTS_OLD});
+        INSERT INTO tr_search_fts(rowid, {_FTS_COLUMNS}) VALUES (new.tr_id, {_FTS_NEW});
+    END""",
+)
+
+
+def ensure_index(engine):
+    """Índice textual de um banco criado por ``create_all`` (idempotente)"""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS document {DOCUMENT_DDL}"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON {TABLE} USING gin (document)"))
+        elif conn.dialect.name == "sqlite":
+            created = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'tr_search_fts'"
+            )).first() is None
+            for ddl in SQLITE_DDL:
+                conn.execute(text(ddl))
+            if created:
+                conn.execute(text("INSERT INTO tr_search_fts(tr_search_fts) VALUES ('rebuild')"))
+
+
+# -- documentos ----------------------------------------------------------
+
+def _itens(items) -> str:
+    return " ".join(f"{codigo or ''} {descricao}" for codigo, descricao in items)
+
+
+def index_tr(tr, proc=None):
+    """Regrava o documento do TR na sessão corrente (chamar antes do commit)"""
+    if proc is None and tr.procurement_id:
+        proc = db.session.get(Procurement, tr.procurement_id)
+    items = db.session.execute(
+        select(TRServiceItem.codigo, TRServiceItem.descricao)
+        .where(TRServiceItem.tr_id == tr.id)
+        .order_by(TRServiceItem.item_ordem)
+    ).all()
+    db.session.merge(TRSearchDocument(
+        tr_id=tr.id,
+        procurement_id=tr.procurement_id,
+        owner_id=proc.requisitante_id if proc and proc.requisitante_id else tr.created_by,
+        tr_status=(tr.status or TRStatus.RASCUNHO).value,
+        archived=False,
+        title=proc.title if proc else None,
+        objetivo=tr.objetivo,
+        descricao_servicos=tr.descricao_servicos,
+        normas_observar=tr.normas_observar,
+        itens=_itens(items),
+    ))
+
+
+def mark_archived(procurement_ids):
+    """Arquivamento do processo: o documento fica, fora da visão do fornecedor"""
+    db.session.execute(
+        TRSearchDocument.__table__.update()
+        .where(TRSearchDocument.procurement_id.in_(procurement_ids))
+        .values(archived=True)
+    )
+
+
+def backfill_sql(dialect: str) -> str:
+    """INSERT ... SELECT dos TRs sem documento com ``tr_terms.id`` em [:lo, :hi)"""
+    if dialect == "postgresql":
+        agg = "string_agg(COALESCE(i.codigo, '') || ' ' || i.descricao, ' ' ORDER BY i.item_ordem)"
+    else:
+        agg = "group_concat(COALESCE(i.codigo, '') || ' ' || i.descricao, ' ')"
+    return f"""
+        INSERT INTO {TABLE}
+            (tr_id, procurement_id, owner_id, tr_status, archived, title, objetivo,
+             descricao_servicos, normas_observar, itens, updated_at)
+        SELECT t.id, t.procurement_id, COALESCE(p.requisitante_id, t.created_by),
+               COALESCE(CAST(t.status AS VARCHAR(20)), 'RASCUNHO'), FALSE, p.title, t.objetivo,
+               t.descricao_servicos, t.normas_observar,
+               (SELECT {agg} FROM tr_service_items i WHERE i.tr_id = t.id),
+               CURRENT_TIMESTAMP
+        FROM tr_terms t
+        LEFT JOIN procurements p ON p.id = t.procurement_id
+        WHERE t.id >= :lo AND t.id < :hi
+          AND NOT EXISTS (SELECT 1 FROM {TABLE} d WHERE d.tr_id = t.id)
+    """
+
+
+def index_missing(chunk_size=5000) -> int:
+    """Cria os documentos que faltam para os TRs das tabelas quentes"""
+    low, high = db.session.execute(select(func.min(TR.id), func.max(TR.id))).first()
+    if low is None:
+        return 0
+    sql = text(backfill_sql(db.session.get_bind().dialect.name))
+    rows = 0
+    for lo in range(low, high + 1, chunk_size):
+        rows += db.session.execute(sql, {"lo": lo, "hi": lo + chunk_size}).rowcount or 0
+        db.session.commit()
+    return rows
+
+
+def index_archives(batch_size=200, log=None) -> int:
+    """Documentos dos processos arquivados, a partir dos snapshots"""
+    rows = 0
+    last = 0
+    while True:
+        archives = db.session.execute(
+            select(ProcurementArchive)
+            .where(
+                ProcurementArchive.procurement_id > last,
+                ~exists().where(TRSearchDocument.procurement_id == ProcurementArchive.procurement_id),
+            )
+            .order_by(ProcurementArchive.procurement_id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not archives:
+            return rows
+        for archive in archives:
+            graph = json.loads(gzip.decompress(archive.snapshot))
+            items = sorted(graph["tr_service_items"], key=lambda i: i["item_ordem"])
+            for tr in graph["tr_terms"]:
+                db.session.add(TRSearchDocument(
+                    tr_id=tr["id"],
+                    procurement_id=archive.procurement_id,
+                    owner_id=archive.requisitante_id or tr["created_by"],
+                    tr_status=tr["status"] or TRStatus.RASCUNHO.value,
+                    archived=True,
+                    title=archive.title,
+                    objetivo=tr["objetivo"],
+                    descricao_servicos=tr["descricao_servicos"],
+                    normas_observar=tr["normas_observar"],
+                    itens=_itens((i["codigo"], i["descricao"]) for i in items if i["tr_id"] == tr["id"]),
+                ))
+                rows += 1
+        db.session.commit()
+        last = archives[-1].procurement_id
+        if log:
+            log(f"   . arquivados: {rows} documento(s)")
+
+
+# -- consulta ------------------------------------------------------------
+
+def _fold(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+# Sufixos flexionais (já sem acento), do mais longo ao mais curto
+_SUFFIXES = ("coes", "soes", "cao", "sao", "oes", "ao", "es", "s")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 4 and word[-1] in "aeo":
+        word = word[:-1]
+    return word
+
+
+def _terms(q: str) -> list:
+    """[(termo, prefixo?)]: prefixo a partir de 3 letras depois do radical"""
+    terms = []
+    for word in re.findall(r"\w+", _fold(q))[:MAX_TERMS]:
+        stem = _stem(word)
+        terms.append((stem, True) if len(stem) >= 3 else (word, False))
+    return terms
+
+
+def fts_query(q: str) -> str:
+    """Expressão FTS5: termos em E"""
+    return " ".join(f'"{term}"*' if prefix else f'"{term}"' for term, prefix in _terms(q))
+
+
+def _highlight(text: str, terms, width=24) -> str:
+    """Trecho de ``width`` palavras com mais ocorrências, termos marcados
+
+    Feito em Python sobre a página: ``snippet()`` do FTS5 reavalia a busca
+    inteira mesmo restrito a ``rowid IN (...)``.
+    """
+    words = list(re.finditer(r"\w+", text))
+    hits = [
+        i for i, w in enumerate(words)
+        if any(_fold(w.group()).startswith(t) if prefix else _fold(w.group()) == t for t, prefix in terms)
+    ]
+    if not hits:
+        return None
+    # Janela que cobre mais ocorrências (dois ponteiros sobre ``hits``)
+    best, best_count, j = hits[0], 0, 0
+    for i, h in enumerate(hits):
+        while j < len(hits) and hits[j] < h + width:
+            j += 1
+        if j - i > best_count:
+            best, best_count = h, j - i
+    start = max(best - 2, 0)
+    window = words[start:start + width]
+    marked = set(hits)
+    parts, cursor = [], window[0].start()
+    for i, w in enumerate(window, start=start):
+        parts.append(text[cursor:w.start()])
+        parts.append(f"{HIGHLIGHT[0]}{w.group()}{HIGHLIGHT[1]}" if i in marked else w.group())
+        cursor = w.end()
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(words) else ""
+    return prefix + "".join(parts) + suffix
+
+
+def _body(doc) -> str:
+    parts = (doc.title, doc.objetivo, doc.descricao_servicos, doc.itens, doc.normas_observar)
+    return " ".join(p for p in parts if p)
+
+
+def _visibility(user) -> list:
+    """Mesmas regras de /api/procurements e /api/tr/<id>"""
+    if user.role == Role.COMPRADOR:
+        return []
+    if user.role == Role.REQUISITANTE:
+        return [TRSearchDocument.owner_id == user.id]
+    # Fornecedor: TR aprovado de processo ativo aberto ou para o qual foi convidado
+    return [
+        TRSearchDocument.archived.is_(False),
+        TRSearchDocument.tr_status == TRStatus.APROVADO.value,
+        or_(
+            exists().where(
+                Procurement.id == TRSearchDocument.procurement_id,
+                Procurement.status.in_(SUPPLIER_OPEN_STATUSES),
+            ),
+            exists().where(
+                Invite.procurement_id == TRSearchDocument.procurement_id,
+                Invite.email == user.email,
+            ),
+        ),
+    ]
+
+
+def _postgres(q: str, filters):
+    config = literal_column(f"'{TS_CONFIG}'::regconfig")
+    tsquery = func.websearch_to_tsquery(config, q)
+    document = literal_column(f"{TABLE}.document")
+    score = cast(func.ts_rank_cd(document, tsquery, 1), Float)
+    ranked = select(TRSearchDocument.tr_id, score.label("score")).where(document.op("@@")(tsquery), *filters)
+
+    def snippets(docs) -> dict:
+        body = func.concat_ws(
+            " ", TRSearchDocument.title, TRSearchDocument.objetivo, TRSearchDocument.descricao_servicos,
+            TRSearchDocument.itens, TRSearchDocument.normas_observar,
+        )
+        options = f"StartSel={HIGHLIGHT[0]}, StopSel={HIGHLIGHT[1]}, MaxWords=24, MinWords=8, MaxFragments=2"
+        return dict(db.session.execute(
+            select(TRSearchDocument.tr_id, func.ts_headline(config, body, tsquery, options))
+            .where(TRSearchDocument.tr_id.in_(list(docs)))
+        ).all())
+
+    return ranked, snippets
+
+
+def _sqlite(q: str, filters):
+    terms = _terms(q)
+    if not terms:
+        raise ValueError("Informe o termo de busca (q)")
+    fts_table = table("tr_search_fts", column("rowid"))
+    fts = literal_column(fts_table.name)
+    # bm25 é menor para os melhores resultados
+    score = -func.bm25(fts, literal_column(_BM25_WEIGHTS))
+    ranked = (
+        select(fts_table.c.rowid.label("tr_id"), score.label("score"))
+        .select_from(fts_table)
+        .where(fts.op("MATCH")(fts_query(q)))
+    )
+    # Comprador não filtra: o ranking sai só do índice, sem o JOIN
+    if filters:
+        ranked = ranked.join(TRSearchDocument, TRSearchDocument.tr_id == fts_table.c.rowid).where(*filters)
+
+    def snippets(docs) -> dict:
+        return {tr_id: _highlight(_body(doc), terms) for tr_id, doc in docs.items()}
+
+    return ranked, snippets
+
+
+def search(user, q: str, limit=20, cursor=None) -> dict:
+    """Documentos visíveis ao usuário por relevância; ValueError em entrada inválida"""
+    q = (q or "").strip()
+    if not q:
+        raise ValueError("Informe o termo de busca (q)")
+    builder = _postgres if db.session.get_bind().dialect.name == "postgresql" else _sqlite
+    ranked, snippets = builder(q, _visibility(user))
+
+    ranked = ranked.subquery()
+    stmt = select(ranked.c.tr_id, ranked.c.score)
+    if cursor:
+        score, tr_id = decode_score_cursor(cursor)
+        stmt = stmt.where(or_(
+            ranked.c.score < score,
+            and_(ranked.c.score == score, ranked.c.tr_id < tr_id),
+        ))
+    rows = db.session.execute(
+        stmt.order_by(ranked.c.score.desc(), ranked.c.tr_id.desc()).limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return {"items": [], "next_cursor": None}
+
+    docs = {d.tr_id: d for d in TRSearchDocument.query.filter(TRSearchDocument.tr_id.in_([r.tr_id for r in rows]))}
+    highlights = snippets(docs)
+    last = rows[-1]
+    return {
+        "items": [serialize(docs[r.tr_id], r.score, highlights.get(r.tr_id)) for r in rows],
+        "next_cursor": encode_score_cursor(last.score, last.tr_id) if has_more else None,
+    }
+
+
+def serialize(doc: TRSearchDocument, score: float, snippet: str = None) -> dict:
+    return {
+        "tr_id": doc.tr_id,
+        "procurement_id": doc.procurement_id,
+        "title": doc.title,
+        "objetivo": doc.objetivo,
+        "tr_status": doc.tr_status,
+        "archived": doc.archived,
+        "score": round(score, 6),
+        "snippet": snippet,
+    }
+
+
+# -- linha de comando ----------------------------------------------------
+
+@click.group("search")
+def search_cli():
+    """Índice de busca dos TRs"""
+
+
+@search_cli.command("reindex")
+@click.option("--chunk-size", default=5000, show_default=True, help="Faixa de ids de TR por lote")
+@with_appcontext
+def reindex_command(chunk_size):
+    """Recria os documentos de busca (TRs ativos e arquivados)"""
+    started = time.perf_counter()
+    db.session.execute(delete(TRSearchDocument))
+    db.session.commit()
+    hot = index_missing(chunk_size)
+    archived = index_archives(log=click.echo)
+    elapsed = time.perf_counter() - started
+    click.echo(f"✅ {hot + archived} documento(s) ({archived} arquivado(s)) em {elapsed:.1f}s")
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Autenticação do handshake Socket.IO e cache de autorização de salas
+
+O JWT é verificado uma única vez no ``connect``.  A identidade decodificada e
+as salas permitidas (sala do próprio usuário, sala do papel e salas dos
+processos visíveis) ficam em memória durante toda a conexão, de modo que os
+``join_*`` repetidos são verificações O(1) sem consultas ao banco.
+
+Convites, atribuições e mudanças de status atualizam o cache pelas funções
+abaixo, mas só no worker que atendeu a requisição HTTP.  Com vários workers
+(``SOCKETIO_MESSAGE_QUEUE``) os demais descobrem a mudança sozinhos: uma sala
+de processo fora do cache custa uma consulta pela chave primária (e, para
+fornecedor, uma pelo convite), e um processo lido como público vale por
+``SOCKETIO_VISIBILITY_TTL`` segundos.
+"""
+
+import threading
+import time
+
+from flask import current_app, request
+from flask_jwt_extended import decode_token
+from sqlalchemy import select
+
+from .. import db, socketio
+from ..models import Invite, Procurement, ProcurementStatus, Role, User
+from .auth import user_id_from_identity
+
+# Status em que qualquer fornecedor enxerga o processo (ver list_procurements)
+PUBLIC_STATUSES = (ProcurementStatus.ABERTO, ProcurementStatus.ANALISE_TECNICA)
+
+_lock = threading.Lock()
+_sessions = {}       # sid -> SocketSession
+_user_sids = {}      # user_id -> {sid, ...}
+_public_rooms = {}   # "proc:<id>" -> time.monotonic() em que foi lido como público
+
+
+class SocketSession:
+    """Identidade e salas autorizadas de uma conexão"""
+    __slots__ = ("user_id", "role", "rooms", "joined")
+
+    def __init__(self, user_id, role, rooms):
+        self.user_id = user_id
+        self.role = role
+        self.rooms = rooms
+        self.joined = set()
+
+    def can_join(self, room: str) -> bool:
+        if room in self.rooms:
+            return True
+        if not room.startswith("proc:"):
+            return False
+        if self.role == Role.COMPRADOR:
+            return True
+        proc_id = room[5:]
+        if not proc_id.isdigit():
+            return False
+        if self.role == Role.FORNECEDOR and _recently_public(room):
+            return True
+        row = db.session.execute(
+            select(Procurement.status, Procurement.requisitante_id).where(Procurement.id == int(proc_id))
+        ).first()
+        if row is None:
+            return False
+        public = row.status in PUBLIC_STATUSES
+        if public:
+            _public_rooms[room] = time.monotonic()
+        if self.role == Role.FORNECEDOR:
+            if public:
+                return True
+            # Convidado por outro worker: o grant() não chegou até aqui
+            allowed = db.session.query(Invite.id).filter_by(
+                procurement_id=int(proc_id), supplier_user_id=self.user_id
+            ).first() is not None
+        else:
+            allowed = row.requisitante_id == self.user_id
+        if allowed:
+            with _lock:
+                self.rooms.add(room)
+        return allowed
+
+
+def _token_from_handshake(auth):
+    if isinstance(auth, dict) and auth.get("token"):
+        return auth["token"]
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[7:]
+    return request.args.get("token")
+
+
+def _allowed_rooms(user: User) -> set:
+    rooms = {f"user:{user.id}", f"role:{user.role.value}"}
+    if user.org_id:
+        rooms.add(f"org:{user.org_id}")
+
+    if user.role == Role.REQUISITANTE:
+        proc_ids = db.session.query(Procurement.id).filter_by(requisitante_id=user.id)
+    elif user.role == Role.FORNECEDOR:
+        # Processos públicos são conferidos no join (``_public_rooms``)
+        proc_ids = db.session.query(Invite.procurement_id).filter_by(email=user.email)
+    else:
+        # Comprador enxerga todos os processos (ver SocketSession.can_join)
+        proc_ids = []
+
+    rooms.update(f"proc:{pid}" for (pid,) in proc_ids)
+    return rooms
+
+
+def _recently_public(room: str) -> bool:
+    read_at = _public_rooms.get(room)
+    return read_at is not None and \
+        time.monotonic() - read_at < current_app.config["SOCKETIO_VISIBILITY_TTL"]
+
+
+def authenticate(auth):
+    """Valida o JWT do handshake e devolve a sessão, ou None se inválido"""
+    token = _token_from_handshake(auth)
+    if not token:
+        return None
+    try:
+        claims = decode_token(token)
+    except Exception:
+        return None
+
+    user_id = user_id_from_identity(claims.get("sub"))
+    user = User.query.get(user_id) if user_id else None
+    if not user or user.is_active is False:
+        return None
+
+    return SocketSession(user.id, user.role, _allowed_rooms(user))
+
+
+def register(sid: str, session: SocketSession):
+    with _lock:
+        _sessions[sid] = session
+        _user_sids.setdefault(session.user_id, set()).add(sid)
+
+
+def unregister(sid: str):
+    with _lock:
+        session = _sessions.pop(sid, None)
+        if session is None:
+            return
+        sids = _user_sids.get(session.user_id)
+        if sids:
+            sids.discard(sid)
+            if not sids:
+                del _user_sids[session.user_id]
+
+
+def get_session(sid: str):
+    return _sessions.get(sid)
+
+
+def room_stats():
+    """Conexões autenticadas e participações em salas por tipo (``proc``, ``user``...)"""
+    with _lock:
+        sessions = list(_sessions.values())
+    rooms = {}
+    for session in sessions:
+        for room in list(session.joined):
+            kind = room.split(":", 1)[0]
+            rooms[kind] = rooms.get(kind, 0) + 1
+    return len(sessions), rooms
+
+
+def join(sid: str, room: str) -> bool:
+    """Entra na sala se a conexão tiver autorização (banco só em sala fora do cache)"""
+    session = _sessions.get(sid)
+    if session is None or not session.can_join(room):
+        return False
+    socketio.server.enter_room(sid, room, namespace="/")
+    session.joined.add(room)
+    return True
+
+
+def grant(user_id: int, proc_id: int):
+    """Autoriza as conexões abertas do usuário na sala do processo"""
+    room = f"proc:{proc_id}"
+    with _lock:
+        for sid in _user_sids.get(user_id, ()):
+            _sessions[sid].rooms.add(room)
+
+
+def procurement_status_changed(proc_id: int, status: ProcurementStatus):
+    """Atualiza a visibilidade pública do processo para fornecedores"""
+    room = f"proc:{proc_id}"
+    # Os outros workers leem o novo status quando o TTL do cache deles vencer
+    _public_rooms.pop(room, None)
+    if status in PUBLIC_STATUSES:
+        return
+
+    with _lock:
+        # Fornecedores que entraram apenas por o processo ser público saem
+        evicted = [
+            sid for sid, s in _sessions.items()
+            if s.role == Role.FORNECEDOR and room in s.joined and room not in s.rooms
+        ]
+        for sid in evicted:
+            _sessions[sid].joined.discard(room)
+    for sid in evicted:
+        socketio.server.leave_room(sid, room, namespace="/")
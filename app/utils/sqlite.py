@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil SQLite para instalações de um único nó
+
+Aplicado aos engines SQLite em arquivo quando ``SQLITE_TUNING`` está ligado:
+
+* PRAGMAs por conexão: ``journal_mode=WAL`` (leitores não bloqueiam o
+  escritor), ``busy_timeout``, ``synchronous=NORMAL`` (seguro com WAL),
+  ``cache_size`` e ``mmap_size`` (leituras servidas pelo page cache do SO);
+* escritor único: o SQLite aceita um escritor por vez, e no modo threading
+  duas transações de escrita simultâneas terminam em "database is locked".
+  A sessão adquire um lock do processo no primeiro flush/DML e o libera ao
+  fim da transação, de modo que as escritas formam uma fila.  Quem espera
+  mais que ``busy_timeout`` recebe 503 (ver app/utils/database.py).
+
+As leituras não entram na fila: o pysqlite só abre transação (BEGIN) antes
+do primeiro INSERT/UPDATE/DELETE, que já acontece com o lock em mãos.
+"""
+
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from .metrics import metrics
+
+_writer = threading.Lock()
+_HELD = "sqlite_writer_lock"
+
+
+def _pragmas(config):
+    return (
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        # Negativo = tamanho em KiB, independente do page_size
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        "PRAGMA temp_store=MEMORY",
+    )
+
+
+def _on_connect(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def _acquire_writer(session, timeout):
+    if session.info.get(_HELD):
+        return
+    if not _writer.acquire(timeout=timeout):
+        metrics.inc("sqlite_writer_timeouts_total")
+        raise PoolTimeoutError("fila de escrita do SQLite esgotou o busy_timeout")
+    session.info[_HELD] = True
+
+
+def _release_writer(session):
+    if session.info.pop(_HELD, False):
+        _writer.release()
+
+
+def _install_single_writer(db, timeout):
+    session_class = db.session.session_factory.class_
+
+    @event.listens_for(session_class, "before_flush")
+    def _before_flush(session, flush_context, instances):
+        if session.new or session.dirty or session.deleted:
+            _acquire_writer(session, timeout)
+
+    @event.listens_for(session_class, "do_orm_execute")
+    def _before_dml(state):
+        if state.is_insert or state.is_update or state.is_delete:
+            _acquire_writer(state.session, timeout)
+
+    @event.listens_for(session_class, "after_transaction_end")
+    def _after_transaction(session, transaction):
+        # Só a transação raiz encerra a escrita (commit, rollback ou close)
+        if transaction.parent is None:
+            _release_writer(session)
+
+
+def is_file_sqlite(engine) -> bool:
+    return engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:")
+
+
+def init_sqlite(app, db):
+    if not app.config["SQLITE_TUNING"]:
+        return
+    with app.app_context():
+        engines = [e for e in db.engines.values() if is_file_sqlite(e)]
+    if not engines:
+        return
+
+    pragmas = _pragmas(app.config)
+    for engine in engines:
+        if not getattr(engine, "_sqlite_tuned", False):
+            event.listen(engine, "connect", _on_connect(pragmas))
+            engine._sqlite_tuned = True
+
+    if app.config["SQLITE_SINGLE_WRITER"] and not getattr(db, "_sqlite_single_writer", False):
+        _install_single_writer(db, app.config["SQLITE_BUSY_TIMEOUT_MS"] / 1000)
+        db._sqlite_single_writer = True
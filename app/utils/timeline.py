@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Linha do tempo dos processos
+
+Cada transição de estado chama ``record(...)`` antes do commit: o evento
+entra na mesma transação da mudança (se ela falhar, o evento não existe) e
+sai no mesmo flush, sem consulta extra.  ``procurement_events`` é somente
+inserção — alterações ou exclusões pelo ORM levantam erro.
+
+``page`` devolve o histórico em ordem cronológica, uma varredura do índice
+``(procurement_id, created_at, id)`` por página.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import event as sa_event, insert, select, text, tuple_
+
+from .. import db
+from ..models import ProcurementEvent, User
+from .pagination import decode_cursor, encode_cursor
+
+
+# Eventos reconstruídos a partir das datas já gravadas (migração 0009 e
+# seed): (etapa, tabela de origem, evento, tipo da entidade, processo,
+# autor, data, condição), com as colunas da origem em ``src``.  Abertura e
+# fechamento do processo não têm data própria e só existem quando gravados
+# pela aplicação.
+BACKFILL_SOURCES = (
+    ("procurement_created", "procurements", "procurement.created", "procurement",
+     "src.id", "src.created_by", "src.created_at", "src.created_at IS NOT NULL"),
+    ("tr_created", "tr_terms", "tr.created", "tr",
+     "src.procurement_id", "src.created_by", "src.created_at",
+     "src.procurement_id IS NOT NULL AND src.created_at IS NOT NULL"),
+    ("tr_submitted", "tr_terms", "tr.submitted", "tr",
+     "src.procurement_id", "src.created_by", "src.submitted_at",
+     "src.procurement_id IS NOT NULL AND src.submitted_at IS NOT NULL"),
+    ("tr_approved", "tr_terms", "tr.approved", "tr",
+     "src.procurement_id", "src.approved_by", "src.approved_at",
+     "src.procurement_id IS NOT NULL AND src.approved_at IS NOT NULL"),
+    ("tr_rejected", "tr_terms", "tr.rejected", "tr",
+     "src.procurement_id", "NULL", "src.updated_at",
+     "src.procurement_id IS NOT NULL AND src.status = 'REJEITADO' AND src.updated_at IS NOT NULL"),
+    ("invite_sent", "invites", "invite.sent", "invite",
+     "src.procurement_id", "src.created_by", "src.created_at", "src.created_at IS NOT NULL"),
+    ("invite_accepted", "invites", "invite.accepted", "invite",
+     "src.procurement_id", "src.supplier_user_id", "src.accepted_at", "src.accepted_at IS NOT NULL"),
+    ("proposal_submitted", "proposals", "proposal.submitted", "proposal",
+     "src.procurement_id", "src.supplier_user_id", "src.technical_submitted_at",
+     "src.technical_submitted_at IS NOT NULL"),
+    ("proposal_reviewed", "proposals", "proposal.technical_reviewed", "proposal",
+     "src.procurement_id", "src.technical_reviewed_by", "src.technical_reviewed_at",
+     "src.technical_reviewed_at IS NOT NULL"),
+)
+
+
+@sa_event.listens_for(ProcurementEvent, "before_update")
+@sa_event.listens_for(ProcurementEvent, "before_delete")
+def _append_only(mapper, connection, target):
+    raise RuntimeError("procurement_events é somente inserção")
+
+
+def record(procurement_id: int, event: str, actor_id: int = None,
+           entity_type: str = None, entity_id: int = None, **details):
+    """Adiciona o evento à sessão corrente (vai junto no commit da transição)"""
+    db.session.add(ProcurementEvent(
+        procurement_id=procurement_id,
+        event=event,
+        actor_id=actor_id,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        details=details or None,
+        created_at=datetime.utcnow(),
+    ))
+
+
+def record_many(rows: list):
+    """Vários eventos num único INSERT multi-linha (mesmas chaves de ``record``)"""
+    if not rows:
+        return
+    now = datetime.utcnow()
+    db.session.execute(insert(ProcurementEvent), [
+        {"actor_id": None, "entity_type": None, "entity_id": None, "details": None,
+         "created_at": now, **row}
+        for row in rows
+    ])
+
+
+def page(procurement_id: int, limit: int = 100, cursor: str = None) -> dict:
+    """Eventos do mais antigo ao mais recente; ValueError se o cursor for inválido"""
+    stmt = (
+        select(ProcurementEvent, User.full_name)
+        .outerjoin(User, User.id == ProcurementEvent.actor_id)
+        .where(ProcurementEvent.procurement_id == procurement_id)
+    )
+    if cursor:
+        created_at, event_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(ProcurementEvent.created_at, ProcurementEvent.id) > tuple_(created_at, event_id)
+        )
+    rows = db.session.execute(
+        stmt.order_by(ProcurementEvent.created_at, ProcurementEvent.id).limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = rows[-1][0] if rows else None
+    return {
+        "items": [serialize(e, actor_name) for e, actor_name in rows],
+        "next_cursor": encode_cursor(last.created_at, last.id) if has_more else None,
+    }
+
+
+def serialize(e: ProcurementEvent, actor_name: str = None) -> dict:
+    return {
+        "id": e.id,
+        "event": e.event,
+        "actor_id": e.actor_id,
+        "actor_name": actor_name,
+        "entity_type": e.entity_type,
+        "entity_id": e.entity_id,
+        "details": e.details,
+        "created_at": e.created_at.isoformat() if e.created_at else None,
+    }
+
+
+def backfill_sql(dialect: str, source: tuple) -> str:
+    """INSERT ... SELECT dos eventos de uma origem com ``src.id`` em [:lo, :hi)"""
+    step, table, event, entity_type, proc_id, actor, at, condition = source
+    # No Postgres o literal precisa de CAST para a coluna JSON; no SQLite o
+    # CAST AS JSON viraria número
+    details = "'{\"backfilled\": true}'"
+    if dialect == "postgresql":
+        details = f"CAST({details} AS JSON)"
+    # NOT EXISTS: a aplicação pode já ter gravado o evento durante a migração
+    return f"""
+        INSERT INTO procurement_events
+            (procurement_id, event, actor_id, entity_type, entity_id, details, created_at)
+        SELECT {proc_id}, '{event}', {actor}, '{entity_type}', src.id, {details}, {at}
+        FROM {table} src
+        WHERE src.id >= :lo AND src.id < :hi AND {condition}
+          AND NOT EXISTS (
+              SELECT 1 FROM procurement_events e
+              WHERE e.procurement_id = {proc_id} AND e.event = '{event}'
+                AND e.entity_id = src.id
+          )
+    """
+
+
+def backfill_missing(chunk_size=5000) -> int:
+    """Reconstrói os eventos que faltam a partir das datas gravadas (seed)"""
+    dialect = db.session.get_bind().dialect.name
+    rows = 0
+    for source in BACKFILL_SOURCES:
+        table = source[1]
+        low, high = db.session.execute(text(f"SELECT MIN(id), MAX(id) FROM {table}")).first()
+        if low is None:
+            continue
+        sql = text(backfill_sql(dialect, source))
+        for lo in range(low, high + 1, chunk_size):
+            rows += db.session.execute(sql, {"lo": lo, "hi": lo + chunk_size}).rowcount or 0
+            db.session.commit()
+    return rows
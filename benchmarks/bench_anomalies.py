@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Custo e acerto da detecção de anomalias de preço (análise comparativa)
+
+Monta matrizes sintéticas fornecedor × item (preço base log-normal por
+item, ruído de ``--noise`` por proposta) e injeta erros de unidade (×10,
+×100, ×1000 ou a fração) em ``--error-rate`` das células.  Para cada
+tamanho mede a mediana de ``price_anomalies.analyze`` — só a análise; a
+consulta ao banco fica de fora — e quantos erros injetados foram achados.
+
+Uso:
+    python benchmarks/bench_anomalies.py
+    python benchmarks/bench_anomalies.py --sizes 5x500 10x2000 50x10000 --runs 7
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Item:
+    def __init__(self, i):
+        self.id = 1000 + i
+        self.item_ordem = i + 1
+        self.codigo = f"SRV-{i:05d}"
+        self.descricao = f"Item {i + 1}"
+
+
+def matrix(np, suppliers, items, noise, error_rate, rng):
+    base = rng.lognormal(5, 1.2, items)
+    prices = base * rng.lognormal(0, noise, (suppliers, items))
+    errors = rng.random((suppliers, items)) < error_rate
+    factors = 10.0 ** rng.choice([-3, -2, -1, 1, 2, 3], size=errors.sum())
+    prices[errors] *= factors
+    qty = rng.integers(1, 500, items).astype(float)
+    rows, cols = np.indices((suppliers, items))
+    # Colunas já em arrays, como ``matrix.columns`` entrega na comparação
+    cells = (
+        (rows.ravel() + 1).astype(float),
+        (cols.ravel() + 1000).astype(float),
+        np.broadcast_to(qty, (suppliers, items)).ravel(),
+        prices.round(2).ravel(),
+    )
+    return cells, {(int(r) + 1, int(c) + 1000) for r, c in zip(*np.nonzero(errors))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da detecção de anomalias de preço")
+    parser.add_argument("--sizes", nargs="+", default=["5x200", "10x2000", "20x5000", "50x10000"],
+                        help="fornecedores x itens")
+    parser.add_argument("--noise", type=float, default=0.12, help="desvio log-normal entre propostas")
+    parser.add_argument("--error-rate", type=float, default=0.002)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    import numpy as np
+    from app.utils import price_anomalies
+
+    rng = np.random.default_rng(7)
+    results = {}
+    print(f"{'tamanho':>10} {'células':>9} {'ms':>8} {'máx':>8} {'erros':>6} {'achados':>8} {'outliers':>9}")
+    for size in args.sizes:
+        suppliers, n_items = (int(v) for v in size.lower().split("x"))
+        items = [Item(i) for i in range(n_items)]
+        cells, injected = matrix(np, suppliers, n_items, args.noise, args.error_rate, rng)
+        proposal_ids = list(range(1, suppliers + 1))
+
+        samples = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            result = price_anomalies.analyze(proposal_ids, items, cells)
+            samples.append((time.perf_counter() - started) * 1000)
+        found = {(f["proposal_id"], f["service_item_id"]) for f in result["flags"]
+                 if "unit_error" in f["reasons"]}
+        outliers = result["counts"]["outlier_high"] + result["counts"]["outlier_low"]
+        median = statistics.median(samples)
+        results[size] = {"cells": suppliers * n_items, "median_ms": round(median, 2),
+                         "max_ms": round(max(samples), 2), "injected": len(injected),
+                         "found": len(found & injected), "false_unit_errors": len(found - injected),
+                         "outliers": outliers}
+        print(f"{size:>10} {suppliers * n_items:9} {median:8.1f} {max(samples):8.1f} "
+              f"{len(injected):6} {len(found & injected):8} {outliers:9}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos endpoints mais usados da API
+
+Para cada tamanho de massa (gerada com ``app.seed.seed_database``) executa
+os caminhos quentes pelo test client do Flask e registra percentis de
+latência, número de consultas SQL e pico de memória (tracemalloc) por
+requisição.  Os resultados são gravados em JSON e comparados com uma
+baseline para acusar regressões.
+
+Uso:
+    python benchmarks/bench_endpoints.py --sizes small,medium --output results.json
+    python benchmarks/bench_endpoints.py --sizes small --baseline benchmarks/baseline.json
+    python benchmarks/bench_endpoints.py --sizes small --save-baseline benchmarks/baseline.json
+
+Por padrão usa um SQLite temporário; ``--database-url`` aponta para um
+Postgres local (as tabelas são recriadas).
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = {
+    "small": dict(procurements=200, items_per_tr=20, fornecedores=50),
+    "medium": dict(procurements=2000, items_per_tr=50, fornecedores=200),
+    "large": dict(procurements=2000, items_per_tr=200, fornecedores=500),
+}
+
+# Limites de regressão: latência relativa e consultas absolutas
+DEFAULT_LATENCY_TOLERANCE = 0.25
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _pick_targets(db):
+    """Escolhe processos, usuários e propostas representativos da massa"""
+    from sqlalchemy import func
+    from app.models import (
+        Procurement, ProcurementStatus, Proposal, ProposalStatus, Role, User, Invite
+    )
+
+    def user_of(role):
+        return User.query.filter_by(role=role).order_by(User.id).first()
+
+    # Processo em análise com mais propostas aprovadas tecnicamente
+    comparison_proc = db.session.query(Proposal.procurement_id).filter(
+        Proposal.status == ProposalStatus.APROVADA_TECNICAMENTE
+    ).group_by(Proposal.procurement_id).order_by(
+        func.count().desc(), Proposal.procurement_id
+    ).first()[0]
+    proposal = Proposal.query.filter_by(procurement_id=comparison_proc).order_by(Proposal.id).first()
+
+    draft_proc = Procurement.query.filter_by(status=ProcurementStatus.TR_CRIADO).order_by(Procurement.id).first()
+    open_proc = Procurement.query.filter_by(status=ProcurementStatus.ABERTO).order_by(Procurement.id).first()
+    open_invite = Invite.query.filter_by(procurement_id=open_proc.id).order_by(Invite.id).first()
+
+    return {
+        "users": {role: user_of(role) for role in Role},
+        "comparison_proc_id": comparison_proc,
+        "proposal_id": proposal.id,
+        "draft_proc": draft_proc,
+        "open_proc": open_proc,
+        "open_supplier_id": open_invite.supplier_user_id,
+    }
+
+
+def _build_cases(db, targets, planilha_items):
+    from flask_jwt_extended import create_access_token
+    from app.models import Role, TRServiceItem
+
+    def auth(user_id):
+        return {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+
+    users = targets["users"]
+    buyer = auth(users[Role.COMPRADOR].id)
+    cases = {}
+
+    for role in Role:
+        cases[f"list_procurements[{role.value}]"] = ("GET", "/api/procurements", auth(users[role].id), None)
+
+    cases["get_proposals_comparison"] = (
+        "GET", f"/api/procurements/{targets['comparison_proc_id']}/comparison", buyer, None)
+    cases["list_commercial_items"] = (
+        "GET", f"/api/proposals/{targets['comparison_proc_id']}/commercial-items", buyer, None)
+    cases["get_proposal_details"] = (
+        "GET", f"/api/proposals/{targets['proposal_id']}", buyer, None)
+
+    draft = targets["draft_proc"]
+    planilha = [{
+        "item_ordem": n,
+        "codigo": f"SRV-{n:05d}",
+        "descricao": f"Item de serviço {n}",
+        "unid": "UN",
+        "qtde": n % 97 + 1
+    } for n in range(1, planilha_items + 1)]
+    cases[f"tr_save[planilha={planilha_items}]"] = (
+        "POST", f"/api/procurements/{draft.id}/tr", auth(draft.requisitante_id),
+        {"objetivo": "Benchmark", "descricao_servicos": "Benchmark", "planilha_servico": planilha})
+
+    open_proc = targets["open_proc"]
+    item_ids = [i for (i,) in db.session.query(TRServiceItem.id).filter_by(tr_id=open_proc.tr.id)]
+    prices = [{"service_item_id": sid, "unit_price": 10 + n % 50} for n, sid in enumerate(item_ids)]
+    cases[f"upsert_prices[items={len(item_ids)}]"] = (
+        "PUT", f"/api/proposals/{open_proc.id}/prices", auth(targets["open_supplier_id"]), prices)
+
+    return cases
+
+
+def _run_case(client, method, url, headers, body, iterations, warmup):
+    from app.utils.query_stats import count_queries
+
+    for _ in range(warmup):
+        client.open(url, method=method, headers=headers, json=body)
+
+    latencies = []
+    queries = []
+    for _ in range(iterations):
+        with count_queries() as counter:
+            started = time.perf_counter()
+            response = client.open(url, method=method, headers=headers, json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.get_data(as_text=True)[:300]}")
+
+    # Memória medida numa execução separada: o tracemalloc distorce a latência
+    tracemalloc.start()
+    client.open(url, method=method, headers=headers, json=body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p90_ms": round(_percentile(latencies, 90), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "queries": max(queries),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run_size(app, db, name, params, iterations, warmup, planilha_items, seed):
+    from app.seed import seed_database
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        totals = seed_database(seed=seed, **params)
+        seed_seconds = time.perf_counter() - started
+
+        targets = _pick_targets(db)
+        cases = _build_cases(db, targets, planilha_items)
+        db.session.remove()
+
+    client = app.test_client()
+    results = {}
+    for case, (method, url, headers, body) in cases.items():
+        results[case] = _run_case(client, method, url, headers, body, iterations, warmup)
+        r = results[case]
+        print(f"  {case:40} p50 {r['p50_ms']:9.2f} ms  p99 {r['p99_ms']:9.2f} ms  "
+              f"{r['queries']:6} queries  {r['peak_memory_kb']:10.1f} KB")
+
+    return {"dataset": params, "rows": totals, "seed_seconds": round(seed_seconds, 2), "cases": results}
+
+
+def compare(results, baseline, tolerance):
+    """Devolve a lista de regressões em relação à baseline"""
+    regressions = []
+    for size, data in results["sizes"].items():
+        base_size = baseline.get("sizes", {}).get(size)
+        if not base_size:
+            continue
+        for case, current in data["cases"].items():
+            base = base_size["cases"].get(case)
+            if not base:
+                continue
+            if current["queries"] > base["queries"]:
+                regressions.append(f"{size}/{case}: consultas {base['queries']} -> {current['queries']}")
+            if current["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+                regressions.append(f"{size}/{case}: p50 {base['p50_ms']} -> {current['p50_ms']} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos endpoints da API")
+    parser.add_argument("--sizes", default="small", help=f"lista separada por vírgulas: {', '.join(SIZES)}")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--planilha-items", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="padrão: SQLite temporário")
+    parser.add_argument("--output", help="arquivo JSON de resultados")
+    parser.add_argument("--baseline", help="baseline JSON para detectar regressões")
+    parser.add_argument("--save-baseline", help="grava os resultados como nova baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_LATENCY_TOLERANCE,
+                        help="aumento relativo de p50 tolerado")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"tamanhos desconhecidos: {', '.join(unknown)}")
+
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.mkdtemp(prefix="bench-")
+        args.database_url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    # Config lê DATABASE_URL na importação do pacote
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    # Os números já são coletados aqui; os logs de N+1 só poluiriam a saída
+    logging.getLogger("app.sql").setLevel(logging.ERROR)
+    from app import create_app, db
+
+    app = create_app()
+    results = {
+        "meta": {
+            "generated_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": args.database_url.split(":", 1)[0],
+            "iterations": args.iterations,
+        },
+        "sizes": {},
+    }
+    for size in sizes:
+        print(f"[{size}] {SIZES[size]}")
+        results["sizes"][size] = run_size(
+            app, db, size, SIZES[size], args.iterations, args.warmup,
+            args.planilha_items, args.seed
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSÃO {line}")
+        status = 1 if regressions else 0
+
+    if tmpdir:
+        # Inclui os arquivos -wal/-shm do perfil SQLite
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação em planilha por streaming com uma matriz grande
+
+Cria um processo com ``--items`` itens no TR e ``--suppliers`` propostas
+aprovadas tecnicamente, todas com quantidade e preço em todos os itens, e
+baixa pelo cliente de teste do Flask:
+
+* ``/api/procurements/<id>/comparison/export`` (itens × fornecedores);
+* ``/api/proposals/<id>/commercial-items/export`` (proposta × item).
+
+Para cada formato mede o tempo até o primeiro pedaço da resposta, o tempo
+total, o tamanho e — com ``--memory`` — o pico de memória Python durante o
+download (tracemalloc, que deixa tudo umas 2x mais lento).
+
+Uso:
+    python benchmarks/bench_exports.py --suppliers 50 --items 10000
+    python benchmarks/bench_exports.py --suppliers 50 --items 10000 --memory
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def populate(n_suppliers, n_items, rng, chunk=20000):
+    from sqlalchemy import insert
+    from app import db
+    from app.models import (
+        Procurement, ProcurementStatus, Proposal, ProposalPrice, ProposalService, ProposalStatus,
+        Role, TR, TRServiceItem, TRStatus, User
+    )
+    from app.utils.passwords import hash_password
+
+    password = hash_password("123456")
+    buyer = User(email="comprador@bench", password_hash=password, full_name="Comprador", role=Role.COMPRADOR)
+    db.session.add(buyer)
+    suppliers = [User(email=f"fornecedor{i}@bench", password_hash=password,
+                      full_name=f"Fornecedor {i}", role=Role.FORNECEDOR) for i in range(n_suppliers)]
+    db.session.add_all(suppliers)
+    db.session.flush()
+    proc = Procurement(title="Benchmark de exportação", status=ProcurementStatus.ANALISE_TECNICA,
+                       created_by=buyer.id)
+    db.session.add(proc)
+    db.session.flush()
+    tr = TR(procurement_id=proc.id, objetivo="Benchmark", status=TRStatus.APROVADO, created_by=buyer.id)
+    db.session.add(tr)
+    db.session.flush()
+
+    db.session.execute(insert(TRServiceItem), [
+        {"tr_id": tr.id, "item_ordem": i + 1, "codigo": f"SRV-{i:05d}", "unid": "M2",
+         "descricao": f"Serviço de manutenção predial - item {i + 1}", "qtde": rng.randint(1, 500)}
+        for i in range(n_items)
+    ])
+    item_ids = [i for (i,) in db.session.query(TRServiceItem.id).filter_by(tr_id=tr.id)]
+    proposals = [Proposal(procurement_id=proc.id, supplier_user_id=s.id, technical_score=80,
+                          status=ProposalStatus.APROVADA_TECNICAMENTE) for s in suppliers]
+    db.session.add_all(proposals)
+    db.session.flush()
+
+    services, prices = [], []
+    for proposal in proposals:
+        for item_id in item_ids:
+            services.append({"proposal_id": proposal.id, "service_item_id": item_id,
+                             "qty": rng.randint(1, 500)})
+            prices.append({"proposal_id": proposal.id, "service_item_id": item_id,
+                           "unit_price": round(rng.lognormvariate(5, 1), 2)})
+            if len(services) >= chunk:
+                db.session.execute(insert(ProposalService), services)
+                db.session.execute(insert(ProposalPrice), prices)
+                services, prices = [], []
+    if services:
+        db.session.execute(insert(ProposalService), services)
+        db.session.execute(insert(ProposalPrice), prices)
+    db.session.commit()
+    return proc.id, buyer.id
+
+
+def download(client, url, headers, memory):
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    first = None
+    size = 0
+    for chunk in response.response:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    response.close()
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"status": response.status_code, "first_chunk_ms": round((first or 0) * 1000, 1),
+            "total_s": round(total, 2), "mb": round(size / 1e6, 1),
+            "peak_mb": round(peak / 1e6, 1) if peak is not None else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das exportações em planilha")
+    parser.add_argument("--suppliers", type=int, default=50)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--memory", action="store_true", help="mede o pico de memória (tracemalloc)")
+    parser.add_argument("--database-url", help="padrão: SQLite temporário")
+    parser.add_argument("--json", dest="json_path", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.mkdtemp(prefix="bench-exports-")
+        args.database_url = f"sqlite:///{os.path.join(tmpdir, 'exports.db')}"
+    os.environ.update(DATABASE_URL=args.database_url, SCHEMA_AUTO_CREATE="1")
+
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    import logging
+    logging.disable(logging.WARNING)
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        proc_id, buyer_id = populate(args.suppliers, args.items, random.Random(7))
+        print(f"{args.suppliers} propostas × {args.items} itens gravados em {time.perf_counter() - started:.1f}s")
+        headers = {"Authorization": "Bearer " + create_access_token(identity=str(buyer_id))}
+
+    client = app.test_client()
+    results = {}
+    print(f"\n{'exportação':32} {'1º pedaço ms':>13} {'total s':>8} {'MB':>7} {'pico MB':>8}")
+    for name, url in (("comparativo", f"/api/procurements/{proc_id}/comparison/export"),
+                      ("itens comerciais", f"/api/proposals/{proc_id}/commercial-items/export")):
+        for fmt in ("csv", "xlsx"):
+            result = download(client, f"{url}?format={fmt}", headers, args.memory)
+            if result["status"] != 200:
+                print(f"{name} {fmt}: HTTP {result['status']}")
+                return 1
+            results[f"{name}|{fmt}"] = result
+            peak = f"{result['peak_mb']:8.1f}" if result["peak_mb"] is not None else f"{'-':>8}"
+            print(f"{name + ' ' + fmt:32} {result['first_chunk_ms']:13.1f} {result['total_s']:8.2f} "
+                  f"{result['mb']:7.1f} {peak}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"suppliers": args.suppliers, "items": args.items, "exports": results},
+                      fh, indent=2, ensure_ascii=False)
+
+    if tmpdir:
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
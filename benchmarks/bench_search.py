@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Latência da busca textual de TRs (/api/search) com um índice grande
+
+Gera ``--documents`` documentos sintéticos em ``tr_search_documents``
+(vocabulário de TRs de obras, com o índice mantido pelo banco: FTS5 no
+SQLite, tsvector + GIN no Postgres) e mede, por consulta:
+
+* primeira página como comprador (sem filtro) e como requisitante
+  (filtro por ``owner_id``);
+* a página seguinte pelo cursor (paginação por chave em score, tr_id).
+
+O vocabulário é pequeno de propósito: cada termo aparece em boa parte dos
+documentos, o pior caso para o ranking (toda ocorrência é pontuada).
+
+Uso:
+    python benchmarks/bench_search.py --documents 100000
+    python benchmarks/bench_search.py --database-url postgresql://... --documents 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "manutenção predial reforma instalações elétricas hidráulicas pintura reboco alvenaria "
+    "impermeabilização forro piso cerâmico demolição limpeza andaime escoramento estrutura "
+    "concreto armado fundação cobertura telhado calha drenagem pavimentação asfalto sinalização "
+    "climatização ar condicionado exaustão incêndio sprinklers hidrantes iluminação subestação "
+    "transformador quadro cabeamento aterramento para-raios elevador acessibilidade rampa "
+    "fachada vidro esquadrias serralheria marcenaria divisórias jardinagem paisagismo poda "
+    "desratização dedetização vistoria laudo projeto executivo memorial descritivo fiscalização"
+).split()
+NORMAS = ("NR-10", "NR-18", "NR-35", "NR-12", "NBR 5410", "NBR 15575", "NBR 9050")
+QUERIES = ("manutenção predial", "instalações elétricas", "impermeabilização cobertura",
+           "sprinklers", "NR-35", "projeto executivo fachada")
+
+
+def _text(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def populate(n, owners, rng, chunk=5000):
+    from sqlalchemy import insert
+    from app import db
+    from app.models import TRSearchDocument
+
+    rows = []
+    for tr_id in range(1, n + 1):
+        rows.append({
+            "tr_id": tr_id,
+            "procurement_id": tr_id,
+            "owner_id": rng.randrange(1, owners + 1),
+            "tr_status": "APROVADO",
+            "archived": rng.random() < 0.3,
+            "title": f"Processo {tr_id} - {_text(rng, 4)}",
+            "objetivo": _text(rng, 12),
+            "descricao_servicos": _text(rng, 40),
+            "normas_observar": ", ".join(rng.sample(NORMAS, 3)),
+            "itens": " ".join(f"SRV-{rng.randrange(1, 5000):05d} {_text(rng, 3)}" for _ in range(10)),
+        })
+        if len(rows) >= chunk:
+            db.session.execute(insert(TRSearchDocument), rows)
+            db.session.commit()
+            rows = []
+    if rows:
+        db.session.execute(insert(TRSearchDocument), rows)
+        db.session.commit()
+
+
+def timed(fn, runs):
+    samples = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da busca textual")
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--owners", type=int, default=50, help="requisitantes distintos")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="padrão: SQLite temporário")
+    parser.add_argument("--json", dest="json_path", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.mkdtemp(prefix="bench-search-")
+        args.database_url = f"sqlite:///{os.path.join(tmpdir, 'search.db')}"
+    os.environ.update(DATABASE_URL=args.database_url, SCHEMA_AUTO_CREATE="1")
+
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    import logging
+    logging.disable(logging.WARNING)
+    from app import create_app, db
+    from app.models import Role, User
+    from app.utils import search
+
+    app = create_app()
+    results = {}
+    with app.app_context():
+        started = time.perf_counter()
+        populate(args.documents, args.owners, random.Random(7))
+        print(f"{args.documents} documentos indexados em {time.perf_counter() - started:.1f}s")
+
+        buyer = User(id=0, role=Role.COMPRADOR)
+        requisitante = User(id=1, role=Role.REQUISITANTE)
+        print(f"\n{'consulta':28} {'papel':12} {'p1 ms':>8} {'máx':>8} {'p2 ms':>8} {'itens':>6}")
+        for q in QUERIES:
+            for label, user in (("comprador", buyer), ("requisitante", requisitante)):
+                first_ms, worst_ms, page = timed(lambda: search.search(user, q, args.limit), args.runs)
+                next_ms = 0.0
+                if page["next_cursor"]:
+                    next_ms, _, _ = timed(
+                        lambda: search.search(user, q, args.limit, page["next_cursor"]), args.runs)
+                results[f"{q}|{label}"] = {"first_ms": round(first_ms, 2), "max_ms": round(worst_ms, 2),
+                                           "next_ms": round(next_ms, 2), "items": len(page["items"])}
+                print(f"{q:28} {label:12} {first_ms:8.1f} {worst_ms:8.1f} {next_ms:8.1f} {len(page['items']):6}")
+                db.session.rollback()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"documents": args.documents, "queries": results}, fh, indent=2, ensure_ascii=False)
+
+    if tmpdir:
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
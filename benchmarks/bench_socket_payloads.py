@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos payloads Socket.IO: bytes no fio e CPU de serialização
+
+Para cada tipo de evento emitido pelos blueprints mede o pacote codificado
+com o serializer JSON padrão e com o msgpack, antes e depois de deflate
+(equivalente ao permessage-deflate sem context takeover), e o tempo médio
+de codificação.
+
+Uso: python benchmarks/bench_socket_payloads.py [--iterations N] [--json ARQ]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import zlib
+from datetime import datetime
+
+from socketio import packet
+from socketio.msgpack_packet import MsgPackPacket
+
+NOW = datetime(2025, 1, 1, 12, 0, 0).isoformat()
+
+# Payloads com o mesmo formato dos emits em app/blueprints/*.py
+EVENTS = {
+    "procurement.assigned": {
+        "procurement_id": 1234,
+        "title": "Manutenção predial - bloco administrativo",
+        "message": "Você foi designado para criar o TR do processo "
+                   "'Manutenção predial - bloco administrativo'"
+    },
+    "procurement.opened": {
+        "procurement_id": 1234,
+        "title": "Manutenção predial - bloco administrativo",
+        "deadline": NOW
+    },
+    "procurement.closed": {
+        "procurement_id": 1234,
+        "title": "Manutenção predial - bloco administrativo"
+    },
+    "tr.saved": {
+        "procurement_id": 1234,
+        "tr_id": 987,
+        "status": "RASCUNHO",
+        "updated_by": 42
+    },
+    "tr.submitted": {
+        "procurement_id": 1234,
+        "tr_id": 987,
+        "submitted_by": 42,
+        "title": "Manutenção predial - bloco administrativo"
+    },
+    "tr.approval_result": {
+        "tr_id": 987,
+        "procurement_id": 1234,
+        "approved": False,
+        "comments": "Detalhar a matriz de responsabilidades e as normas NR-10/NR-35."
+    },
+    "invite.sent": {
+        "procurement_id": 1234,
+        "email": "contato@fornecedor-exemplo.com.br",
+        "title": "Manutenção predial - bloco administrativo"
+    },
+    "invite.received": {
+        "procurement_id": 1234,
+        "title": "Manutenção predial - bloco administrativo",
+        "token": "Q2hvb3NlIGEgcmFuZG9tIHRva2VuIG9mIDMyIGJ5dGVzIGhlcmU"
+    },
+    "proposal.updated": {
+        "proposal_id": 5555,
+        "procurement_id": 1234,
+        "supplier": 77,
+        "status": "RASCUNHO"
+    },
+    "proposal.submitted": {
+        "proposal_id": 5555,
+        "procurement_id": 1234,
+        "supplier": "Fornecedor Exemplo Engenharia Ltda",
+        "submitted_at": NOW
+    },
+    "proposal.technical_reviewed": {
+        "proposal_id": 5555,
+        "procurement_id": 1234,
+        "approved": True,
+        "score": 87
+    },
+}
+
+
+def _deflate(data: bytes) -> int:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+
+def _as_bytes(encoded) -> bytes:
+    return encoded.encode("utf-8") if isinstance(encoded, str) else encoded
+
+
+def measure(event: str, payload: dict, iterations: int) -> dict:
+    row = {"event": event}
+    for name, cls in (("json", packet.Packet), ("msgpack", MsgPackPacket)):
+        pkt = cls(packet.EVENT, namespace="/", data=[event, payload])
+        data = _as_bytes(pkt.encode())
+        seconds = timeit.timeit(pkt.encode, number=iterations)
+        row[name] = {
+            "bytes": len(data),
+            "deflate_bytes": _deflate(data),
+            "encode_us": round(seconds / iterations * 1e6, 3),
+        }
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--json", dest="json_path", help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    results = [measure(e, p, args.iterations) for e, p in EVENTS.items()]
+
+    header = f"{'evento':32} {'json B':>7} {'defl':>6} {'µs':>7} | {'msgpack B':>9} {'defl':>6} {'µs':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        j, m = r["json"], r["msgpack"]
+        print(f"{r['event']:32} {j['bytes']:7} {j['deflate_bytes']:6} {j['encode_us']:7.2f} | "
+              f"{m['bytes']:9} {m['deflate_bytes']:6} {m['encode_us']:7.2f}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"iterations": args.iterations, "events": results}, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
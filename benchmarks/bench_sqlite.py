@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Vazão de leitura e escrita do SQLite sob concorrência (modo threading)
+
+Roda a mesma carga com o SQLite padrão (``SQLITE_TUNING=0``: journal
+rollback, timeout padrão do pysqlite, escritores concorrentes) e com o perfil de nó
+único (WAL + PRAGMAs + fila única de escrita) e compara:
+
+* leitores: ``GET --read-path`` como comprador (padrão: caixa de
+  notificações, leitura indexada curta);
+* escritores: ``POST /api/procurements`` (INSERT do processo + notificações).
+
+Cada modo roda num subprocesso com um banco novo, porque ``Config`` lê o
+ambiente na importação.
+
+Uso:
+    python benchmarks/bench_sqlite.py --readers 8 --writers 4 --duration 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"padrão": "0", "perfil": "1"}
+
+
+def run_mode(args):
+    """Executa a carga no processo corrente e imprime o resultado em JSON"""
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    import logging
+    logging.disable(logging.WARNING)
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from app.models import Role, User
+    from app.seed import seed_database
+
+    app = create_app()
+    with app.app_context():
+        seed_database(seed=1, procurements=args.procurements, fornecedores=20, items_per_tr=5, log=None)
+        buyer = User.query.filter_by(role=Role.COMPRADOR).order_by(User.id).first()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(buyer.id))}"}
+
+    client = app.test_client()
+    stop = threading.Event()
+    counts = Counter()
+    lock = threading.Lock()
+
+    def loop(kind, method, path, body):
+        ok = errors = 0
+        while not stop.is_set():
+            try:
+                status = client.open(path, method=method, headers=headers, json=body).status_code
+            except Exception:
+                status = 500
+            if status < 400:
+                ok += 1
+            else:
+                errors += 1
+        with lock:
+            counts[f"{kind}_ok"] += ok
+            counts[f"{kind}_errors"] += errors
+
+    threads = [threading.Thread(target=loop, args=("read", "GET", args.read_path, None))
+               for _ in range(args.readers)]
+    threads += [threading.Thread(target=loop, args=("write", "POST", "/api/procurements", {"title": "Bench"}))
+                for _ in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    print(json.dumps({
+        "reads_per_s": round(counts["read_ok"] / args.duration, 1),
+        "writes_per_s": round(counts["write_ok"] / args.duration, 1),
+        "read_errors": counts["read_errors"],
+        "write_errors": counts["write_errors"],
+    }))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do perfil SQLite")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10, help="segundos por modo")
+    parser.add_argument("--procurements", type=int, default=500)
+    parser.add_argument("--read-path", default="/api/notifications?limit=20")
+    parser.add_argument("--run-mode", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_mode:
+        run_mode(args)
+        return 0
+
+    results = {}
+    for mode, tuning in MODES.items():
+        tmpdir = tempfile.mkdtemp(prefix="bench-sqlite-")
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+                   SQLITE_TUNING=tuning, SCHEMA_AUTO_CREATE="1")
+        cmd = [sys.executable, os.path.abspath(__file__), "--run-mode",
+               "--readers", str(args.readers), "--writers", str(args.writers),
+               "--duration", str(args.duration), "--procurements", str(args.procurements),
+               "--read-path", args.read_path]
+        out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True)
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+        if out.returncode:
+            sys.exit(f"modo {mode} falhou:\n{out.stderr[-2000:]}")
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"{args.readers} leitores + {args.writers} escritores, {args.duration:.0f}s por modo")
+    print(f"{'modo':8} {'leituras/s':>11} {'escritas/s':>11} {'erros leit.':>12} {'erros escr.':>12}")
+    for mode, r in results.items():
+        print(f"{mode:8} {r['reads_per_s']:11} {r['writes_per_s']:11} "
+              f"{r['read_errors']:12} {r['write_errors']:12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
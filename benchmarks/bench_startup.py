@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Tempo de inicialização da aplicação (cold start)
+
+Cada rodada é um processo Python novo que mede:
+
+* ``import``: importação do pacote ``app`` (Flask, SQLAlchemy, SocketIO...);
+* ``create_app``: configuração, extensões e blueprints;
+* ``first_request``: primeira resposta de ``/healthz`` e de ``/readyz``.
+
+Com ``--importtime`` também lista os módulos mais caros segundo
+``python -X importtime``.  Com ``--budget`` sai com código 1 se a mediana do
+total (import + create_app + primeira requisição) passar do limite — é
+assim que o CI acompanha regressões.  Também falha se algum módulo de
+``LAZY_MODULES`` for importado durante a subida.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 5 --budget 2.5 --importtime 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos carregados sob demanda: não podem aparecer no caminho de subida
+LAZY_MODULES = ("passlib", "numpy", "cProfile")
+
+PROBE = r"""
+import json, sys, time, warnings
+warnings.filterwarnings("ignore")
+t0 = time.perf_counter()
+import app as pkg
+t1 = time.perf_counter()
+application = pkg.create_app()
+t2 = time.perf_counter()
+client = application.test_client()
+client.get("/healthz")
+t3 = time.perf_counter()
+ready = client.get("/readyz").status_code
+t4 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "first_request": t3 - t2,
+                  "readyz": t4 - t3, "readyz_status": ready,
+                  "eager": [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+
+def _env(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    env.setdefault("SCHEMA_AUTO_CREATE", "0")
+    return env
+
+
+def run_once(env):
+    out = subprocess.run([sys.executable, "-c", PROBE, *LAZY_MODULES], cwd=ROOT, env=env,
+                         capture_output=True, text=True)
+    if out.returncode:
+        sys.exit(f"falha na inicialização:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile(env, top):
+    """Módulos com maior tempo cumulativo de importação (µs)"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app; app.create_app()"],
+                         cwd=ROOT, env=env, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = [p.strip() for p in line.split(":", 1)[1].split("|")]
+        rows.append((int(cumulative_us), int(self_us), module))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="padrão: SQLite temporário")
+    parser.add_argument("--budget", type=float, help="limite em segundos para a mediana do total")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="mostra os N módulos mais caros de importar")
+    parser.add_argument("--json", dest="json_path", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.mkdtemp(prefix="bench-startup-")
+        args.database_url = f"sqlite:///{os.path.join(tmpdir, 'startup.db')}"
+    env = _env(args.database_url)
+
+    # Aquece o cache de bytecode para não medir a compilação
+    run_once(env)
+    samples = [run_once(env) for _ in range(args.runs)]
+
+    phases = ("import", "create_app", "first_request", "readyz")
+    summary = {p: round(statistics.median(s[p] for s in samples), 4) for p in phases}
+    summary["total"] = round(statistics.median(
+        s["import"] + s["create_app"] + s["first_request"] for s in samples), 4)
+
+    print(f"{args.runs} rodadas, mediana em segundos")
+    for phase in phases + ("total",):
+        print(f"  {phase:14} {summary[phase]:8.3f}")
+
+    if args.importtime:
+        print("\nimportações mais caras (cumulativo / próprio, ms):")
+        for cumulative, own, module in import_profile(env, args.importtime):
+            print(f"  {cumulative / 1000:8.1f} {own / 1000:8.1f}  {module}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump({"median_seconds": summary, "samples": samples}, fh, indent=2)
+
+    if tmpdir:
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+    status = 0
+    eager = sorted({m for s in samples for m in s["eager"]})
+    if eager:
+        print(f"\nREGRESSÃO: importados na subida, deveriam ser sob demanda: {', '.join(eager)}")
+        status = 1
+    if args.budget and summary["total"] > args.budget:
+        print(f"\nREGRESSÃO: inicialização {summary['total']:.3f}s acima do limite de {args.budget:.3f}s")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
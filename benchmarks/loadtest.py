@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Teste de carga misto HTTP + WebSocket
+
+Simula a combinação de papéis do sistema contra um servidor em execução:
+
+* requisitantes fazendo auto-save do TR;
+* fornecedores enviando preços das propostas abertas;
+* compradores consultando a análise comparativa (polling) e ouvindo as
+  salas dos processos abertos;
+* todos conectados ao Socket.IO nas salas de usuário e de papel.
+
+Relata vazão, latência de cauda por operação e o atraso de entrega dos
+eventos ``proposal.comm.received`` (do PUT de preços até a chegada em cada
+comprador da sala do processo).
+
+A massa deve ter sido gerada com ``flask seed`` (senha padrão "123456").
+Dependências do cliente: ``pip install requests "python-socketio[client]"``.
+
+Uso:
+    python benchmarks/loadtest.py --url http://localhost:5000 --duration 60
+    python benchmarks/loadtest.py --spawn 4 --base-port 5100 --duration 60
+
+Com ``--spawn N`` são iniciados N workers locais (``python run.py``) com o
+mesmo ``DATABASE_URL``; para que os eventos atravessem workers defina
+``SOCKETIO_MESSAGE_QUEUE`` (ex.: redis://localhost:6379/0).
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+try:
+    import requests
+    import socketio
+except ImportError:  # pragma: no cover - dependência apenas do harness
+    sys.exit('Instale as dependências: pip install requests "python-socketio[client]"')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "123456"
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class Stats:
+    """Coleta latências por operação, erros e atrasos de eventos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.event_lag = []
+        self.events = defaultdict(int)
+
+    def record(self, op, seconds, ok):
+        with self._lock:
+            self.latencies[op].append(seconds * 1000)
+            if not ok:
+                self.errors[op] += 1
+
+    def record_event(self, event, lag=None):
+        with self._lock:
+            self.events[event] += 1
+            if lag is not None:
+                self.event_lag.append(lag * 1000)
+
+    def summary(self, elapsed):
+        ops = {}
+        for op, values in sorted(self.latencies.items()):
+            ops[op] = {
+                "requests": len(values),
+                "errors": self.errors[op],
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(_percentile(values, 50), 2),
+                "p95_ms": round(_percentile(values, 95), 2),
+                "p99_ms": round(_percentile(values, 99), 2),
+                "max_ms": round(max(values), 2),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "operations": ops,
+            "events_received": dict(self.events),
+            "event_lag": {
+                "samples": len(self.event_lag),
+                "p50_ms": round(_percentile(self.event_lag, 50), 2),
+                "p95_ms": round(_percentile(self.event_lag, 95), 2),
+                "p99_ms": round(_percentile(self.event_lag, 99), 2),
+                "mean_ms": round(statistics.fmean(self.event_lag), 2) if self.event_lag else 0.0,
+            },
+        }
+
+
+class VirtualUser(threading.Thread):
+    """Usuário simulado: sessão HTTP própria e uma conexão Socket.IO"""
+
+    def __init__(self, base_url, email, stats, stop, think_time, sent_at):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.email = email
+        self.stats = stats
+        self.stop = stop
+        self.think_time = think_time
+        self.sent_at = sent_at
+        self.http = requests.Session()
+        self.sio = socketio.Client(reconnection=False)
+        self.rng = random.Random(email)
+        self.user = None
+
+    def call(self, op, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, f"{self.base_url}/api{path}", timeout=30, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.stats.record(op, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def login(self):
+        response = self.call("login", "POST", "/auth/login", json={"email": self.email, "password": PASSWORD})
+        if response is None:
+            return False
+        data = response.json()
+        self.user = data["user"]
+        self.http.headers["Authorization"] = f"Bearer {data['access_token']}"
+        self.sio.connect(self.base_url, auth={"token": data["access_token"]},
+                         transports=["websocket"], wait_timeout=10)
+        self.sio.emit("join_user", {"user_id": self.user["id"]})
+        self.sio.emit("join_role", {"role": self.user["role"]})
+        return True
+
+    def pause(self):
+        self.stop.wait(self.rng.expovariate(1 / self.think_time) if self.think_time else 0)
+
+    def procurements(self, *statuses):
+        response = self.call("list_procurements", "GET", "/procurements")
+        rows = response.json() if response is not None else []
+        return [p for p in rows if p["status"] in statuses]
+
+    def run(self):
+        try:
+            if not self.login():
+                return
+            self.scenario()
+        finally:
+            if self.sio.connected:
+                self.sio.disconnect()
+
+    def scenario(self):
+        raise NotImplementedError
+
+
+class Requisitante(VirtualUser):
+    def scenario(self):
+        procs = self.procurements("TR_PENDENTE", "TR_CRIADO", "TR_REJEITADO")
+        if not procs:
+            return
+        for n in itertools.count():
+            if self.stop.is_set():
+                return
+            proc = self.rng.choice(procs)
+            self.call("tr_autosave", "POST", f"/procurements/{proc['id']}/tr", json={
+                "objetivo": f"Objetivo revisado {n}",
+                "descricao_servicos": f"Descrição dos serviços, revisão {n}",
+            })
+            self.pause()
+
+
+class Fornecedor(VirtualUser):
+    def scenario(self):
+        procs = self.procurements("ABERTO")
+        items = {}
+        for proc in procs:
+            response = self.call("get_tr", "GET", f"/tr/{proc['id']}")
+            if response is not None:
+                items[proc["id"]] = [i["id"] for i in response.json()["service_items"]]
+        items = {pid: ids for pid, ids in items.items() if ids}
+        if not items:
+            return
+        proposals = {}
+        while not self.stop.is_set():
+            proc_id = self.rng.choice(list(items))
+            prices = [{"service_item_id": sid, "unit_price": round(self.rng.uniform(10, 1000), 2)}
+                      for sid in items[proc_id]]
+            # O atraso só é medido quando a proposta já existe: cada fornecedor
+            # tem uma proposta por processo e envia em sequência, sem corrida
+            if proc_id in proposals:
+                self.sent_at[proposals[proc_id]] = time.time()
+            response = self.call("upsert_prices", "PUT", f"/proposals/{proc_id}/prices", json=prices)
+            if response is not None:
+                proposals[proc_id] = response.json()["proposal_id"]
+            self.pause()
+
+
+class Comprador(VirtualUser):
+    def scenario(self):
+        @self.sio.on("proposal.comm.received")
+        def on_prices(data):
+            sent = self.sent_at.get(data.get("proposal_id"))
+            self.stats.record_event("proposal.comm.received", time.time() - sent if sent else None)
+
+        for proc in self.procurements("ABERTO"):
+            self.sio.emit("join_procurement", {"procurement_id": proc["id"]})
+
+        in_analysis = self.procurements("ANALISE_COMERCIAL", "FINALIZADO")
+        if not in_analysis:
+            self.stop.wait()
+            return
+        while not self.stop.is_set():
+            proc = self.rng.choice(in_analysis)
+            self.call("comparison", "GET", f"/procurements/{proc['id']}/comparison")
+            self.pause()
+
+
+def spawn_workers(count, base_port):
+    """Inicia ``count`` workers locais de ``run.py`` e espera o /healthz"""
+    workers = []
+    for n in range(count):
+        env = dict(os.environ, PORT=str(base_port + n))
+        workers.append(subprocess.Popen(
+            [sys.executable, "run.py"], cwd=ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+    urls = [f"http://127.0.0.1:{base_port + n}" for n in range(count)]
+    deadline = time.time() + 60
+    for url in urls:
+        while True:
+            try:
+                if requests.get(f"{url}/healthz", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                pass
+            if time.time() > deadline:
+                for w in workers:
+                    w.terminate()
+                sys.exit(f"worker {url} não respondeu")
+            time.sleep(0.2)
+    return workers, urls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga misto HTTP + WebSocket")
+    parser.add_argument("--url", default="http://localhost:5000",
+                        help="URL(s) separadas por vírgula; usuários distribuídos em round-robin")
+    parser.add_argument("--spawn", type=int, default=0, help="inicia N workers locais")
+    parser.add_argument("--base-port", type=int, default=5100)
+    parser.add_argument("--duration", type=float, default=30, help="segundos")
+    parser.add_argument("--requisitantes", type=int, default=10)
+    parser.add_argument("--fornecedores", type=int, default=40)
+    parser.add_argument("--compradores", type=int, default=5)
+    parser.add_argument("--think-time", type=float, default=1.0, help="pausa média entre ações (s)")
+    parser.add_argument("--seed", type=int, default=42, help="semente usada no flask seed")
+    parser.add_argument("--json", dest="json_path", help="grava o resumo em JSON")
+    args = parser.parse_args(argv)
+
+    workers = []
+    urls = [u.strip().rstrip("/") for u in args.url.split(",") if u.strip()]
+    if args.spawn:
+        workers, urls = spawn_workers(args.spawn, args.base_port)
+
+    stats = Stats()
+    stop = threading.Event()
+    sent_at = {}
+    url_cycle = itertools.cycle(urls)
+    tag = f"s{args.seed}"
+    users = []
+    for cls, role, count in ((Requisitante, "requisitante", args.requisitantes),
+                             (Fornecedor, "fornecedor", args.fornecedores),
+                             (Comprador, "comprador", args.compradores)):
+        for n in range(count):
+            email = f"{role}{n}.{tag}@seed.local"
+            users.append(cls(next(url_cycle), email, stats, stop, args.think_time, sent_at))
+
+    print(f"{len(users)} usuários virtuais em {len(urls)} worker(s) por {args.duration:.0f}s")
+    started = time.perf_counter()
+    try:
+        for user in users:
+            user.start()
+        stop.wait(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for user in users:
+            user.join(timeout=35)
+        elapsed = time.perf_counter() - started
+        for w in workers:
+            w.terminate()
+
+    summary = stats.summary(elapsed)
+    print(f"\n{'operação':22} {'req':>7} {'erros':>6} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for op, r in summary["operations"].items():
+        print(f"{op:22} {r['requests']:7} {r['errors']:6} {r['throughput_rps']:8.2f} "
+              f"{r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f}")
+    lag = summary["event_lag"]
+    print(f"\nvazão total: {summary['throughput_rps']} req/s")
+    print(f"atraso de eventos ({lag['samples']} amostras): p50 {lag['p50_ms']} ms, "
+          f"p95 {lag['p95_ms']} ms, p99 {lag['p99_ms']} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(summary, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Teste de estresse do pool de conexões
+
+Sobe a aplicação com um pool pequeno, registra uma rota que segura a
+conexão por ``--hold`` segundos e dispara ``--threads`` requisições
+simultâneas (mais chamadas a ``/api/procurements``).  Com o pool saturado as
+requisições excedentes devem receber ``503`` com ``Retry-After`` dentro de
+``DB_POOL_TIMEOUT`` — nenhuma thread pode ficar pendurada.
+
+Uso:
+    python benchmarks/stress_pool.py
+    python benchmarks/stress_pool.py --pool-size 5 --threads 50 --database-url postgresql+psycopg2://...
+
+Sai com código 1 se alguma requisição travar, devolver status diferente de
+200/503 ou um 503 vier sem Retry-After.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estresse do pool de conexões")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--max-overflow", type=int, default=0)
+    parser.add_argument("--pool-timeout", type=int, default=1, help="segundos inteiros")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--hold", type=float, default=2.0, help="segundos com a conexão presa")
+    parser.add_argument("--database-url", help="padrão: SQLite temporário")
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.mkdtemp(prefix="stress-")
+        args.database_url = f"sqlite:///{os.path.join(tmpdir, 'stress.db')}"
+
+    # Config lê o ambiente na importação do pacote
+    os.environ.update(
+        DATABASE_URL=args.database_url,
+        DB_POOL_SIZE=str(args.pool_size),
+        DB_MAX_OVERFLOW=str(args.max_overflow),
+        DB_POOL_TIMEOUT=str(args.pool_timeout),
+        SCHEMA_AUTO_CREATE="1",
+    )
+    sys.path.insert(0, ROOT)
+    warnings.filterwarnings("ignore")
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import text
+    from app import create_app, db
+    from app.models import Role, User
+    from app.utils.metrics import metrics
+
+    app = create_app()
+
+    @app.get("/_stress/hold")
+    def hold_connection():
+        db.session.execute(text("SELECT 1"))
+        time.sleep(args.hold)
+        return {"ok": True}
+
+    with app.app_context():
+        user = User(email="stress@local", full_name="Stress", role=Role.COMPRADOR, password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    client = app.test_client()
+    statuses = Counter()
+    problems = []
+    lock = threading.Lock()
+
+    def worker(n):
+        path = "/_stress/hold" if n % 2 == 0 else "/api/procurements"
+        response = client.get(path, headers=headers)
+        with lock:
+            statuses[response.status_code] += 1
+            if response.status_code not in (200, 503):
+                problems.append(f"{path}: status {response.status_code}")
+            elif response.status_code == 503 and "Retry-After" not in response.headers:
+                problems.append(f"{path}: 503 sem Retry-After")
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    # Limite generoso: cada requisição espera no máximo pool_timeout + hold
+    deadline = started + args.hold * 2 + args.pool_timeout * 2 + 10
+    for t in threads:
+        t.join(max(deadline - time.perf_counter(), 0))
+    hung = sum(t.is_alive() for t in threads)
+    elapsed = time.perf_counter() - started
+
+    print(f"pool {args.pool_size}+{args.max_overflow}, timeout {args.pool_timeout}s, "
+          f"{args.threads} threads, hold {args.hold}s")
+    print(f"tempo total {elapsed:.2f}s; status: {dict(sorted(statuses.items()))}; penduradas: {hung}")
+    for line in metrics.render().splitlines():
+        if line.startswith(("db_unavailable_total", "db_pool_connections", "db_pool_checkout_seconds_count")):
+            print(f"  {line}")
+
+    if hung:
+        problems.append(f"{hung} requisições penduradas")
+    if not statuses[503]:
+        problems.append("pool não saturou: aumente --threads ou --hold")
+    for line in problems:
+        print(f"FALHA {line}")
+
+    if tmpdir:
+        # Inclui os arquivos -wal/-shm do perfil SQLite
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
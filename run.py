@@ -7,20 +7,35 @@ Arquivo principal da aplicação
 # (ver app/__init__.py), então não é necessário aplicar monkey_patch.
 
 from app import create_app, socketio
-from flask_socketio import join_room
+from app.utils import sockets
+from flask import request
 
 # Criar a aplicação Flask
 application = create_app()
 app = application  # Alias para compatibilidade com Gunicorn
 
 # Socket.IO event handlers
+@socketio.on("connect")
+def on_connect(auth=None):
+    # O JWT é verificado uma única vez; conexões sem token válido são recusadas
+    session = sockets.authenticate(auth)
+    if session is None:
+        return False
+    sockets.register(request.sid, session)
+
+
+@socketio.on("disconnect")
+def on_disconnect():
+    sockets.unregister(request.sid)
+
+
 @socketio.on("join_procurement")
 def on_join_proc(data):
     proc_id = data.get("procurement_id")
     if not proc_id:
         return
     room = f"proc:{proc_id}"
-    join_room(room)
+    sockets.join(request.sid, room)
 
 
 @socketio.on("join_user")
@@ -29,7 +44,7 @@ def on_join_user(data):
     if not user_id:
         return
     room = f"user:{user_id}"
-    join_room(room)
+    sockets.join(request.sid, room)
 
 
 @socketio.on("join_role") 
@@ -38,7 +53,7 @@ def on_join_role(data):
     if not role:
         return
     room = f"role:{role}"
-    join_room(room)
+    sockets.join(request.sid, room)
 
 
 if __name__ == "__main__":
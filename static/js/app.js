@@ -62,6 +62,9 @@ function showDashboard() {
     
     // Connect WebSocket
     connectSocket();
+    
+    // Notificações recebidas enquanto o usuário estava offline
+    loadUnreadNotifications();
 }
 
 function setupEventListeners() {
@@ -105,13 +108,29 @@ function logout() {
 }
 
 // ============= WEBSOCKET =============
-function connectSocket() {
-    socket = io({
+// Parser binário compatível com o serializer 'msgpack' do python-socketio,
+// servido pela própria aplicação (static/js/msgpack-parser.js)
+const MSGPACK_PARSER_URL = '/static/js/msgpack-parser.js';
+
+async function connectSocket() {
+    const options = {
         transports: ['websocket'],
         auth: {
             token: localStorage.getItem('token')
         }
-    });
+    };
+    
+    // O codec é definido pelo servidor; cliente e servidor precisam coincidir
+    if (window.SOCKET_SERIALIZER === 'msgpack') {
+        try {
+            options.parser = await import(MSGPACK_PARSER_URL);
+        } catch (error) {
+            console.error('Falha ao carregar parser msgpack:', error);
+            return;
+        }
+    }
+    
+    socket = io(options);
     
     socket.on('connect', () => {
         console.log('Socket connected:', socket.id);
@@ -178,6 +197,10 @@ function setupSocketListeners() {
         showNotification('Convite Enviado', `Convite enviado para ${data.email}`);
     });
     
+    socket.on('invites.sent', (data) => {
+        showNotification('Convites Enviados', `${data.count} convites enviados para "${data.title}"`);
+    });
+    
     socket.on('invite.received', (data) => {
         if (currentUser.role === 'FORNECEDOR') {
             showNotification('Novo Convite', `Você foi convidado para o processo "${data.title}"`);
@@ -211,6 +234,31 @@ function setupSocketListeners() {
     });
 }
 
+// ============= NOTIFICATIONS =============
+async function loadUnreadNotifications() {
+    try {
+        const response = await fetchAPI('/notifications?unread=1&limit=5');
+        if (!response.ok) return;
+        
+        const data = await response.json();
+        if (data.unread === 0) return;
+        
+        data.items.forEach(n => {
+            showNotification('Notificação', n.payload.message || n.payload.title || n.event);
+        });
+        if (data.unread > data.items.length) {
+            showNotification('Notificações', `Você tem ${data.unread} notificações não lidas`);
+        }
+        
+        await fetchAPI('/notifications/read', {
+            method: 'POST',
+            body: { ids: data.items.map(n => n.id) }
+        });
+    } catch (error) {
+        console.error('Erro ao carregar notificações:', error);
+    }
+}
+
 // ============= DASHBOARD SETUP =============
 function setupDashboard() {
     const navTabs = document.getElementById('navTabs');
@@ -0,0 +1,251 @@
+// Parser Socket.IO em MessagePack, servido junto com a aplicação
+//
+// Equivalente ao socket.io-msgpack-parser: cada pacote ({type, data, nsp, id})
+// vira um único frame binário, o formato do serializer 'msgpack' do
+// python-socketio.  Cobre o subconjunto de MessagePack usado pelos eventos
+// (nil, booleanos, inteiros, floats, strings, binários, arrays e mapas).
+
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+// ============= ENCODER =============
+function encodeValue(value, out) {
+    if (value === null || value === undefined) {
+        out.push(0xc0);
+    } else if (value === false) {
+        out.push(0xc2);
+    } else if (value === true) {
+        out.push(0xc3);
+    } else if (typeof value === 'number') {
+        encodeNumber(value, out);
+    } else if (typeof value === 'string') {
+        const bytes = textEncoder.encode(value);
+        if (bytes.length < 32) {
+            out.push(0xa0 | bytes.length);
+        } else if (bytes.length < 0x100) {
+            out.push(0xd9, bytes.length);
+        } else if (bytes.length < 0x10000) {
+            out.push(0xda, bytes.length >> 8, bytes.length & 0xff);
+        } else {
+            out.push(0xdb, ...uint32(bytes.length));
+        }
+        pushBytes(bytes, out);
+    } else if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+        const bytes = value instanceof ArrayBuffer
+            ? new Uint8Array(value)
+            : new Uint8Array(value.buffer, value.byteOffset, value.byteLength);
+        if (bytes.length < 0x100) {
+            out.push(0xc4, bytes.length);
+        } else if (bytes.length < 0x10000) {
+            out.push(0xc5, bytes.length >> 8, bytes.length & 0xff);
+        } else {
+            out.push(0xc6, ...uint32(bytes.length));
+        }
+        pushBytes(bytes, out);
+    } else if (Array.isArray(value)) {
+        encodeLength(value.length, 0x90, 0xdc, out);
+        value.forEach(item => encodeValue(item, out));
+    } else if (typeof value === 'object') {
+        if (typeof value.toJSON === 'function') {
+            encodeValue(value.toJSON(), out);
+            return;
+        }
+        const keys = Object.keys(value).filter(
+            key => value[key] !== undefined && typeof value[key] !== 'function'
+        );
+        encodeLength(keys.length, 0x80, 0xde, out);
+        keys.forEach(key => {
+            encodeValue(key, out);
+            encodeValue(value[key], out);
+        });
+    } else {
+        throw new Error(`Tipo não suportado em msgpack: ${typeof value}`);
+    }
+}
+
+function encodeNumber(value, out) {
+    if (!Number.isSafeInteger(value)) {
+        const view = new DataView(new ArrayBuffer(8));
+        view.setFloat64(0, value);
+        out.push(0xcb);
+        pushBytes(new Uint8Array(view.buffer), out);
+    } else if (value >= 0 && value < 0x80) {
+        out.push(value);
+    } else if (value < 0 && value >= -32) {
+        out.push(value & 0xff);
+    } else if (value >= 0 && value <= 0xffffffff) {
+        out.push(0xce, ...uint32(value));
+    } else if (value < 0 && value >= -0x80000000) {
+        out.push(0xd2, ...uint32(value >>> 0));
+    } else {
+        const view = new DataView(new ArrayBuffer(8));
+        view.setBigInt64(0, BigInt(value));
+        out.push(0xd3);
+        pushBytes(new Uint8Array(view.buffer), out);
+    }
+}
+
+function encodeLength(length, fix, wide, out) {
+    if (length < 16) {
+        out.push(fix | length);
+    } else if (length < 0x10000) {
+        out.push(wide, length >> 8, length & 0xff);
+    } else {
+        out.push(wide + 1, ...uint32(length));
+    }
+}
+
+function uint32(value) {
+    return [(value >>> 24) & 0xff, (value >>> 16) & 0xff, (value >>> 8) & 0xff, value & 0xff];
+}
+
+function pushBytes(bytes, out) {
+    for (let i = 0; i < bytes.length; i++) {
+        out.push(bytes[i]);
+    }
+}
+
+export function encode(value) {
+    const out = [];
+    encodeValue(value, out);
+    return new Uint8Array(out);
+}
+
+// ============= DECODER =============
+export function decode(input) {
+    const bytes = input instanceof ArrayBuffer
+        ? new Uint8Array(input)
+        : new Uint8Array(input.buffer, input.byteOffset, input.byteLength);
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    let offset = 0;
+
+    const take = (n) => {
+        if (offset + n > bytes.length) {
+            throw new Error('Pacote msgpack truncado');
+        }
+        const start = offset;
+        offset += n;
+        return start;
+    };
+    const str = (n) => {
+        const start = take(n);
+        return textDecoder.decode(bytes.subarray(start, start + n));
+    };
+    const bin = (n) => {
+        const start = take(n);
+        return bytes.slice(start, start + n).buffer;
+    };
+    const array = (n) => {
+        const items = new Array(n);
+        for (let i = 0; i < n; i++) {
+            items[i] = read();
+        }
+        return items;
+    };
+    const map = (n) => {
+        const obj = {};
+        for (let i = 0; i < n; i++) {
+            const key = read();
+            obj[key] = read();
+        }
+        return obj;
+    };
+
+    function read() {
+        const byte = bytes[take(1)];
+        if (byte < 0x80) return byte;
+        if (byte < 0x90) return map(byte & 0x0f);
+        if (byte < 0xa0) return array(byte & 0x0f);
+        if (byte < 0xc0) return str(byte & 0x1f);
+        if (byte >= 0xe0) return byte - 0x100;
+        switch (byte) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: return bin(view.getUint8(take(1)));
+            case 0xc5: return bin(view.getUint16(take(2)));
+            case 0xc6: return bin(view.getUint32(take(4)));
+            case 0xca: return view.getFloat32(take(4));
+            case 0xcb: return view.getFloat64(take(8));
+            case 0xcc: return view.getUint8(take(1));
+            case 0xcd: return view.getUint16(take(2));
+            case 0xce: return view.getUint32(take(4));
+            case 0xcf: return Number(view.getBigUint64(take(8)));
+            case 0xd0: return view.getInt8(take(1));
+            case 0xd1: return view.getInt16(take(2));
+            case 0xd2: return view.getInt32(take(4));
+            case 0xd3: return Number(view.getBigInt64(take(8)));
+            case 0xd9: return str(view.getUint8(take(1)));
+            case 0xda: return str(view.getUint16(take(2)));
+            case 0xdb: return str(view.getUint32(take(4)));
+            case 0xdc: return array(view.getUint16(take(2)));
+            case 0xdd: return array(view.getUint32(take(4)));
+            case 0xde: return map(view.getUint16(take(2)));
+            case 0xdf: return map(view.getUint32(take(4)));
+            default:
+                throw new Error(`Byte msgpack não suportado: 0x${byte.toString(16)}`);
+        }
+    }
+
+    const value = read();
+    if (offset !== bytes.length) {
+        throw new Error('Bytes sobrando no pacote msgpack');
+    }
+    return value;
+}
+
+// ============= INTERFACE DO SOCKET.IO-CLIENT =============
+export const protocol = 5;
+
+export class Encoder {
+    encode(packet) {
+        return [encode(packet)];
+    }
+}
+
+export class Decoder {
+    constructor() {
+        this.listeners = {};
+    }
+
+    on(event, listener) {
+        (this.listeners[event] = this.listeners[event] || []).push(listener);
+        return this;
+    }
+
+    off(event) {
+        if (event === undefined) {
+            this.listeners = {};
+        } else {
+            delete this.listeners[event];
+        }
+        return this;
+    }
+
+    emit(event, ...args) {
+        (this.listeners[event] || []).slice().forEach(listener => listener(...args));
+        return this;
+    }
+
+    add(data) {
+        if (typeof data === 'string') {
+            throw new Error('Pacote texto recebido com o parser msgpack');
+        }
+        const packet = decode(data);
+        const valid = packet !== null && typeof packet === 'object'
+            && Number.isInteger(packet.type) && packet.type >= 0 && packet.type <= 6
+            && typeof packet.nsp === 'string'
+            && (packet.id === undefined || packet.id === null || Number.isInteger(packet.id));
+        if (!valid) {
+            throw new Error('Pacote Socket.IO inválido');
+        }
+        if (packet.id === null) {
+            delete packet.id;
+        }
+        this.emit('decoded', packet);
+    }
+
+    destroy() {
+        this.off();
+    }
+}